@@ -0,0 +1,99 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    return " ".join(query.lower().split())
+
+
+def answer_key(query, clauses, prompt_version, model_name):
+    h = hashlib.sha256()
+    for part in (normalize_query(query), prompt_version, model_name):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    # Clause order is part of the prompt, so it is part of the key
+    for clause in clauses:
+        h.update(hashlib.sha256(clause.encode("utf-8")).digest())
+    return h.hexdigest()
+
+
+class AnswerCache:
+    """LLM responses keyed by ``answer_key``: an in-memory LRU in front of an
+    optional SQLite table, both bounded by TTL."""
+
+    def __init__(self, max_entries=1024, ttl_s=3600, sqlite_path=None, sqlite_max_entries=100_000):
+        self.max_entries = int(max_entries)
+        self.ttl_s = float(ttl_s) if ttl_s else None
+        self.sqlite_max_entries = int(sqlite_max_entries)
+        self._entries = OrderedDict()  # key -> (answer, created_at)
+        self._lock = threading.Lock()
+        self._db = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, timeout=10, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer TEXT, created_at REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS answers_created ON answers (created_at)")
+            self._db.commit()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, created_at):
+        return self.ttl_s is None or time.time() - created_at <= self.ttl_s
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._fresh(entry[1]):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self._entries.pop(key, None)
+            if self._db is not None:
+                row = self._db.execute("SELECT answer, created_at FROM answers WHERE key = ?", (key,)).fetchone()
+                if row is not None and self._fresh(row[1]):
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key, answer):
+        now = time.time()
+        with self._lock:
+            self._remember(key, answer, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers (key, answer, created_at) VALUES (?, ?, ?)", (key, answer, now)
+                )
+                self._puts += 1
+                if self._puts % 100 == 0:
+                    # Trim expired/oldest rows every so often rather than per write
+                    if self.ttl_s is not None:
+                        self._db.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_s,))
+                    self._db.execute(
+                        "DELETE FROM answers WHERE key IN "
+                        "(SELECT key FROM answers ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                        (self.sqlite_max_entries,),
+                    )
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def _remember(self, key, answer, created_at):
+        self._entries[key] = (answer, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,126 @@
+import math
+import os
+import re
+
+import numpy as np
+
+# Terms keep dotted numbers together so clause references like "4.2.1"
+# match as a unit; everything is lowercased, nothing is stemmed.
+_TOKEN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)*")
+MAX_TERM_LEN = 48
+
+
+def tokenize(text):
+    return [t for t in _TOKEN.findall(text.lower()) if len(t) <= MAX_TERM_LEN]
+
+
+class BM25Index:
+    """Compact inverted index over chunk rows with Okapi BM25 scoring.
+
+    Postings are stored CSR-style: the rows containing term t are
+    ``rows[starts[t]:starts[t + 1]]`` with matching term frequencies in
+    ``tfs``, so the whole index is a handful of flat numpy arrays.
+    """
+
+    def __init__(self, vocab, starts, rows, tfs, doc_len, k1=1.2, b=0.75):
+        self.vocab = vocab  # term -> term id
+        self.starts = starts
+        self.rows = rows
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        self.avg_len = float(doc_len.mean()) if len(doc_len) else 0.0
+
+    @classmethod
+    def build(cls, texts, **params):
+        vocab = {}
+        postings = []  # term id -> {row: tf}
+        doc_len = []
+        for row, text in enumerate(texts):
+            terms = tokenize(text)
+            doc_len.append(len(terms))
+            for term in terms:
+                term_id = vocab.get(term)
+                if term_id is None:
+                    term_id = vocab[term] = len(postings)
+                    postings.append({})
+                counts = postings[term_id]
+                counts[row] = counts.get(row, 0) + 1
+        lengths = np.fromiter((len(p) for p in postings), dtype=np.int64, count=len(postings))
+        starts = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        rows = np.fromiter((r for p in postings for r in p), dtype=np.int32, count=int(starts[-1]))
+        tfs = np.fromiter((tf for p in postings for tf in p.values()), dtype=np.float32, count=int(starts[-1]))
+        return cls(vocab, starts, rows, tfs, np.asarray(doc_len, dtype=np.float32), **params)
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    @property
+    def nbytes(self):
+        vocab_bytes = sum(len(t) + 64 for t in self.vocab)  # rough dict overhead
+        return self.starts.nbytes + self.rows.nbytes + self.tfs.nbytes + self.doc_len.nbytes + vocab_bytes
+
+    def scores(self, query):
+        scores = np.zeros(len(self.doc_len), dtype=np.float32)
+        n = len(self.doc_len)
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.starts[term_id], self.starts[term_id + 1]
+            rows, tf = self.rows[start:end], self.tfs[start:end]
+            df = end - start
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[rows] / self.avg_len)
+            # Each row appears once per term, so plain fancy-index += is safe
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query, n):
+        """Top ``n`` rows by BM25 score, best first; rows scoring 0 are left out."""
+        scores = self.scores(query)
+        hits = np.flatnonzero(scores)
+        if len(hits) > n:
+            hits = hits[np.argpartition(-scores[hits], n - 1)[:n]]
+        order = np.argsort(-scores[hits], kind="stable")
+        return hits[order].tolist()
+
+    def save(self, path):
+        terms = sorted(self.vocab, key=self.vocab.get)
+        encoded = [t.encode("utf-8") for t in terms]
+        vocab_offsets = np.concatenate([[0], np.cumsum([len(t) for t in encoded])]).astype(np.int64)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(
+                f,
+                vocab_blob=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+                vocab_offsets=vocab_offsets,
+                starts=self.starts,
+                rows=self.rows,
+                tfs=self.tfs,
+                doc_len=self.doc_len,
+                params=np.array([self.k1, self.b], dtype=np.float32),
+            )
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            blob = data["vocab_blob"].tobytes()
+            offsets = data["vocab_offsets"]
+            vocab = {
+                blob[offsets[i]:offsets[i + 1]].decode("utf-8"): i
+                for i in range(len(offsets) - 1)
+            }
+            k1, b = (float(x) for x in data["params"])
+            return cls(vocab, data["starts"], data["rows"], data["tfs"], data["doc_len"], k1=k1, b=b)
+
+
+def rrf_fuse(rankings, k, rrf_k=60):
+    """Reciprocal-rank fusion of several best-first row lists; returns the top ``k`` rows."""
+    fused = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (rrf_k + rank + 1)
+    # Ties keep the order of the first ranking (the dense one)
+    return sorted(fused, key=lambda row: -fused[row])[:k]
@@ -0,0 +1,206 @@
+import json
+import mmap
+import os
+import shutil
+
+import numpy as np
+
+# On-disk layout for a chunk store with base path "<dir>/chunks":
+#   chunks.bin            all chunk texts, UTF-8, concatenated
+#   chunks.offsets.npy    int64[n + 1]; row i is blob[offsets[i]:offsets[i + 1]]
+#   chunks.meta.bin       optional per-row JSON metadata, same scheme
+#   chunks.meta.offsets.npy
+
+
+def _paths(base_path):
+    return {
+        "blob": base_path + ".bin",
+        "offsets": base_path + ".offsets.npy",
+        "meta_blob": base_path + ".meta.bin",
+        "meta_offsets": base_path + ".meta.offsets.npy",
+    }
+
+
+def chunk_store_exists(base_path):
+    paths = _paths(base_path)
+    return os.path.exists(paths["blob"]) and os.path.exists(paths["offsets"])
+
+
+def _commit(blob_path, offsets_path, write_blob, offsets):
+    # Written beside the target and renamed into place, so a crash never leaves
+    # a torn file under the final name. Targets are always new files (a fresh
+    # generation directory, see storage.new_generation_dir): on Windows a file
+    # that a reader still has mapped can be neither replaced nor removed.
+    with open(blob_path + ".tmp", "wb") as f:
+        write_blob(f)
+    with open(offsets_path + ".tmp", "wb") as f:
+        np.save(f, offsets)
+    os.replace(blob_path + ".tmp", blob_path)
+    os.replace(offsets_path + ".tmp", offsets_path)
+
+
+def _encode(rows):
+    data = [row.encode("utf-8") for row in rows]
+    lengths = np.fromiter((len(d) for d in data), dtype=np.int64, count=len(data))
+    return data, lengths
+
+
+def _write_rows(blob_path, offsets_path, rows):
+    data, lengths = _encode(rows)
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+    _commit(blob_path, offsets_path, lambda f: f.writelines(data), offsets)
+
+
+def _append_rows(blob_path, offsets_path, rows, out_blob, out_offsets):
+    old_offsets = np.load(offsets_path)
+    data, lengths = _encode(rows)
+    offsets = np.concatenate([old_offsets, old_offsets[-1] + np.cumsum(lengths)]).astype(np.int64)
+
+    def write_blob(f):
+        with open(blob_path, "rb") as src:
+            shutil.copyfileobj(src, f)
+        f.writelines(data)
+
+    _commit(out_blob, out_offsets, write_blob, offsets)
+
+
+def _keep_rows(blob_path, offsets_path, keep, out_blob, out_offsets):
+    old_offsets = np.load(offsets_path)
+    offsets = np.concatenate([[0], np.cumsum(np.diff(old_offsets)[keep])]).astype(np.int64)
+
+    def write_blob(f):
+        # Copy each run of kept rows as one byte range; nothing is decoded
+        with open(blob_path, "rb") as src:
+            for start, end in _runs(keep):
+                src.seek(int(old_offsets[start]))
+                remaining = int(old_offsets[end] - old_offsets[start])
+                while remaining:
+                    buf = src.read(min(remaining, 1 << 20))
+                    f.write(buf)
+                    remaining -= len(buf)
+
+    _commit(out_blob, out_offsets, write_blob, offsets)
+
+
+def _runs(mask):
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    return zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))
+
+
+def write_chunk_store(base_path, chunks, metas=None):
+    if metas is not None and len(metas) != len(chunks):
+        raise ValueError("metas must have one entry per chunk")
+    paths = _paths(base_path)
+    _write_rows(paths["blob"], paths["offsets"], chunks)
+    if metas is not None:
+        _write_rows(paths["meta_blob"], paths["meta_offsets"], [json.dumps(m or {}) for m in metas])
+    else:
+        for key in ("meta_blob", "meta_offsets"):
+            if os.path.exists(paths[key]):
+                os.remove(paths[key])
+
+
+def _check_out_path(base_path, out_path):
+    # Rewriting a store in place would rename over files a ChunkStore has mapped
+    if os.path.abspath(out_path) == os.path.abspath(base_path):
+        raise ValueError("out_path must differ from base_path; write to a new generation")
+
+
+def append_chunk_store(base_path, chunks, out_path, metas=None):
+    """The rows of ``base_path`` plus ``chunks``, written as a new store at ``out_path``."""
+    if metas is not None and len(metas) != len(chunks):
+        raise ValueError("metas must have one entry per chunk")
+    _check_out_path(base_path, out_path)
+    paths = _paths(base_path)
+    out = _paths(out_path)
+    has_meta = os.path.exists(paths["meta_offsets"])
+    _append_rows(paths["blob"], paths["offsets"], chunks, out["blob"], out["offsets"])
+    if has_meta:
+        rows = [json.dumps(m or {}) for m in metas] if metas is not None else ["{}"] * len(chunks)
+        _append_rows(paths["meta_blob"], paths["meta_offsets"], rows, out["meta_blob"], out["meta_offsets"])
+    elif metas is not None:
+        # Older rows had no metadata; give them empty entries so rows line up
+        n_old = len(np.load(paths["offsets"], mmap_mode="r")) - 1
+        _write_rows(out["meta_blob"], out["meta_offsets"], ["{}"] * n_old + [json.dumps(m or {}) for m in metas])
+
+
+def filter_chunk_store(base_path, keep, out_path):
+    """The rows of ``base_path`` where ``keep`` is set, written as a new store at ``out_path``."""
+    keep = np.asarray(keep, dtype=bool)
+    _check_out_path(base_path, out_path)
+    paths = _paths(base_path)
+    out = _paths(out_path)
+    _keep_rows(paths["blob"], paths["offsets"], keep, out["blob"], out["offsets"])
+    if os.path.exists(paths["meta_offsets"]):
+        _keep_rows(paths["meta_blob"], paths["meta_offsets"], keep, out["meta_blob"], out["meta_offsets"])
+
+
+def _map_file(path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ChunkStore:
+    """Read-only, memory-mapped view of a chunk store.
+
+    Opening only maps the files; rows are decoded on access, so a query that
+    hits five chunks materializes five strings regardless of corpus size.
+    """
+
+    def __init__(self, base_path):
+        paths = _paths(base_path)
+        self.base_path = base_path
+        self._offsets = np.load(paths["offsets"], mmap_mode="r")
+        self._blob = _map_file(paths["blob"])
+        if os.path.exists(paths["meta_blob"]) and os.path.exists(paths["meta_offsets"]):
+            self._meta_offsets = np.load(paths["meta_offsets"], mmap_mode="r")
+            self._meta_blob = _map_file(paths["meta_blob"])
+        else:
+            self._meta_offsets = None
+            self._meta_blob = None
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        i = self._check(i)
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return self._blob[start:end].decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def meta(self, i):
+        i = self._check(i)
+        if self._meta_offsets is None:
+            return {}
+        start, end = int(self._meta_offsets[i]), int(self._meta_offsets[i + 1])
+        return json.loads(self._meta_blob[start:end].decode("utf-8"))
+
+    @property
+    def has_meta(self):
+        return self._meta_offsets is not None
+
+    @property
+    def resident_nbytes(self):
+        # Only the offsets are worth counting; blob pages live in the page cache
+        nbytes = self._offsets.nbytes
+        if self._meta_offsets is not None:
+            nbytes += self._meta_offsets.nbytes
+        return nbytes
+
+    def close(self):
+        for blob in (self._blob, self._meta_blob):
+            if isinstance(blob, mmap.mmap):
+                blob.close()
+
+    def _check(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("chunk index out of range")
+        return i
@@ -0,0 +1,34 @@
+import logging
+import os
+import threading
+
+import yaml
+
+DEFAULT_CONFIG_PATH = os.path.join("config", "config.yaml")
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def get_config():
+    """config/config.yaml (or $DOCAI_CONFIG), read once on first use.
+
+    A missing file is not an error: the service starts with defaults and only
+    the parts that need a setting (e.g. the Gemini API key) fail when used.
+    """
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                path = os.environ.get("DOCAI_CONFIG", DEFAULT_CONFIG_PATH)
+                if os.path.exists(path):
+                    with open(path) as f:
+                        _config = yaml.safe_load(f) or {}
+                else:
+                    logging.getLogger("docai").warning("Config file %s not found; using defaults.", path)
+                    _config = {}
+    return _config
+
+
+def section(name):
+    return get_config().get(name) or {}
@@ -0,0 +1,257 @@
+"""Content-addressed embedding cache shared by DOCUMENT-AI and REQUIREMENT-AI.
+
+Both apps use the same on-disk format, so a chunk embedded by either one is a
+cache hit for the other.
+
+Kept identical in DOCUMENT-AI.v01/app/core and REQUIREMENT-AI.v01/app/core:
+the two apps deploy separately and share no package, so change both copies
+together.
+"""
+from typing import Callable, Dict, List, Optional, Sequence
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from app.core.embed_backends import resolved_quantization
+
+# On-disk layout:
+#   <cache_dir>/<model slug>/index.sqlite   key -> slot, LRU timestamps, dim/capacity
+#   <cache_dir>/<model slug>/vectors.f32    float32[capacity, dim], memory-mapped
+# Keys are sha256(model name + backend [+ int8 quantization] + text), so
+# identical chunks uploaded to either app are encoded once, and vectors from
+# differently quantized models never mix.
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "edai", "embeddings")
+DEFAULT_MAX_ENTRIES = 200_000
+_SQL_BATCH = 500
+
+
+def canonical_model_name(model_name: str) -> str:
+    # "all-MiniLM-L6-v2" and "sentence-transformers/all-MiniLM-L6-v2" are the same model
+    prefix = "sentence-transformers/"
+    return model_name[len(prefix):] if model_name.startswith(prefix) else model_name
+
+
+def _namespace(model_name: str, backend: str, quantization: Optional[str]) -> str:
+    namespace = f"{canonical_model_name(model_name)}|{backend}"
+    quantization = resolved_quantization(backend, quantization)
+    return f"{namespace}|{quantization}" if quantization else namespace
+
+
+class EmbeddingCache:
+    """Content-addressed cache of raw (unnormalized) embedding vectors.
+
+    Cross-process safety relies on SQLite's rollback-journal locks: readers
+    hold a shared lock while copying rows out of the vector file, and writers
+    take an exclusive lock before touching it.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        backend: str = "torch",
+        cache_dir: Optional[str] = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        quantization: Optional[str] = None,
+    ):
+        self.namespace = _namespace(model_name, backend, quantization)
+        slug = hashlib.sha1(self.namespace.encode("utf-8")).hexdigest()[:16]
+        self.dir = os.path.join(cache_dir or DEFAULT_CACHE_DIR, slug)
+        os.makedirs(self.dir, exist_ok=True)
+        self.vec_path = os.path.join(self.dir, "vectors.f32")
+        self.max_entries = int(max_entries)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(self.dir, "index.sqlite"), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, slot INTEGER UNIQUE, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used)")
+        self._vectors = None
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).digest()
+
+    def encode(self, texts: Sequence[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Return vectors for ``texts``, calling ``encode_fn`` once on the misses only."""
+        texts = list(texts)
+        keys = [self.key(t) for t in texts]
+        found = self.get_many(keys)
+        missing = {}
+        for i, k in enumerate(keys):
+            if k not in found:
+                missing.setdefault(k, i)
+        if missing:
+            miss_rows = list(missing.values())
+            new_vectors = np.asarray(encode_fn([texts[i] for i in miss_rows]), dtype=np.float32)
+            self.put_many(list(missing), new_vectors)
+            for k, vec in zip(missing, new_vectors):
+                found[k] = vec
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([found[k] for k in keys])
+
+    def get_many(self, keys: Sequence[bytes]) -> Dict[bytes, np.ndarray]:
+        unique = list(dict.fromkeys(keys))
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            vectors = self._open_vectors()
+            if vectors is None:
+                self.misses += len(unique)
+                return found
+            self._db.execute("BEGIN")
+            try:
+                for start in range(0, len(unique), _SQL_BATCH):
+                    batch = unique[start:start + _SQL_BATCH]
+                    rows = self._db.execute(
+                        f"SELECT key, slot FROM entries WHERE key IN ({','.join('?' * len(batch))})", batch
+                    ).fetchall()
+                    if rows:
+                        # One sorted gather from the memmap per SQL batch
+                        rows.sort(key=lambda r: r[1])
+                        block = np.array(vectors[[slot for _k, slot in rows]])
+                        for (k, _slot), vec in zip(rows, block):
+                            found[bytes(k)] = vec
+            finally:
+                self._db.execute("COMMIT")
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+            if found:
+                self._touch(list(found))
+        return found
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(keys):
+            return
+        with self._lock:
+            self._db.execute("BEGIN EXCLUSIVE")
+            try:
+                dim, capacity = self._ensure_layout(vectors.shape[1])
+                if vectors.shape[1] != dim:
+                    raise ValueError(f"Cache holds {dim}-d vectors, got {vectors.shape[1]}-d.")
+                # Another process may have stored some of these since our lookup
+                existing = set()
+                for start in range(0, len(keys), _SQL_BATCH):
+                    batch = keys[start:start + _SQL_BATCH]
+                    existing.update(bytes(k) for (k,) in self._db.execute(
+                        f"SELECT key FROM entries WHERE key IN ({','.join('?' * len(batch))})", batch
+                    ))
+                if existing:
+                    fresh = [i for i, k in enumerate(keys) if k not in existing]
+                    keys, vectors = [keys[i] for i in fresh], vectors[fresh]
+                keys, vectors = keys[:capacity], vectors[:capacity]
+                if not keys:
+                    self._db.execute("COMMIT")
+                    return
+                slots = self._allocate(len(keys), capacity)
+                mm = self._open_vectors()
+                order = np.argsort(slots)
+                mm[np.asarray(slots)[order]] = vectors[order]
+                mm.flush()
+                now = time.time()
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO entries (key, slot, last_used) VALUES (?, ?, ?)",
+                    [(k, int(s), now) for k, s in zip(keys, slots)],
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def _meta(self, name):
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return int(row[0]) if row else None
+
+    def _set_meta(self, name, value):
+        self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, str(int(value))))
+
+    def _ensure_layout(self, dim):
+        # Called under the exclusive lock; the first writer fixes dim/capacity
+        stored_dim, capacity = self._meta("dim"), self._meta("capacity")
+        if stored_dim is None:
+            stored_dim, capacity = dim, self.max_entries
+            with open(self.vec_path, "wb") as f:
+                f.truncate(capacity * dim * 4)
+            self._set_meta("dim", dim)
+            self._set_meta("capacity", capacity)
+            self._set_meta("next_slot", 0)
+            self._vectors = None
+        return stored_dim, capacity
+
+    def _allocate(self, n, capacity):
+        next_slot = self._meta("next_slot") or 0
+        fresh = list(range(next_slot, min(capacity, next_slot + n)))
+        self._set_meta("next_slot", next_slot + len(fresh))
+        need = n - len(fresh)
+        if need <= 0:
+            return fresh
+        # Full: reuse the least recently used slots
+        victims = self._db.execute(
+            "SELECT key, slot FROM entries ORDER BY last_used LIMIT ?", (need,)
+        ).fetchall()
+        self._db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k, _s in victims])
+        return fresh + [slot for _k, slot in victims]
+
+    def _touch(self, keys):
+        now = time.time()
+        try:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(now, k) for k in keys])
+            self._db.execute("COMMIT")
+        except sqlite3.OperationalError:
+            # LRU order is advisory; never fail a lookup because another process holds the lock
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+
+    def _open_vectors(self):
+        dim, capacity = self._meta("dim"), self._meta("capacity")
+        if dim is None:
+            return None
+        if self._vectors is None or self._vectors.shape != (capacity, dim):
+            self._vectors = np.memmap(self.vec_path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+        return self._vectors
+
+
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: str, backend: str = "torch", quantization: Optional[str] = None) -> Optional[EmbeddingCache]:
+    """Process-wide cache for a model, configured from the environment.
+
+    EDAI_EMBED_CACHE=0 disables it; EDAI_EMBED_CACHE_DIR and
+    EDAI_EMBED_CACHE_MAX_ENTRIES set location and size cap.
+    """
+    if os.environ.get("EDAI_EMBED_CACHE", "1") == "0":
+        return None
+    key = _namespace(model_name, backend, quantization)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = EmbeddingCache(
+                model_name,
+                backend=backend,
+                cache_dir=os.environ.get("EDAI_EMBED_CACHE_DIR") or None,
+                max_entries=int(os.environ.get("EDAI_EMBED_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                quantization=quantization,
+            )
+        return _caches[key]
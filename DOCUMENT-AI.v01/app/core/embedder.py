@@ -1,5 +1,105 @@
-from sentence_transformers import SentenceTransformer
-model = SentenceTransformer('all-MiniLM-L6-v2')
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from app.core.config import section
+from app.core.embed_backends import load_sentence_transformer
+from app.core.embed_cache import get_embedding_cache
+from app.core.metrics import span
+from app.core.microbatch import MicroBatcher
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+
+_model = None
+_model_lock = threading.Lock()
+
+def get_backend_name():
+    # torch | onnx | onnx-int8; EDAI_EMBED_BACKEND overrides the config
+    return os.environ.get("EDAI_EMBED_BACKEND") or section("embedding").get("backend", "torch")
+
+def get_model():
+    """The SentenceTransformer, loaded on first use (or by warm-up at startup)."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = load_sentence_transformer(
+                    MODEL_NAME, get_backend_name(), quantization=section("embedding").get("quantization")
+                )
+    return _model
+
+def model_loaded():
+    return _model is not None
+
+_query_batcher = None
+_batcher_lock = threading.Lock()
+
+def get_query_batcher():
+    """Process-wide micro-batcher for query embeddings, or None when
+    embedding.microbatch.enabled is false."""
+    global _query_batcher
+    mb_cfg = section("embedding").get("microbatch") or {}
+    if not mb_cfg.get("enabled", True):
+        return None
+    with _batcher_lock:
+        if _query_batcher is None:
+            _query_batcher = MicroBatcher(
+                lambda texts: get_model().encode(texts, convert_to_tensor=False),
+                max_batch=mb_cfg.get("max_batch", 32),
+                window_ms=mb_cfg.get("window_ms", 2),
+                name="query",
+            )
+        return _query_batcher
+
+# Small LRU of query vectors so repeated/templated questions skip the forward pass
+QUERY_CACHE_SIZE = 1024
+_query_cache = OrderedDict()
+_query_lock = threading.Lock()
+query_cache_hits = 0
+query_cache_misses = 0
 
 def embed_texts(texts):
-    return model.encode(texts, convert_to_tensor=False).tolist()
\ No newline at end of file
+    with span("embed"):
+        cache = get_embedding_cache(MODEL_NAME, get_backend_name(), section("embedding").get("quantization"))
+        if cache is None or not texts:
+            return get_model().encode(texts, convert_to_tensor=False).tolist()
+        # Only chunks never seen before (by either app) reach the model
+        return cache.encode(texts, lambda missing: get_model().encode(missing, convert_to_tensor=False)).tolist()
+
+def embed_queries(queries):
+    """Embed several queries with at most one encode call (cached ones skip it)."""
+    global query_cache_hits, query_cache_misses
+    keys = [" ".join(q.split()) for q in queries]
+    vecs = [None] * len(keys)
+    with _query_lock:
+        for i, key in enumerate(keys):
+            vec = _query_cache.get(key)
+            if vec is not None:
+                _query_cache.move_to_end(key)
+                vecs[i] = vec
+                query_cache_hits += 1
+            else:
+                query_cache_misses += 1
+    missing = list(dict.fromkeys(key for key, vec in zip(keys, vecs) if vec is None))
+    if missing:
+        encoded = {}
+        # Concurrent requests' queries share one forward pass through the batcher
+        batcher = get_query_batcher()
+        with span("embed_query"):
+            rows = batcher.encode(missing) if batcher else get_model().encode(missing, convert_to_tensor=False)
+        for key, row in zip(missing, rows):
+            vec = np.asarray(row, dtype="float32")
+            vec.setflags(write=False)
+            encoded[key] = vec
+        with _query_lock:
+            _query_cache.update(encoded)
+            for key in encoded:
+                _query_cache.move_to_end(key)
+            while len(_query_cache) > QUERY_CACHE_SIZE:
+                _query_cache.popitem(last=False)
+        vecs = [vec if vec is not None else encoded[key] for key, vec in zip(keys, vecs)]
+    return np.stack(vecs) if vecs else np.empty((0, get_model().get_sentence_embedding_dimension()), dtype="float32")
+
+def embed_query(query):
+    return embed_queries([query])[0]
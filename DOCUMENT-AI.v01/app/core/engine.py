@@ -1,14 +1,41 @@
-import google.generativeai as genai
-import yaml
-import json
-from app.core.retriever import retrieve_chunks
+import threading
+import time
+from app.core.config import get_config
+from app.core.retriever import retrieve_chunks, retrieve_with_sources
+from app.core.llm import get_backend
+from app.core.answer_cache import AnswerCache, answer_key
+from app.core.metrics import STAGE_SECONDS, span
 
-with open("config/config.yaml") as f:
-    cfg = yaml.safe_load(f)
+cfg = get_config()
 
-genai.configure(api_key=cfg["gemini_api_key"])
+answer_cache = AnswerCache(**(cfg.get("answer_cache") or {}))
 
-model = genai.GenerativeModel("gemini-1.5-flash")
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    """The LLM backend, created on first use. Gemini by default; llm.backend:
+    local (or DOCAI_LLM_BACKEND=local) runs offline."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                _model = get_backend(cfg)
+    return _model
+
+def model_loaded():
+    return _model is not None
+
+def warm_up():
+    """Load the embedding model, reranker and LLM client before the first request."""
+    from app.core import embedder, retriever
+    embedder.get_model().encode(["warm-up"])
+    if retriever.reranker is not None:
+        retriever.reranker.load()
+    get_model()
+
+# Bump whenever COT changes so cached answers from the old prompt are not reused
+PROMPT_VERSION = "cot-v1"
 
 COT = """
 You are a claims evaluation assistant. You are provided with:
@@ -38,28 +65,57 @@ Retrieved Clauses:
 ✅ Just return valid JSON. No triple backticks.
 """
 
-def evaluate_decision(query, session_id):
-    retrieved_chunks = retrieve_chunks(query,session_id)
+def evaluate_decision(query, session_id, retrieved_chunks=None):
+    if retrieved_chunks is None:
+        retrieved_chunks = retrieve_chunks(query,session_id)
+    model = get_model()
+    key = answer_key(query, retrieved_chunks, PROMPT_VERSION, model.name)
+    cached = answer_cache.get(key)
+    if cached is not None:
+        return cached
     clauses = "\n\n".join(retrieved_chunks)
     prompt = COT.format(query=query, clauses=clauses)
-    response = model.generate_content(prompt)
-    #raw_output = 
-    return response.candidates[0].content.parts[0].text
-
-    # try:
-    #     parsed_output = json.loads(raw_output)
-    #     return {
-    #         "query": query,
-    #         "response": parsed_output,
-    #         "retrieved_clauses": retrieved_chunks
-    #     }
-    # except json.JSONDecodeError:
-    #     return {
-    #         "query": query,
-    #         "response": {"error": "Invalid JSON response from Gemini", "raw": raw_output},
-    #         "retrieved_clauses": retrieved_chunks
-    #     }
-    
-    
-    
-#
\ No newline at end of file
+    with span("llm"):
+        answer = model.generate(prompt)
+    if answer:
+        answer_cache.put(key, answer)
+    return answer
+
+def stream_answer(query, session_id, k=5):
+    """Yield (event, data) pairs: the retrieved clauses as soon as the search
+    finishes, then answer tokens as the model produces them, then the full answer."""
+    retrieved_chunks, sources = retrieve_with_sources(query, session_id, k=k)
+    yield "clauses", retrieved_chunks
+
+    model = get_model()
+    key = answer_key(query, retrieved_chunks, PROMPT_VERSION, model.name)
+    cached = answer_cache.get(key)
+    if cached is not None:
+        yield "token", cached
+        yield "done", {"query": query, "response": cached, "sources": sources}
+        return
+
+    prompt = COT.format(query=query, clauses="\n\n".join(retrieved_chunks))
+    pieces = []
+    t0 = time.perf_counter()
+    for piece in model.stream(prompt):
+        pieces.append(piece)
+        yield "token", piece
+    # Not a span: the time between tokens includes the client reading them
+    STAGE_SECONDS.observe(time.perf_counter() - t0, "llm_stream")
+    answer = "".join(pieces)
+    if answer:
+        answer_cache.put(key, answer)
+    yield "done", {"query": query, "response": answer, "sources": sources}
+
+def answer_query(query, session_id, k=5):
+    # Embed, retrieve and search once; the same clauses feed the prompt and the response
+    retrieved_chunks, sources = retrieve_with_sources(query, session_id, k=k)
+    answer = evaluate_decision(query, session_id, retrieved_chunks=retrieved_chunks)
+    return {
+        "query": query,
+        "response": answer,
+        "retrieved_clauses": retrieved_chunks,
+        # doc_id, file and page range of each clause, in the same order
+        "sources": sources
+    }
@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class KeyedLocks:
+    """One lock per key, kept only while a thread holds or waits for it.
+
+    A plain dict of locks keeps one entry for every session ever seen; here
+    the entry goes away with its last user.
+    """
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks = {}  # key -> [lock, holders + waiters]
+
+    @contextmanager
+    def hold(self, key):
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+    def __len__(self):
+        with self._guard:
+            return len(self._locks)
+
+
+class SessionIndexCache:
+    """Process-wide LRU/TTL cache of loaded session indexes.
+
+    Entries are whatever the loader returns; the loader also reports an
+    approximate size in bytes so the cache can stay inside its memory budget.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024, ttl_s=1800, max_entries=64):
+        self.max_bytes = int(max_bytes)
+        self.ttl_s = float(ttl_s) if ttl_s else None
+        self.max_entries = int(max_entries)
+        self._entries = OrderedDict()  # session_id -> (value, nbytes, loaded_at)
+        # session_id -> False once invalidated; only sessions being loaded
+        self._loading = {}
+        self._load_locks = KeyedLocks()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, session_id, loader):
+        value = self._lookup(session_id)
+        if value is not None:
+            return value
+
+        # One loader per session: concurrent misses wait for the first load
+        with self._load_locks.hold(session_id):
+            value = self._lookup(session_id, count=False)
+            if value is not None:
+                return value
+            with self._lock:
+                self.misses += 1
+                self._loading[session_id] = True
+            try:
+                value, nbytes = loader(session_id)
+            except BaseException:
+                with self._lock:
+                    self._loading.pop(session_id, None)
+                raise
+            with self._lock:
+                # Skip the insert if build_index invalidated the session mid-load
+                if self._loading.pop(session_id, False):
+                    self._insert(session_id, value, nbytes)
+            return value
+
+    def invalidate(self, session_id):
+        with self._lock:
+            if session_id in self._loading:
+                self._loading[session_id] = False
+            self._drop(session_id)
+
+    def clear(self):
+        with self._lock:
+            for session_id in self._loading:
+                self._loading[session_id] = False
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def _lookup(self, session_id, count=True):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is None:
+                return None
+            value, _nbytes, loaded_at = entry
+            if self.ttl_s is not None and time.monotonic() - loaded_at > self.ttl_s:
+                self._drop(session_id)
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(session_id)
+            if count:
+                self.hits += 1
+            return value
+
+    def _insert(self, session_id, value, nbytes):
+        self._drop(session_id)
+        if nbytes > self.max_bytes:
+            # Larger than the whole budget: serve it but never keep it
+            return
+        self._entries[session_id] = (value, nbytes, time.monotonic())
+        self._bytes += nbytes
+        while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+
+    def _drop(self, session_id):
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._bytes -= entry[1]
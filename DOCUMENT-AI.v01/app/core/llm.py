@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import re
+import time
+
+
+class LLMBackend:
+    """Minimal interface the engine needs from a text-generation model."""
+
+    name = "base"
+
+    def generate(self, prompt):
+        raise NotImplementedError
+
+    def stream(self, prompt):
+        # Backends without native streaming deliver the answer as one piece
+        yield self.generate(prompt)
+
+
+class GeminiBackend(LLMBackend):
+    def __init__(self, api_key, model_name="gemini-1.5-flash"):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+        self.name = model_name
+
+    def generate(self, prompt):
+        response = self.model.generate_content(prompt)
+        return response.candidates[0].content.parts[0].text
+
+    def stream(self, prompt):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            for part in chunk.candidates[0].content.parts if chunk.candidates else []:
+                if part.text:
+                    yield part.text
+
+
+class LocalBackend(LLMBackend):
+    """Deterministic offline stand-in for Gemini.
+
+    The answer depends only on the prompt, so caches and endpoints can be
+    tested and benchmarked without network access or API quota.
+    ``latency_ms`` simulates model latency.
+    """
+
+    name = "local-stub"
+
+    def __init__(self, latency_ms=0):
+        self.latency_ms = float(latency_ms)
+
+    def _answer(self, prompt):
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return json.dumps({
+            "decision": "approved" if int(digest[0], 16) % 2 == 0 else "rejected",
+            "amount": None,
+            "justification": f"Local stand-in response {digest[:12]}; no model was called."
+        })
+
+    def generate(self, prompt):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return self._answer(prompt)
+
+    def stream(self, prompt):
+        # Same text as generate(), split into word-sized pieces spread over the latency
+        pieces = re.findall(r"\S+\s*", self._answer(prompt))
+        for piece in pieces:
+            if self.latency_ms:
+                time.sleep(self.latency_ms / 1000 / len(pieces))
+            yield piece
+
+
+def get_backend(cfg):
+    llm_cfg = cfg.get("llm") or {}
+    backend = os.environ.get("DOCAI_LLM_BACKEND") or llm_cfg.get("backend", "gemini")
+    if backend == "local":
+        return LocalBackend(latency_ms=llm_cfg.get("local_latency_ms", 0))
+    if backend == "gemini":
+        api_key = cfg.get("gemini_api_key") or os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            raise ValueError("No Gemini API key: set gemini_api_key in config/config.yaml or GEMINI_API_KEY.")
+        return GeminiBackend(api_key, llm_cfg.get("model", "gemini-1.5-flash"))
+    raise ValueError(f"Unknown LLM backend: {backend}")
@@ -0,0 +1,173 @@
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Minimal Prometheus text-format metrics; no client library needed.
+# Stage spans feed one histogram labelled by stage, and when a request is
+# being traced (see start_trace) they are also recorded for its timing header.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger("docai")
+
+
+class Histogram:
+    def __init__(self, name, help_text, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for labels, series in items:
+            base = _labels(self.labelnames, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{base} {series[-1]}")
+            lines.append(f"{self.name}_count{base} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {value}" for labels, value in items)
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def add(self, amount):
+        with self._lock:
+            self.value += amount
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.value}"]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+STAGE_SECONDS = Histogram(
+    "docai_stage_seconds", "Time spent per pipeline stage.", ["stage"]
+)
+REQUEST_SECONDS = Histogram(
+    "docai_request_seconds", "HTTP request latency by route.", ["method", "route"]
+)
+REQUESTS = Counter("docai_requests_total", "HTTP requests by route and status.", ["method", "route", "status"])
+STAGE_ERRORS = Counter("docai_stage_errors_total", "Stages that raised.", ["stage"])
+IN_FLIGHT = Gauge("docai_requests_in_flight", "HTTP requests currently being served.")
+
+_trace = contextvars.ContextVar("docai_trace", default=None)
+
+
+def start_trace():
+    """Collect this request's spans; returns the list they are appended to."""
+    spans = []
+    _trace.set(spans)
+    return spans
+
+
+@contextmanager
+def span(stage):
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage)
+        raise
+    finally:
+        seconds = time.perf_counter() - t0
+        STAGE_SECONDS.observe(seconds, stage)
+        spans = _trace.get()
+        if spans is not None:
+            spans.append((stage, seconds))
+
+
+def server_timing(spans):
+    """Server-Timing header value, one entry per stage (repeated stages summed)."""
+    totals = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
+
+
+def render(extra_gauges=()):
+    """The exposition text. ``extra_gauges`` are (name, help, {labels: value})
+    triples computed at scrape time, e.g. cache hit ratios."""
+    lines = []
+    for metric in (STAGE_SECONDS, REQUEST_SECONDS, REQUESTS, STAGE_ERRORS, IN_FLIGHT):
+        lines.extend(metric.render())
+    for name, help_text, series in extra_gauges:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in series.items():
+            names = tuple(k for k, _v in labels)
+            lines.append(f"{name}{_labels(names, tuple(v for _k, v in labels))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def configure_logging(level="INFO"):
+    """Give the ``docai`` logger a level and a stderr handler.
+
+    uvicorn only configures its own loggers, so without this everything
+    below WARNING (sampled query logs included) is dropped.
+    """
+    logger.setLevel(str(level).upper())
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+
+def log_sampled(event, rate, **fields):
+    """Log one JSON line for roughly ``rate`` of calls."""
+    if rate >= 1 or (rate > 0 and random.random() < rate):
+        logger.info(json.dumps({"event": event, **fields}, default=str))
@@ -0,0 +1,120 @@
+"""Micro-batching of small concurrent encode calls.
+
+Kept identical in DOCUMENT-AI.v01/app/core and REQUIREMENT-AI.v01/app/core:
+the two apps deploy separately and share no package, so change both copies
+together.
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Coalesce concurrent small encode calls into one forward pass.
+
+    Callers submit a few texts and get a future. A worker thread takes the
+    first waiting request, keeps collecting for up to ``window_ms`` or until
+    ``max_batch`` texts are queued, runs ``encode_fn`` once on all of them and
+    hands each caller its rows. While an encode is running new requests queue
+    up, so under load batches fill without waiting for the window.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], Any],
+        max_batch: int = 32,
+        window_ms: float = 2.0,
+        name: str = "embed",
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch = int(max_batch)
+        self.window_s = float(window_ms) / 1000
+        self._queue: "queue.Queue[Optional[Tuple[List[str], Future, float]]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._waits_ms = deque(maxlen=2048)
+        self._fills = deque(maxlen=2048)
+        self.batches = 0
+        self.requests = 0
+        self.texts = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name=f"microbatch-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, texts: Sequence[str]) -> Future:
+        future = Future()
+        if self._closed:
+            future.set_exception(RuntimeError("MicroBatcher is closed."))
+            return future
+        self._queue.put((list(texts), future, time.perf_counter()))
+        return future
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def close(self) -> None:
+        self._closed = True
+        self._queue.put(None)
+
+    def stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            waits = sorted(self._waits_ms)
+            fills = list(self._fills)
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "texts": self.texts,
+                "max_batch": self.max_batch,
+                "window_ms": self.window_s * 1000,
+                "mean_batch_fill": (sum(fills) / len(fills)) if fills else 0.0,
+                "requests_per_batch": (self.requests / self.batches) if self.batches else 0.0,
+                "wait_ms_p50": waits[len(waits) // 2] if waits else 0.0,
+                "wait_ms_p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+            }
+
+    def _collect(self, first: Tuple[List[str], Future, float]) -> Tuple[list, int]:
+        batch = [first]
+        size = len(first[0])
+        deadline = time.perf_counter() + self.window_s
+        while size < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # let the loop see the close marker
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch, size
+
+    def _loop(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, size = self._collect(first)
+            started = time.perf_counter()
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.texts += size
+                self._fills.append(min(1.0, size / self.max_batch))
+                self._waits_ms.extend((started - enqueued) * 1000 for _t, _f, enqueued in batch)
+            texts = [t for item in batch for t in item[0]]
+            try:
+                vectors = np.asarray(self.encode_fn(texts))
+            except Exception as e:
+                for _t, future, _e in batch:
+                    future.set_exception(e)
+                continue
+            start = 0
+            for item_texts, future, _e in batch:
+                future.set_result(vectors[start:start + len(item_texts)])
+                start += len(item_texts)
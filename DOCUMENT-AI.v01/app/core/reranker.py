@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import numpy as np
+
+DEFAULT_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+
+class CrossEncoderReranker:
+    """Second retrieval stage: rescore first-pass candidates with a small CPU
+    cross-encoder, all (query, chunk) pairs in one forward pass.
+
+    Scoring runs on a worker thread and is abandoned after ``budget_ms``;
+    callers then keep the first-pass order, so a slow rerank never delays an
+    answer by more than the budget. A slot is held until scoring really
+    finishes, so when every worker is still busy (with abandoned passes too)
+    new calls fall back at once instead of queueing behind them.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL, candidates=50, budget_ms=150, top_k=None,
+                 max_length=256, workers=2):
+        self.model_name = model_name
+        self.candidates = int(candidates)
+        self.budget_ms = float(budget_ms) if budget_ms else None
+        self.top_k = int(top_k) if top_k else None
+        self.max_length = int(max_length)
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=int(workers), thread_name_prefix="rerank")
+        self._slots = threading.BoundedSemaphore(int(workers))
+        self._stats_lock = threading.Lock()
+        self.reranked = 0
+        self.timeouts = 0
+        self.busy = 0
+        self.last_ms = None
+
+    def load(self):
+        self._get_model()
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def _get_model(self):
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+                self._model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+            return self._model
+
+    def _score(self, pairs):
+        return np.asarray(self._get_model().predict(pairs, batch_size=len(pairs), show_progress_bar=False))
+
+    def rerank_many(self, queries, candidate_rows, texts_for, k):
+        """Reorder each query's candidate rows and keep ``k``; ``texts_for``
+        maps a row id to its chunk text. Falls back to the first-pass order
+        if scoring fails or takes longer than the budget."""
+        k = min(k, self.top_k) if self.top_k else k
+        fallback = [rows[:k] for rows in candidate_rows]
+        pairs, owners = [], []
+        for qi, (query, rows) in enumerate(zip(queries, candidate_rows)):
+            for row in rows:
+                pairs.append((query, texts_for(row)))
+                owners.append((qi, row))
+        if not pairs:
+            return fallback
+
+        # The first call loads the model; do that outside the budget
+        self._get_model()
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self.busy += 1
+            return fallback
+        t0 = time.perf_counter()
+        try:
+            future = self._pool.submit(self._score, pairs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _f: self._slots.release())
+        try:
+            scores = future.result(timeout=self.budget_ms / 1000 if self.budget_ms else None)
+        except FutureTimeout:
+            # Only stops a pass that has not started; a running one frees its slot when done
+            future.cancel()
+            with self._stats_lock:
+                self.timeouts += 1
+            return fallback
+        except Exception as e:
+            logging.getLogger("docai").warning("Reranking failed, keeping first-pass order: %s", e)
+            return fallback
+        with self._stats_lock:
+            self.reranked += 1
+            self.last_ms = (time.perf_counter() - t0) * 1000
+
+        scored = [[] for _ in queries]
+        for (qi, row), score in zip(owners, scores):
+            scored[qi].append((float(score), row))
+        # Stable sort: equal scores keep first-pass order
+        return [[row for _s, row in sorted(items, key=lambda x: -x[0])[:k]] for items in scored]
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "model": self.model_name,
+                "reranked": self.reranked,
+                "timeouts": self.timeouts,
+                "busy": self.busy,
+                "last_ms": self.last_ms,
+                "budget_ms": self.budget_ms,
+            }
+
+
+def get_reranker(rerank_cfg):
+    """A reranker from the ``rerank`` config section, or None when disabled."""
+    rerank_cfg = dict(rerank_cfg or {})
+    if not rerank_cfg.pop("enabled", False):
+        return None
+    model_name = rerank_cfg.pop("model", DEFAULT_MODEL)
+    return CrossEncoderReranker(model_name, **rerank_cfg)
@@ -1,68 +1,348 @@
+import logging
 import os
+import json
+import shutil
 import numpy as np
-import faiss
 import pickle
-import yaml
-from app.core.embedder import embed_texts
+from app.core.config import get_config
+from app.core.embedder import embed_texts, embed_query, embed_queries
+from app.core import storage
+from app.core.index_cache import KeyedLocks, SessionIndexCache
+from app.core.chunk_store import ChunkStore, chunk_store_exists, write_chunk_store, append_chunk_store, filter_chunk_store
+from app.core import index_factory
+from app.core.bm25 import BM25Index, rrf_fuse
+from app.core.reranker import get_reranker
+from app.core.metrics import span
 from datetime import datetime
 
 
-with open("config/config.yaml") as f:
-    cfg = yaml.safe_load(f)
+logger = logging.getLogger("docai")
 
-def get_paths(session_id):
-    base_dir = os.path.join("data", f"session_{session_id}", "backup")
+# Cheap objects only; the embedding model and reranker load on first use
+cfg = get_config()
+
+index_cache = SessionIndexCache(**(cfg.get("index_cache") or {}))
+index_cfg = cfg.get("index") or {}
+retrieval_cfg = cfg.get("retrieval") or {}
+# Optional second stage; None unless rerank.enabled
+reranker = get_reranker(cfg.get("rerank"))
+
+# Appends/removals rewrite a session's files; serialize them per session
+_write_locks = KeyedLocks()
+
+def _paths_in(base_dir):
     return {
         "INDEX_PATH": os.path.join(base_dir, "faiss.index"),
+        "CHUNKS_PATH": os.path.join(base_dir, "chunks"),
+        "DOCS_PATH": os.path.join(base_dir, "documents.json"),
+        "BM25_PATH": os.path.join(base_dir, "bm25.npz"),
+        # Legacy pickle store, still read for sessions built before the chunk store
         "META_PATH": os.path.join(base_dir, "chunks.pkl")
     }
 
+def get_paths(session_id):
+    # The files of the session's live generation (see storage)
+    return _paths_in(storage.session_index_dir(session_id))
+
 
 def normalize_embeddings(vectors):
     norms = np.linalg.norm(vectors, axis=1, keepdims=True)
     return vectors / norms
 
-def build_index(text_chunks,session_id,force_rebuild):
-    paths = get_paths(session_id)
-    INDEX_PATH = paths["INDEX_PATH"]
-    META_PATH = paths["META_PATH"]
-    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+def index_exists(session_id):
+    try:
+        paths = get_paths(session_id)
+    except ValueError:
+        # Malformed ids never name an existing session
+        return False
+    has_chunks = chunk_store_exists(paths["CHUNKS_PATH"]) or os.path.exists(paths["META_PATH"])
+    return os.path.exists(paths["INDEX_PATH"]) and has_chunks
 
-    if os.path.exists(INDEX_PATH) and os.path.exists(META_PATH) and not force_rebuild:
-        print("Index already exists.")
-        return
+def embed_chunks(text_chunks):
+    vectors = embed_texts(text_chunks)
+    return normalize_embeddings(np.array(vectors).astype("float32"))
 
-    print("Building FAISS index...")
+def _session_lock(session_id):
+    return _write_locks.hold(session_id)
 
-    vectors = embed_texts(text_chunks)
-    vectors = normalize_embeddings(np.array(vectors).astype("float32"))
+def _make_index(vectors):
+    return index_factory.make_index(
+        vectors,
+        index_type=index_cfg.get("type", "auto") if len(vectors) else "flat",
+        target_recall=index_cfg.get("target_recall", 0.95),
+        nlist=index_cfg.get("nlist"),
+        hnsw_m=index_cfg.get("hnsw_m", 32),
+    )
+
+def _write_faiss(index, path):
+    import faiss
+    faiss.write_index(index, path)
+
+def _write_bm25(paths, text_chunks=None):
+    # Rebuilt from scratch: term statistics change whenever rows change
+    if text_chunks is None:
+        store = ChunkStore(paths["CHUNKS_PATH"])
+        try:
+            BM25Index.build(store).save(paths["BM25_PATH"])
+        finally:
+            store.close()
+    else:
+        BM25Index.build(text_chunks).save(paths["BM25_PATH"])
+
+def _base_documents(num_chunks):
+    # Sessions built without per-document tracking are one opaque document
+    return [{"doc_id": "base", "filename": None, "chunks": num_chunks}]
+
+def _write_documents(paths, documents):
+    with open(paths["DOCS_PATH"], "w", encoding="utf-8") as f:
+        json.dump(documents, f)
+
+def _write_generation(session_id, write):
+    """Run ``write(paths)`` into a fresh generation directory and switch the
+    session to it in one rename; if ``write`` fails the live files are untouched."""
+    gen_dir = storage.new_generation_dir(session_id)
+    try:
+        write(_paths_in(gen_dir))
+    except BaseException:
+        shutil.rmtree(gen_dir, ignore_errors=True)
+        raise
+    storage.switch_generation(session_id, gen_dir)
+    index_cache.invalidate(session_id)
+    storage.prune_generations(session_id)
+
+def list_documents(session_id):
+    # Documents own contiguous row ranges, in this order
+    path = get_paths(session_id)["DOCS_PATH"]
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    if not index_exists(session_id):
+        raise FileNotFoundError("FAISS index not found.")
+    # Read the row count from disk, not the cache: writers call this while
+    # holding the session lock, which a cache load also takes
+    return _base_documents(_stored_rows(get_paths(session_id)))
+
+def _stored_rows(paths):
+    if chunk_store_exists(paths["CHUNKS_PATH"]):
+        store = ChunkStore(paths["CHUNKS_PATH"])
+        try:
+            return len(store)
+        finally:
+            store.close()
+    with open(paths["META_PATH"], "rb") as f:
+        return len(pickle.load(f))
+
+@span("index_build")
+def write_index(vectors, text_chunks, session_id, metas=None, documents=None):
+    index = _make_index(vectors)
+
+    def write(paths):
+        write_chunk_store(paths["CHUNKS_PATH"], text_chunks, metas)
+        _write_documents(paths, documents or _base_documents(len(text_chunks)))
+        _write_bm25(paths, text_chunks)
+        _write_faiss(index, paths["INDEX_PATH"])
+
+    with _session_lock(session_id):
+        _write_generation(session_id, write)
 
-    dim = vectors.shape[1]
-    index = faiss.IndexFlatIP(dim) 
+def _close(chunks):
+    # Unmap the private copy so its generation can be deleted (Windows refuses mapped files)
+    if isinstance(chunks, ChunkStore):
+        chunks.close()
 
-    index.add(vectors)
+@span("index_build")
+def append_to_index(vectors, text_chunks, session_id, metas=None, documents=None):
+    with _session_lock(session_id):
+        documents_before = list_documents(session_id)
+        src = get_paths(session_id)
+        # Work on a private copy; the cached index may be serving queries
+        index, chunks = load_index(session_id, src)
+        index.add(vectors)
 
-    faiss.write_index(index, INDEX_PATH)
-    with open(META_PATH, "wb") as f:
-        pickle.dump(text_chunks, f)
+        def write(paths):
+            if isinstance(chunks, ChunkStore):
+                append_chunk_store(src["CHUNKS_PATH"], text_chunks, paths["CHUNKS_PATH"], metas)
+            else:
+                # Pickle-backed session: its rows move into the chunk store here
+                old_metas = None if metas is None else [{}] * len(chunks) + list(metas)
+                write_chunk_store(paths["CHUNKS_PATH"], list(chunks) + list(text_chunks), old_metas)
+            _write_bm25(paths)
+            _write_faiss(index, paths["INDEX_PATH"])
+            _write_documents(paths, documents_before + (documents or _base_documents(len(text_chunks))))
 
-    print("FAISS index saved.")
+        try:
+            _write_generation(session_id, write)
+        finally:
+            _close(chunks)
 
-def load_index(session_id):
-    paths = get_paths(session_id)
+@span("index_build")
+def remove_document(session_id, doc_id):
+    with _session_lock(session_id):
+        documents = list_documents(session_id)
+        start = 0
+        for pos, doc in enumerate(documents):
+            if doc["doc_id"] == doc_id:
+                break
+            start += doc["chunks"]
+        else:
+            raise KeyError(f"Document {doc_id} not found in session {session_id}.")
+        if len(documents) == 1:
+            raise ValueError("Cannot remove the only document in a session.")
+        end = start + documents[pos]["chunks"]
+
+        src = get_paths(session_id)
+        index, chunks = load_index(session_id, src)
+        keep = np.ones(index.ntotal, dtype=bool)
+        keep[start:end] = False
+        if index_factory.index_kind(index) == "flat":
+            # IndexFlat compacts in place and keeps the remaining rows in order
+            index.remove_ids(np.arange(start, end, dtype="int64"))
+        else:
+            # IVF/HNSW: rebuild from the stored vectors; nothing is re-embedded
+            index = _make_index(index_factory.reconstruct_all(index)[keep])
+        remaining = documents[:pos] + documents[pos + 1:]
+
+        def write(paths):
+            if isinstance(chunks, ChunkStore):
+                filter_chunk_store(src["CHUNKS_PATH"], keep, paths["CHUNKS_PATH"])
+            else:
+                write_chunk_store(paths["CHUNKS_PATH"], [c for c, k in zip(chunks, keep) if k])
+            _write_bm25(paths)
+            _write_faiss(index, paths["INDEX_PATH"])
+            _write_documents(paths, remaining)
+
+        try:
+            _write_generation(session_id, write)
+        finally:
+            _close(chunks)
+        return remaining
+
+def build_index(text_chunks,session_id,force_rebuild):
+    if index_exists(session_id) and not force_rebuild:
+        logger.info("Index already exists.")
+        return
+
+    logger.info("Building FAISS index...")
+
+    vectors = embed_chunks(text_chunks)
+    write_index(vectors, text_chunks, session_id)
+
+    logger.info("FAISS index saved.")
+
+def load_index(session_id, paths=None):
+    paths = paths or get_paths(session_id)
     INDEX_PATH = paths["INDEX_PATH"]
+    CHUNKS_PATH = paths["CHUNKS_PATH"]
     META_PATH = paths["META_PATH"]
 
     if not os.path.exists(INDEX_PATH):
         raise FileNotFoundError("FAISS index not found.")
+    import faiss
     index = faiss.read_index(INDEX_PATH)
-    with open(META_PATH, "rb") as f:
-        chunks = pickle.load(f)
+    if chunk_store_exists(CHUNKS_PATH):
+        chunks = ChunkStore(CHUNKS_PATH)
+    else:
+        with open(META_PATH, "rb") as f:
+            chunks = pickle.load(f)
+    if index.ntotal != len(chunks):
+        # FAISS row ids index the chunk rows; serving a mismatch returns the wrong clauses
+        _close(chunks)
+        raise RuntimeError(
+            f"Session {session_id}: index has {index.ntotal} vectors but {len(chunks)} chunk rows; refusing to serve it."
+        )
     return index, chunks
 
+def load_bm25(session_id, chunks, paths=None):
+    path = (paths or get_paths(session_id))["BM25_PATH"]
+    if os.path.exists(path):
+        return BM25Index.load(path)
+    # Sessions built before hybrid retrieval: index the chunks in memory
+    return BM25Index.build(chunks)
+
+@span("index_load")
+def _load_for_cache(session_id):
+    # Writers replace the index, chunk store and BM25 files one after another
+    # under this lock; loading under it too means the three always match
+    with _session_lock(session_id):
+        paths = get_paths(session_id)
+        index, chunks = load_index(session_id, paths)
+        bm25 = load_bm25(session_id, chunks, paths)
+    if len(bm25) != len(chunks):
+        _close(chunks)
+        raise RuntimeError(f"Session {session_id}: BM25 index has {len(bm25)} rows but {len(chunks)} chunks.")
+    if isinstance(chunks, ChunkStore):
+        chunk_bytes = chunks.resident_nbytes
+    else:
+        chunk_bytes = sum(len(c) for c in chunks)
+    nbytes = index.ntotal * index.d * 4 + chunk_bytes + bm25.nbytes
+    return (index, chunks, bm25), nbytes
+
+def get_session(session_id):
+    """(index, chunks, bm25) for a session, from the cache."""
+    return index_cache.get(session_id, _load_for_cache)
+
+def get_index(session_id):
+    index, chunks, _ = get_session(session_id)
+    return index, chunks
+
+def _search_rows(index, q_vecs, k):
+    # One index.search over the (N, d) query matrix; returns chunk row ids
+    q_vecs = normalize_embeddings(np.asarray(q_vecs, dtype="float32").reshape(-1, index.d))
+    _, I = index_factory.search(
+        index, q_vecs, k,
+        nprobe=index_cfg.get("nprobe"),
+        ef_search=index_cfg.get("ef_search"),
+    )
+    return [[int(i) for i in row if i >= 0] for row in I]
+
+def search_index_batch(q_vecs, session_id, k=5):
+    index, chunks = get_index(session_id)
+    return [[chunks[i] for i in row] for row in _search_rows(index, q_vecs, k)]
+
+def search_index(q_vec, session_id, k=5):
+    return search_index_batch(q_vec, session_id, k)[0]
+
+def _sources(chunks, rows):
+    # Document, file and page range of each row, where ingestion recorded them
+    if not isinstance(chunks, ChunkStore) or not chunks.has_meta:
+        return [{} for _ in rows]
+    return [chunks.meta(i) for i in rows]
+
+def _first_pass_rows(session, queries, q_vecs, k):
+    """Dense top-k, or with retrieval.hybrid (the default) the reciprocal-rank
+    fusion of dense and BM25 candidate lists, so exact terms such as clause
+    numbers and procedure names are found without raising k."""
+    index, _chunks, bm25 = session
+    if not retrieval_cfg.get("hybrid", True):
+        return _search_rows(index, q_vecs, k)
+    n = max(k, int(retrieval_cfg.get("candidates", 20)))
+    rrf_k = int(retrieval_cfg.get("rrf_k", 60))
+    dense = _search_rows(index, q_vecs, n)
+    return [rrf_fuse([rows, bm25.search(q, n)], k, rrf_k) for rows, q in zip(dense, queries)]
+
+def _retrieve_rows(session, queries, q_vecs, k):
+    if reranker is None:
+        with span("search"):
+            return _first_pass_rows(session, queries, q_vecs, k)
+    # Two-stage: a wide first pass, then cross-encoder rescoring down to k
+    chunks = session[1]
+    with span("search"):
+        candidates = _first_pass_rows(session, queries, q_vecs, max(k, reranker.candidates))
+    with span("rerank"):
+        return reranker.rerank_many(queries, candidates, lambda row: chunks[row], k)
+
+def retrieve_with_sources(query, session_id, k=5):
+    """Like retrieve_chunks, plus the source of each chunk for citations."""
+    session = get_session(session_id)
+    chunks = session[1]
+    rows = _retrieve_rows(session, [query], embed_query(query), k)[0]
+    return [chunks[i] for i in rows], _sources(chunks, rows)
+
 def retrieve_chunks(query,session_id, k=5):
-    index, chunks = load_index(session_id)
-    q_vec = embed_texts([query])
-    q_vec = normalize_embeddings(np.array(q_vec).astype("float32"))
-    _, I = index.search(q_vec, k)
-    return [chunks[i] for i in I[0]]
+    return retrieve_chunks_batch([query], session_id, k)[0]
+
+def retrieve_chunks_batch(queries, session_id, k=5):
+    session = get_session(session_id)
+    chunks = session[1]
+    rows = _retrieve_rows(session, queries, embed_queries(queries), k)
+    return [[chunks[i] for i in r] for r in rows]
@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+from app.core import storage
+
+REGISTRY_PATH = os.path.join(storage.DATA_ROOT, "sessions.json")
+
+
+class SessionRegistry:
+    """Creation time, last access, disk usage and status of every session.
+
+    Access times are kept in memory and written out on the reaper's tick, so
+    queries never write to disk. One process per node should own the reaper.
+    """
+
+    def __init__(self, path=REGISTRY_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._sessions = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._sessions = json.load(f)
+        self._recover_interrupted()
+
+    def _recover_interrupted(self):
+        # Jobs only live in this process's memory, so an "indexing" record
+        # loaded from disk belongs to a run that died mid-ingest. A failed
+        # append leaves the previous index in place; anything else failed.
+        recovered = False
+        for session_id, record in self._sessions.items():
+            if record["status"] == "indexing":
+                index_path = storage.session_index_path(session_id)
+                record["status"] = "ready" if os.path.exists(index_path) else "failed"
+                recovered = True
+        if recovered:
+            self._save()
+
+    def register(self, session_id, status="indexing"):
+        now = time.time()
+        with self._lock:
+            self._sessions[session_id] = {
+                "session_id": session_id,
+                "created_at": now,
+                "last_access": now,
+                "status": status,
+                "data_bytes": 0,
+                "upload_bytes": 0,
+            }
+            self._save()
+
+    def update(self, session_id, **fields):
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is None:
+                return
+            record.update(fields)
+            self._save()
+
+    def touch(self, session_id):
+        with self._lock:
+            record = self._sessions.get(session_id)
+            if record is not None:
+                record["last_access"] = time.time()
+
+    def get(self, session_id):
+        with self._lock:
+            record = self._sessions.get(session_id)
+            return dict(record) if record else None
+
+    def list(self):
+        with self._lock:
+            return [dict(r) for r in self._sessions.values()]
+
+    def discover(self):
+        """Adopt sessions found on disk that the registry does not know about."""
+        on_disk = storage.sessions_on_disk()
+        with self._lock:
+            for session_id in on_disk - set(self._sessions):
+                data_dir = storage.session_data_dir(session_id)
+                seen = [os.path.getmtime(p) for p in (data_dir, storage.session_upload_dir(session_id)) if os.path.exists(p)]
+                self._sessions[session_id] = {
+                    "session_id": session_id,
+                    "created_at": min(seen),
+                    "last_access": max(seen),
+                    "status": "ready" if os.path.exists(storage.session_index_path(session_id)) else "orphaned",
+                    "data_bytes": 0,
+                    "upload_bytes": 0,
+                }
+            # Forget sessions whose files were removed out of band
+            for session_id in set(self._sessions) - on_disk:
+                if self._sessions[session_id]["status"] != "indexing":
+                    del self._sessions[session_id]
+            self._save()
+
+    def refresh_sizes(self):
+        for record in self.list():
+            session_id = record["session_id"]
+            sizes = {
+                "data_bytes": storage.dir_size(storage.session_data_dir(session_id)),
+                "upload_bytes": storage.dir_size(storage.session_upload_dir(session_id)),
+            }
+            with self._lock:
+                if session_id in self._sessions:
+                    self._sessions[session_id].update(sizes)
+
+    def delete_uploads(self, session_id):
+        shutil.rmtree(storage.session_upload_dir(session_id), ignore_errors=True)
+        self.update(session_id, upload_bytes=0)
+
+    def delete(self, session_id):
+        from app.core.retriever import index_cache
+        shutil.rmtree(storage.session_data_dir(session_id), ignore_errors=True)
+        shutil.rmtree(storage.session_upload_dir(session_id), ignore_errors=True)
+        index_cache.invalidate(session_id)
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._save()
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self._sessions, f)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def reap(registry, ttl_s=None, max_bytes=None, max_sessions=None, delete_uploads=True):
+    """Apply the retention policy once; returns the ids of deleted sessions."""
+    registry.discover()
+    registry.refresh_sizes()
+    now = time.time()
+    deleted = []
+
+    # Uploads are only needed until the index is built
+    if delete_uploads:
+        for record in registry.list():
+            if record["status"] == "ready" and record["upload_bytes"]:
+                registry.delete_uploads(record["session_id"])
+
+    # Sessions that are still indexing are never reaped
+    candidates = sorted(
+        (r for r in registry.list() if r["status"] != "indexing"),
+        key=lambda r: r["last_access"],
+    )
+    if ttl_s:
+        for record in candidates:
+            if now - record["last_access"] > ttl_s:
+                registry.delete(record["session_id"])
+                deleted.append(record["session_id"])
+        candidates = [r for r in candidates if r["session_id"] not in deleted]
+
+    # Quotas: drop least recently used sessions until both limits hold
+    sessions = registry.list()
+    total_bytes = sum(r["data_bytes"] + r["upload_bytes"] for r in sessions)
+    count = len(sessions)
+    for record in candidates:
+        over_count = max_sessions is not None and count > max_sessions
+        over_bytes = max_bytes is not None and total_bytes > max_bytes
+        if not (over_count or over_bytes):
+            break
+        registry.delete(record["session_id"])
+        deleted.append(record["session_id"])
+        count -= 1
+        total_bytes -= record["data_bytes"] + record["upload_bytes"]
+
+    registry.save()
+    return deleted
+
+
+class Reaper:
+    def __init__(self, registry, interval_s=300, **policy):
+        self.registry = registry
+        self.interval_s = float(interval_s)
+        self.policy = policy
+        self.last_run = None
+        self.last_deleted = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="session-reaper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        self.last_deleted = reap(self.registry, **self.policy)
+        self.last_run = time.time()
+        return self.last_deleted
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.getLogger("docai").exception("Session reaper failed: %s", e)
+            self._stop.wait(self.interval_s)
+
+
+registry = SessionRegistry()
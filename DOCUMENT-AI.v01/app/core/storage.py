@@ -0,0 +1,174 @@
+import hashlib
+import os
+import re
+import secrets
+import shutil
+import time
+
+# Where each session keeps its files; everything that needs a session path
+# goes through here so the layout can change in one place.
+#
+#   data/sessions/<shard>/session_<id>/           index, chunk store, documents
+#   temp_uploads/<shard>/session_<id>/<doc_id>/   uploaded files until indexed
+#
+# A session's index files live in backup/g<N>/, one directory per write, and
+# backup/CURRENT names the live one. Writers fill a fresh generation and then
+# switch CURRENT, so readers always see one complete set of files. Sessions
+# written before generations keep their files directly in backup/.
+#
+# <shard> is the first two hex digits of sha1(id), so no directory holds more
+# than 1/256 of the sessions. Sessions created before sharding live directly
+# under data/ and temp_uploads/ and are still found there.
+DATA_ROOT = "data"
+SESSIONS_ROOT = os.path.join(DATA_ROOT, "sessions")
+UPLOAD_ROOT = "temp_uploads"
+SESSION_PREFIX = "session_"
+
+CURRENT_FILE = "CURRENT"
+_GENERATION = re.compile(r"^g(\d+)$")
+
+_SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_CROCKFORD = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def new_session_id():
+    """A ULID: 48-bit millisecond timestamp plus 80 random bits, Crockford base32.
+
+    Ids sort by creation time and two uploads in the same millisecond still
+    get different ids.
+    """
+    value = (int(time.time() * 1000) << 80) | secrets.randbits(80)
+    chars = []
+    for _ in range(26):
+        chars.append(_CROCKFORD[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def check_session_id(session_id):
+    # Session ids come from clients and end up in paths
+    if not _SESSION_ID.match(session_id or ""):
+        raise ValueError("Invalid session id.")
+    return session_id
+
+
+def _shard(session_id):
+    return hashlib.sha1(session_id.encode("utf-8")).hexdigest()[:2]
+
+
+def _session_dir(root, sharded_root, session_id):
+    check_session_id(session_id)
+    name = f"{SESSION_PREFIX}{session_id}"
+    legacy = os.path.join(root, name)
+    if os.path.isdir(legacy):
+        return legacy
+    return os.path.join(sharded_root, _shard(session_id), name)
+
+
+def session_data_dir(session_id):
+    return _session_dir(DATA_ROOT, SESSIONS_ROOT, session_id)
+
+
+def session_upload_dir(session_id):
+    return _session_dir(UPLOAD_ROOT, UPLOAD_ROOT, session_id)
+
+
+def session_backup_dir(session_id):
+    return os.path.join(session_data_dir(session_id), "backup")
+
+
+def session_index_dir(session_id):
+    """Directory with the session's live index files (the current generation)."""
+    base = session_backup_dir(session_id)
+    try:
+        with open(os.path.join(base, CURRENT_FILE), encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return base
+    if not _GENERATION.match(name):
+        raise ValueError(f"Corrupt {CURRENT_FILE} pointer in {base}.")
+    return os.path.join(base, name)
+
+
+def session_index_path(session_id):
+    return os.path.join(session_index_dir(session_id), "faiss.index")
+
+
+def _generations(base):
+    if not os.path.isdir(base):
+        return []
+    return sorted(int(m.group(1)) for m in map(_GENERATION.match, os.listdir(base)) if m)
+
+
+def new_generation_dir(session_id):
+    """An empty directory for the session's next set of index files."""
+    base = session_backup_dir(session_id)
+    os.makedirs(base, exist_ok=True)
+    number = (_generations(base) or [0])[-1] + 1
+    while True:
+        path = os.path.join(base, f"g{number:06d}")
+        try:
+            os.mkdir(path)
+            return path
+        except FileExistsError:
+            number += 1
+
+
+def switch_generation(session_id, generation_dir):
+    """Make ``generation_dir`` the live one in a single rename."""
+    base = session_backup_dir(session_id)
+    pointer = os.path.join(base, CURRENT_FILE)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(os.path.basename(generation_dir))
+    os.replace(pointer + ".tmp", pointer)
+
+
+def prune_generations(session_id):
+    """Delete generations other than the live one, and pre-generation files."""
+    base = session_backup_dir(session_id)
+    live = os.path.basename(session_index_dir(session_id))
+    for name in os.listdir(base):
+        path = os.path.join(base, name)
+        if name in (live, CURRENT_FILE):
+            continue
+        if os.path.isdir(path):
+            if _GENERATION.match(name):
+                # A file still mapped elsewhere cannot be deleted on Windows;
+                # whatever is left is retried after the next write
+                shutil.rmtree(path, ignore_errors=True)
+        elif live != "backup":
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _session_names(root):
+    if not os.path.isdir(root):
+        return []
+    return [
+        name[len(SESSION_PREFIX):] for name in os.listdir(root)
+        if name.startswith(SESSION_PREFIX) and os.path.isdir(os.path.join(root, name))
+    ]
+
+
+def sessions_on_disk():
+    """Session ids with a data or upload directory, in either layout."""
+    found = set()
+    for root, sharded_root in ((DATA_ROOT, SESSIONS_ROOT), (UPLOAD_ROOT, UPLOAD_ROOT)):
+        found.update(_session_names(root))
+        if os.path.isdir(sharded_root):
+            for shard in os.listdir(sharded_root):
+                found.update(_session_names(os.path.join(sharded_root, shard)))
+    return found
+
+
+def dir_size(path):
+    total = 0
+    for dirpath, _dirnames, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
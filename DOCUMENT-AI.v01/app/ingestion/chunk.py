@@ -1,7 +1,36 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import bisect
 
 def chunk_text(text: str, chunk_size=500, overlap=50):
+    # langchain takes most of a second to import; only pay for it when chunking
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
     splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=overlap)
     return splitter.split_text(text)
 
+def chunk_pages(pages, chunk_size=500, overlap=50):
+    """Chunk the concatenated pages and return (chunks, spans), where spans[i]
+    is the 1-based (first, last) page that chunk i was cut from."""
+    text = "".join(pages)
+    page_ends = []
+    end = 0
+    for page in pages:
+        end += len(page)
+        page_ends.append(end)
+
+    def page_at(offset):
+        return bisect.bisect_right(page_ends, offset) + 1
+
+    chunks = chunk_text(text, chunk_size, overlap)
+    spans = []
+    cursor = 0
+    for chunk in chunks:
+        # Chunks come out in order and overlap, so search forward from the last hit
+        start = text.find(chunk, cursor)
+        if start < 0:
+            start = cursor
+        else:
+            cursor = start + 1
+        last = min(page_at(start + max(len(chunk) - 1, 0)), len(pages))
+        spans.append((min(page_at(start), last), last))
+    return chunks, spans
+
 #print(chunk_text('''Paragraphs are the building blocks of papers. Many students define paragraphs in terms of length: a paragraph is a group of at least five sentences, a paragraph is half a page long, etc. In reality, though, the unity and coherence of ideas among sentences is what constitutes a paragraph. A paragraph is defined as “a group of sentences or a single sentence that forms a unit” (Lunsford and Connors 116). Length and appearance do not determine whether a section in a paper is a paragraph. For instance, in some styles of writing, particularly journalistic styles, a paragraph can be just one sentence long. Ultimately, a paragraph is a sentence or group of sentences that support one main idea. In this handout, we will refer to this as the “controlling idea,” because it controls what happens in the rest of the paragraph.How do I decide what to put in a paragraph?Before you can begin to determine what the composition of a particular paragraph will be, you must first decide on an argument and a working thesis statement for your paper. What is the most important idea that you are trying to convey to your reader? The information in each paragraph must be related to that idea. In other words, your paragraphs should remind your reader that there is a recurrent relationship between your thesis and the information in each paragraph. A working thesis functions like a seed from which your paper, and your ideas, will grow. The whole process is an organic one—a natural progression from a seed to a full-blown paper where there are direct, familial relationships between all of the ideas in the paper.The decision about what to put into your paragraphs begins with the germination of a seed of ideas; this “germination process” is better known as brainstorming. There are many techniques for brainstorming; whichever one you choose, this stage of paragraph development cannot be skipped. Building paragraphs can be like building a skyscraper: there must be a well-planned foundation that supports what you are building. Any cracks, inconsistencies, or other corruptions of the foundation can cause your whole paper to crumble.So, let’s suppose that you have done some brainstorming to develop your thesis. What else should you keep in mind as you begin to create paragraphs? Every paragraph in a paper should be'''))
\ No newline at end of file
@@ -0,0 +1,217 @@
+import copy
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Keep this module light: spawned pool workers import it to find their task
+# functions, so the embedder/retriever are only imported inside the job runner.
+from app.ingestion.load import load_content, pdf_page_count, extract_pdf_pages
+from app.ingestion.chunk import chunk_pages
+from app.core.metrics import span
+
+STAGES = ("extract", "embed", "index")
+JOB_RETENTION_S = 3600
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+_process_pool = None
+_pool_lock = threading.Lock()
+# Embedding and index writes stay in this process (the model is loaded here);
+# a small thread pool bounds how many of them run at once.
+_runner = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ingest")
+
+
+def _load_whole(file_path):
+    return [load_content(file_path)]
+
+
+def _ingest_cfg():
+    from app.core.config import section
+    return section("ingestion")
+
+
+def _ingest_workers():
+    workers = _ingest_cfg().get("workers")
+    return int(workers) if workers else min(4, os.cpu_count() or 1)
+
+
+def _submit_extraction(pool, file_path, pages_per_task):
+    """Submit a file's extraction as page-range tasks; returns (futures, page_count)."""
+    if not file_path.endswith(".pdf"):
+        return [pool.submit(_load_whole, file_path)], None
+    n_pages = pdf_page_count(file_path)
+    return [
+        pool.submit(extract_pdf_pages, file_path, start, min(start + pages_per_task, n_pages))
+        for start in range(0, n_pages, pages_per_task)
+    ], n_pages
+
+
+def _get_process_pool():
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            # spawn: forking a process that holds torch/faiss threads can deadlock
+            _process_pool = ProcessPoolExecutor(
+                max_workers=_ingest_workers(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def _update(job, **fields):
+    with _jobs_lock:
+        job.update(fields)
+
+
+def _update_stage(job, stage, **fields):
+    with _jobs_lock:
+        job["stages"][stage].update(fields)
+        if fields.get("status") == "running":
+            job["stage"] = stage
+
+
+def _prune_finished():
+    cutoff = time.time() - JOB_RETENTION_S
+    for session_id, job in list(_jobs.items()):
+        if job["finished_at"] and job["finished_at"] < cutoff:
+            del _jobs[session_id]
+
+
+class IngestionBusy(RuntimeError):
+    """The session already has an ingestion job queued or running."""
+
+
+def _active(job):
+    return job is not None and job["status"] in ("queued", "running")
+
+
+def job_active(session_id):
+    with _jobs_lock:
+        return _active(_jobs.get(session_id))
+
+
+def new_doc_id():
+    return uuid.uuid4().hex[:12]
+
+
+def start_ingestion(session_id, documents, append=False):
+    """Index ``documents`` ({"doc_id", "filename", "path"}) into a session.
+
+    With ``append`` the chunks are added to the session's existing index
+    instead of replacing it. Raises IngestionBusy if a job for the session
+    is still queued or running; one job per session at a time is what lets
+    a finished job mark the session ready.
+    """
+    job = {
+        "session_id": session_id,
+        "mode": "append" if append else "create",
+        "status": "queued",
+        "stage": None,
+        "stages": {stage: {"status": "pending", "done": 0, "total": 0, "ms": None} for stage in STAGES},
+        "files": [
+            {"doc_id": d["doc_id"], "filename": d["filename"], "status": "queued", "chunks": 0}
+            for d in documents
+        ],
+        "error": None,
+        "created_at": time.time(),
+        "finished_at": None,
+    }
+    job["stages"]["extract"]["total"] = len(documents)
+    with _jobs_lock:
+        if _active(_jobs.get(session_id)):
+            raise IngestionBusy(f"Session {session_id} is already being indexed.")
+        _prune_finished()
+        _jobs[session_id] = job
+    _runner.submit(_run_job, job, [d["path"] for d in documents], append)
+    return get_job(session_id)
+
+
+def get_job(session_id):
+    with _jobs_lock:
+        job = _jobs.get(session_id)
+        return copy.deepcopy(job) if job is not None else None
+
+
+def _run_job(job, file_paths, append=False):
+    from app.core.retriever import embed_chunks, write_index, append_to_index
+    from app.core.sessions import registry
+
+    _update(job, status="running")
+    try:
+        t0 = time.perf_counter()
+        _update_stage(job, "extract", status="running")
+        pool = _get_process_pool()
+        pages_per_task = int(_ingest_cfg().get("pages_per_task", 32))
+        # Queue every page range of every file up front so the pool stays busy
+        submitted = []
+        for p in file_paths:
+            try:
+                submitted.append(_submit_extraction(pool, p, pages_per_task))
+            except Exception as e:
+                submitted.append(e)
+        all_chunks = []
+        metas = []
+        documents = []
+        # Collect in submission order so each document owns a contiguous row range
+        for i, tasks in enumerate(submitted):
+            doc_id, filename = job["files"][i]["doc_id"], job["files"][i]["filename"]
+            try:
+                if isinstance(tasks, Exception):
+                    raise tasks
+                futures, n_pages = tasks
+                with span("extract"):
+                    pages = [page for fut in futures for page in fut.result()]
+                with span("chunk"):
+                    chunks, spans = chunk_pages(pages)
+                all_chunks.extend(chunks)
+                for first, last in spans:
+                    meta = {"doc_id": doc_id, "file": filename}
+                    if n_pages is not None:
+                        meta.update(page=first, page_end=last)
+                    metas.append(meta)
+                if chunks:
+                    documents.append({"doc_id": doc_id, "filename": filename, "chunks": len(chunks)})
+                file_update = {"status": "parsed", "chunks": len(chunks), "pages": n_pages}
+            except Exception as e:
+                file_update = {"status": "failed", "error": str(e)}
+            with _jobs_lock:
+                job["files"][i].update(file_update)
+                job["stages"]["extract"]["done"] += 1
+        _update_stage(job, "extract", status="done", ms=int((time.perf_counter() - t0) * 1000))
+        if not all_chunks:
+            raise ValueError("No text could be extracted from the uploaded documents.")
+
+        t0 = time.perf_counter()
+        _update_stage(job, "embed", status="running", total=len(all_chunks))
+        vectors = embed_chunks(all_chunks)
+        _update_stage(job, "embed", status="done", done=len(all_chunks), ms=int((time.perf_counter() - t0) * 1000))
+
+        t0 = time.perf_counter()
+        _update_stage(job, "index", status="running", total=len(all_chunks))
+        if append:
+            append_to_index(vectors, all_chunks, job["session_id"], metas=metas, documents=documents)
+        else:
+            write_index(vectors, all_chunks, job["session_id"], metas=metas, documents=documents)
+        _update_stage(job, "index", status="done", done=len(all_chunks), ms=int((time.perf_counter() - t0) * 1000))
+
+        _update(job, status="ready", stage=None, finished_at=time.time())
+        registry.update(job["session_id"], status="ready")
+    except Exception as e:
+        with _jobs_lock:
+            if job["stage"]:
+                job["stages"][job["stage"]]["status"] = "failed"
+            job.update(status="failed", error=str(e), finished_at=time.time())
+        # A failed append leaves the existing index usable
+        registry.update(job["session_id"], status="ready" if append else "failed")
+
+
+def shutdown():
+    global _process_pool
+    _runner.shutdown(wait=False, cancel_futures=True)
+    with _pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
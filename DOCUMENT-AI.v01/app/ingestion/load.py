@@ -1,6 +1,7 @@
 import os
-import fitz #PyMuPDF
-import docx
+
+# PyMuPDF and python-docx are imported where they are used, so importing the
+# API does not pay for them; ingestion workers import them once per process.
 
 def load_content(file_path: str) -> str:
     if file_path.endswith(".pdf"):
@@ -10,14 +11,29 @@ def load_content(file_path: str) -> str:
     else:
         raise ValueError("Unsupported file type. Only .pdf and .docx are supported.")
 
-def extract_pdf(file_path):
-    text = ""
+def load_pages(file_path: str) -> list:
+    """Text per page; a DOCX has no pages and comes back as a single one."""
+    if file_path.endswith(".pdf"):
+        return extract_pdf_pages(file_path)
+    return [load_content(file_path)]
+
+def pdf_page_count(file_path):
+    import fitz  # PyMuPDF
     with fitz.open(file_path) as doc:
-        for page in doc:
-            text += page.get_text()
-    return text
+        return doc.page_count
+
+def extract_pdf_pages(file_path, start=0, stop=None):
+    # A page range, so large PDFs can be split across worker processes
+    import fitz  # PyMuPDF
+    with fitz.open(file_path) as doc:
+        stop = doc.page_count if stop is None else min(stop, doc.page_count)
+        return [doc[i].get_text() for i in range(start, stop)]
+
+def extract_pdf(file_path):
+    return "".join(extract_pdf_pages(file_path))
 
 def extract_docx(file_path):
+    import docx
     doc = docx.Document(file_path)
     return "\n".join([para.text for para in doc.paragraphs if para.text.strip()])
 
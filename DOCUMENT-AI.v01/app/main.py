@@ -1,13 +1,22 @@
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from app.core.retriever import retrieve_chunks, build_index
-from app.core.engine import evaluate_decision
-from app.ingestion.load import load_content
-from app.ingestion.chunk import chunk_text
-from typing import List
-from datetime import datetime
+from app.core.retriever import index_exists, list_documents, remove_document, retrieve_chunks_batch
+from app.core.engine import answer_query, stream_answer, evaluate_decision, warm_up
+from app.core.config import get_config
+from app.core import embedder, engine, metrics, retriever, storage
+from app.core.sessions import registry, Reaper
+from app.ingestion import jobs
+from app.ingestion.jobs import IngestionBusy, start_ingestion, get_job, job_active, new_doc_id
+from typing import List, Optional
 import os
+import json
+import shutil
+import asyncio
+import threading
+import time
 
 app = FastAPI(
     title="DOCUMENT-AI v0.1",
@@ -29,63 +38,386 @@ class QueryRequest(BaseModel):
     query: str
     session_id : str
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    session_id: str
+    k: int = 5
+    concurrency: Optional[int] = None
+
+cfg = get_config()
+
+# metrics.server_timing adds a Server-Timing header with per-stage times;
+# metrics.log_sample_rate is the share of queries logged as JSON lines and
+# metrics.log_level the level of the "docai" logger they go to
+metrics_cfg = cfg.get("metrics") or {}
+metrics.configure_logging(metrics_cfg.get("log_level", "INFO"))
+SERVER_TIMING = bool(metrics_cfg.get("server_timing", False))
+LOG_SAMPLE_RATE = float(metrics_cfg.get("log_sample_rate", 0.01))
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    spans = metrics.start_trace()
+    metrics.IN_FLIGHT.add(1)
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        metrics.IN_FLIGHT.add(-1)
+        # Label by route template, not raw path, so session ids don't explode cardinality
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - t0, request.method, route)
+        metrics.REQUESTS.inc(request.method, route, str(status))
+    if SERVER_TIMING and spans:
+        response.headers["Server-Timing"] = metrics.server_timing(spans)
+    return response
+
+# Upper bound on concurrent LLM calls per /query_batch request
+BATCH_MAX_CONCURRENCY = int((cfg.get("query_batch") or {}).get("max_concurrency", 8))
+
+# Session retention: TTL on last access, count/disk quotas, upload cleanup
+sessions_cfg = cfg.get("sessions") or {}
+reaper = Reaper(
+    registry,
+    interval_s=sessions_cfg.get("reap_interval_s", 300),
+    ttl_s=sessions_cfg.get("ttl_s", 7 * 24 * 3600),
+    max_bytes=sessions_cfg.get("max_bytes"),
+    max_sessions=sessions_cfg.get("max_sessions"),
+    delete_uploads=sessions_cfg.get("delete_uploads_after_index", True),
+)
+
+# Models load in the background after startup so the process answers
+# liveness checks at once; /ready turns 200 when warm-up has finished.
+_warmup = {"status": "pending", "error": None, "ms": None}
+
+def _run_warmup():
+    _warmup["status"] = "running"
+    t0 = time.perf_counter()
+    try:
+        warm_up()
+        _warmup["status"] = "done"
+    except Exception as e:
+        _warmup.update(status="failed", error=str(e))
+    _warmup["ms"] = int((time.perf_counter() - t0) * 1000)
+
+@app.on_event("startup")
+def start_session_reaper():
+    reaper.start()
+
+@app.on_event("startup")
+def start_warmup():
+    if os.environ.get("DOCAI_WARMUP", "1") == "0" or not cfg.get("warmup", True):
+        # Models load on the first request that needs them
+        _warmup["status"] = "disabled"
+        return
+    threading.Thread(target=_run_warmup, name="warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_ingestion_workers():
+    jobs.shutdown()
+    reaper.stop()
+    registry.save()
+
 @app.get("/")
 def root():
     return {"message": "Document-AI v.01 is live!"}
 
+@app.get("/ready")
+def ready():
+    """Readiness, as opposed to liveness ("/"): 503 until warm-up has loaded the models."""
+    components = {"embedder": embedder.model_loaded(), "llm": engine.model_loaded()}
+    if retriever.reranker is not None:
+        components["reranker"] = retriever.reranker.loaded
+    is_ready = _warmup["status"] in ("done", "disabled")
+    body = {"ready": is_ready, "warmup": dict(_warmup), "components": components}
+    return body if is_ready else JSONResponse(status_code=503, content=body)
+
+def _not_ready(session_id):
+    job = get_job(session_id)
+    # An append job leaves the existing index queryable while it runs
+    if job is None or job["status"] == "ready" or job["mode"] == "append":
+        return None
+    if job["status"] == "failed":
+        return {"status": "failed", "session_id": session_id, "error": f"Indexing failed: {job['error']}"}
+    return {
+        "status": "not_ready",
+        "session_id": session_id,
+        "stage": job["stage"],
+        "error": "Documents for this session are still being indexed. Try again shortly."
+    }
+
+@app.get("/sessions/{session_id}/status")
+def session_status(session_id: str):
+    job = get_job(session_id)
+    if job is not None:
+        return job
+    if index_exists(session_id):
+        return {"session_id": session_id, "status": "ready"}
+    return {"session_id": session_id, "status": "unknown", "error": "Unknown session."}
+
 @app.post("/query")
 def query_docs(request: QueryRequest):
     session_id = request.session_id
+    pending = _not_ready(session_id)
+    if pending is not None:
+        return pending
+    registry.touch(session_id)
+    try:
+        t0 = time.perf_counter()
+        result = answer_query(request.query, session_id, k=5)
+        metrics.log_sampled(
+            "query", LOG_SAMPLE_RATE,
+            session_id=session_id,
+            query_chars=len(request.query),
+            clauses=len(result["retrieved_clauses"]),
+            answer_chars=len(result["response"] or ""),
+            ms=round((time.perf_counter() - t0) * 1000, 1),
+        )
+        return result
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.post("/query_batch")
+async def query_batch(request: BatchQueryRequest):
+    session_id = request.session_id
+    pending = _not_ready(session_id)
+    if pending is not None:
+        return pending
+    if not request.queries:
+        return {"error": "No queries given."}
+    registry.touch(session_id)
     try:
-        relevant_chunks = retrieve_chunks(request.query,session_id, k=5)
-        answer = evaluate_decision(request.query,session_id)
-        print("Query received:", request.query)
-        print("Chunks retrieved:", relevant_chunks)
-        print("Answer returned:", answer)
+        # One batched encode and one matrix search for all queries
+        retrieved = await run_in_threadpool(retrieve_chunks_batch, request.queries, session_id, request.k)
+    except Exception as e:
+        return {"error": str(e)}
+
+    concurrency = max(1, min(request.concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    limit = asyncio.Semaphore(concurrency)
+
+    async def answer(i, query, chunks):
+        async with limit:
+            try:
+                response = await run_in_threadpool(evaluate_decision, query, session_id, chunks)
+                return {"index": i, "query": query, "response": response, "retrieved_clauses": chunks}
+            except Exception as e:
+                return {"index": i, "query": query, "error": str(e)}
+
+    async def lines():
+        tasks = [asyncio.create_task(answer(i, q, c)) for i, (q, c) in enumerate(zip(request.queries, retrieved))]
+        try:
+            # NDJSON in completion order; "index" ties each line back to its query
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/query/stream")
+def query_docs_stream(request: QueryRequest):
+    pending = _not_ready(request.session_id)
+    registry.touch(request.session_id)
+
+    def events():
+        if pending is not None:
+            yield _sse("error", pending)
+            return
+        try:
+            for event, data in stream_answer(request.query, request.session_id, k=5):
+                yield _sse(event, data)
+        except Exception as e:
+            yield _sse("error", {"error": str(e)})
+
+    # Server-Sent Events: "clauses" right after retrieval, "token" per model chunk, then "done"
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def _discard_uploads(session_id, documents):
+    for d in documents:
+        shutil.rmtree(os.path.join(storage.session_upload_dir(session_id), d["doc_id"]), ignore_errors=True)
+
+async def _save_uploads(session_id, uploaded_files):
+    documents = []
+    with metrics.span("file_save"):
+        try:
+            for uploaded_file in uploaded_files:
+                contents = await uploaded_file.read()
+                doc_id = new_doc_id()
+                documents.append({"doc_id": doc_id, "filename": uploaded_file.filename, "path": None})
+                file_path = os.path.join(storage.session_upload_dir(session_id), doc_id, uploaded_file.filename)
+                os.makedirs(os.path.dirname(file_path), exist_ok=True)
+                with open(file_path, "wb") as f:
+                    f.write(contents)
+                documents[-1]["path"] = file_path
+        except BaseException:
+            # Disk full, bad filename...: leave nothing half-saved behind
+            _discard_uploads(session_id, documents)
+            raise
+    return documents
+
+def _busy(session_id):
+    return {
+        "status": "busy",
+        "session_id": session_id,
+        "error": "Documents are already being added to this session. Try again once the status reports ready."
+    }
+
+@app.get("/sessions/{session_id}/documents")
+def session_documents(session_id: str):
+    try:
+        return {"session_id": session_id, "documents": list_documents(session_id)}
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.post("/sessions/{session_id}/documents")
+async def add_documents(session_id: str, uploaded_files: List[UploadFile] = File(...)):
+    pending = _not_ready(session_id)
+    if pending is not None:
+        return pending
+    if not index_exists(session_id):
+        return {"error": "Unknown session."}
+    # One ingestion job per session: a second append would replace the first
+    # job's status and could see the session marked ready while it still runs
+    if job_active(session_id):
+        return _busy(session_id)
+    try:
+        registry.update(session_id, status="indexing")
+        documents = await _save_uploads(session_id, uploaded_files)
+        # Only the new files are parsed and embedded; their chunks are appended
+        try:
+            start_ingestion(session_id, documents, append=True)
+        except IngestionBusy:
+            # Another add started while these files were being saved
+            _discard_uploads(session_id, documents)
+            return _busy(session_id)
         return {
-            "query": request.query,
-            "response": answer,
-            "retrieved_clauses": relevant_chunks
+            "status": "accepted",
+            "session_id": session_id,
+            "documents": [{"doc_id": d["doc_id"], "filename": d["filename"]} for d in documents],
+            "status_url": f"/sessions/{session_id}/status",
+            "message": "Documents received. They become searchable once the status reports ready."
         }
     except Exception as e:
+        if not job_active(session_id):
+            # Nothing was queued; the existing index is still the session's
+            registry.update(session_id, status="ready")
         return {"error": str(e)}
 
+@app.delete("/sessions/{session_id}/documents/{doc_id}")
+def delete_document(session_id: str, doc_id: str):
+    try:
+        remaining = remove_document(session_id, doc_id)
+        return {"status": "removed", "session_id": session_id, "doc_id": doc_id, "documents": remaining}
+    except KeyError as e:
+        return {"error": e.args[0]}
+    except Exception as e:
+        return {"error": str(e)}
 
 
 @app.post("/upload_docs")
 async def upload_docs(uploaded_files: List[UploadFile] = File(...)):
-    responses = []
-    alltext_chunks = []
-    session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-    index_dir = f"session_{session_id}"
+    session_id = storage.new_session_id()
 
     try:
-        for uploaded_file in uploaded_files:
-            contents = await uploaded_file.read()
-            file_path = f"temp_uploads/{index_dir}/{uploaded_file.filename}"
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, "wb") as f:
-                f.write(contents)
-
-            raw_text = load_content(file_path)
-            text_chunks = chunk_text(raw_text)
-            alltext_chunks.extend(text_chunks)
+        registry.register(session_id)
+        documents = await _save_uploads(session_id, uploaded_files)
+        responses = [{
+            "filename": d["filename"],
+            "doc_id": d["doc_id"],
+            "status": "queued for indexing" ,
+            "session_id": session_id 
+        } for d in documents]
 
-            responses.append({
-                "filename": uploaded_file.filename,
-                "status": "parsed and added to combined index" ,
-                "session_id": session_id 
-            })
-
-        build_index(alltext_chunks, session_id, force_rebuild=True)
+        # Extraction, embedding and indexing run off the event loop
+        start_ingestion(session_id, documents)
 
         return {
-            "status": "success",
+            "status": "accepted",
             "indexed_files": responses,
             "session_id": session_id ,
-            "message": "All uploaded documents parsed and indexed into a single index."
+            "status_url": f"/sessions/{session_id}/status",
+            "message": "Documents received. Indexing runs in the background; poll the status URL until it reports ready."
         }
 
     except Exception as e:
+        if not job_active(session_id):
+            # Nothing was queued: a session left "indexing" would never be reaped
+            registry.update(session_id, status="failed")
+            registry.delete_uploads(session_id)
         return {"error": str(e)}
 
+
+@app.get("/admin/sessions")
+def admin_sessions():
+    """Registered sessions with disk usage, plus the retention limits in force."""
+    sessions = sorted(registry.list(), key=lambda r: r["last_access"], reverse=True)
+    return {
+        "sessions": sessions,
+        "totals": {
+            "sessions": len(sessions),
+            "data_bytes": sum(r["data_bytes"] for r in sessions),
+            "upload_bytes": sum(r["upload_bytes"] for r in sessions),
+        },
+        "limits": {"interval_s": reaper.interval_s, **reaper.policy},
+        "last_reap": {"at": reaper.last_run, "deleted": reaper.last_deleted},
+    }
+
+def _ratio(stats):
+    lookups = stats["hits"] + stats["misses"]
+    return stats["hits"] / lookups if lookups else 0.0
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus text exposition: stage and request histograms, in-flight
+    gauge, and cache hit ratios for this worker process."""
+    from app.core.embed_cache import get_embedding_cache
+    embed_cache = get_embedding_cache(embedder.MODEL_NAME, embedder.get_backend_name())
+    ratios = {
+        (("cache", "index"),): _ratio(retriever.index_cache.stats()),
+        (("cache", "answer"),): _ratio(engine.answer_cache.stats()),
+        (("cache", "query_embedding"),): _ratio({
+            "hits": embedder.query_cache_hits, "misses": embedder.query_cache_misses,
+        }),
+    }
+    if embed_cache is not None:
+        ratios[(("cache", "embedding"),)] = _ratio(embed_cache.stats())
+    gauges = [("docai_cache_hit_ratio", "Cache hits over lookups since start.", ratios)]
+    batcher = embedder.get_query_batcher()
+    if batcher is not None:
+        mb = batcher.stats()
+        gauges.append(("docai_microbatch_fill", "Mean query micro-batch fill (0-1).", {(): mb["mean_batch_fill"]}))
+        gauges.append(("docai_microbatch_wait_p95_seconds", "p95 wait added by micro-batching.",
+                       {(): mb["wait_ms_p95"] / 1000}))
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+@app.get("/admin/stats")
+def admin_stats():
+    """Cache and batching counters for this worker process."""
+    from app.core.embed_cache import get_embedding_cache
+    embed_cache = get_embedding_cache(embedder.MODEL_NAME, embedder.get_backend_name())
+    batcher = embedder.get_query_batcher()
+    return {
+        "index_cache": retriever.index_cache.stats(),
+        "answer_cache": engine.answer_cache.stats(),
+        "embedding_cache": embed_cache.stats() if embed_cache else None,
+        "query_microbatch": batcher.stats() if batcher else None,
+        "reranker": retriever.reranker.stats() if retriever.reranker else None,
+    }
+
+@app.delete("/admin/sessions/{session_id}")
+def admin_delete_session(session_id: str):
+    job = get_job(session_id)
+    if job is not None and job["status"] in ("queued", "running"):
+        return {"error": "Session is still being indexed."}
+    if registry.get(session_id) is None and session_id not in storage.sessions_on_disk():
+        return {"error": "Unknown session."}
+    registry.delete(session_id)
+    return {"status": "deleted", "session_id": session_id}
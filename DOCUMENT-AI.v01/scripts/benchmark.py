@@ -0,0 +1,356 @@
+"""End-to-end benchmark: ingestion and query stages, then an HTTP load test.
+
+Generates a synthetic policy PDF and DOCX, then times each stage of the
+pipeline on them: load_content, chunk_text, embed_texts, build_index,
+load_index and retrieve_chunks. After that it starts the API in-process
+with the local LLM stub instead of Gemini and load-tests /upload_docs and
+/query with concurrent clients. It reports p50/p95/p99 latency, throughput
+and peak RSS, and writes the results as JSON so two runs can be compared.
+
+Everything runs in a scratch directory, so existing sessions are not touched.
+The embedding cache is disabled by default so embed times are real model
+time; pass --embed-cache to keep it.
+
+    python -m scripts.benchmark --out before.json
+    python -m scripts.benchmark --pages 200 --concurrency 16 --queries 400 --out after.json --compare before.json
+    python -m scripts.benchmark --skip-load            # stages only
+    python -m scripts.benchmark --url http://localhost:8000 --skip-stages
+
+With --url the server's own LLM settings apply; start it with
+DOCAI_LLM_BACKEND=local to keep Gemini out of the measurement.
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUESTIONS = [
+    "Is knee surgery covered for a {age}-year-old after {months} months of cover?",
+    "What is the waiting period for pre-existing diseases for policy {n}?",
+    "Does the policy pay for day-care treatment in a network hospital, claim {n}?",
+    "Are ambulance charges reimbursed for a {age}-year-old, claim {n}?",
+    "Is maternity covered after {months} months, policy holder aged {age}?",
+]
+
+
+def question(i):
+    # Distinct text per request so answer and query-embedding caches don't hide the work
+    return QUESTIONS[i % len(QUESTIONS)].format(age=20 + i % 50, months=1 + i % 36, n=i)
+
+
+def synthetic_docx(path, paragraphs):
+    import docx
+    from scripts.extract_benchmark import CLAUSE
+    doc = docx.Document()
+    for n in range(paragraphs):
+        doc.add_paragraph(CLAUSE.format(n=n).strip())
+    doc.save(path)
+
+
+def summarize(samples_s, wall_s=None):
+    """Latency percentiles in ms (nearest rank), plus throughput if ``wall_s``."""
+    if not samples_s:
+        return {"n": 0}
+    ordered = sorted(samples_s)
+
+    def pct(p):
+        return round(ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)] * 1000, 2)
+
+    result = {
+        "n": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+    if wall_s:
+        result["throughput_per_s"] = round(len(ordered) / wall_s, 2)
+    return result
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return round(psutil.Process().memory_info().peak_wset / 2**20, 1)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+def timed(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = fn()
+        samples.append(time.perf_counter() - t0)
+    return samples, result
+
+
+def bench_stages(args, pdf_path, docx_path):
+    from app.core import retriever, storage
+    from app.core.embedder import embed_texts
+    from app.ingestion.chunk import chunk_text
+    from app.ingestion.load import load_content
+
+    stages = {}
+
+    def record(name, samples, **extra):
+        stages[name] = {**summarize(samples), **extra, "peak_rss_mb": peak_rss_mb()}
+        print(f"  {name:<24}{stages[name]['p50_ms']:>10.1f} ms p50")
+
+    samples, text = timed(lambda: load_content(pdf_path), args.repeat)
+    record("load_content_pdf", samples, pages=args.pages, chars=len(text))
+    samples, _ = timed(lambda: load_content(docx_path), args.repeat)
+    record("load_content_docx", samples, paragraphs=args.docx_paragraphs)
+
+    samples, chunks = timed(lambda: chunk_text(text), args.repeat)
+    record("chunk_text", samples, chunks=len(chunks))
+
+    samples, _ = timed(lambda: embed_texts(chunks), args.repeat)
+    record("embed_texts", samples, chunks=len(chunks),
+           chunks_per_s=round(len(chunks) / (sum(samples) / len(samples)), 1))
+
+    session_id = storage.new_session_id()
+    samples, _ = timed(lambda: retriever.build_index(chunks, session_id, force_rebuild=True), args.repeat)
+    record("build_index", samples, chunks=len(chunks))
+
+    samples, _ = timed(lambda: retriever.load_index(session_id), args.repeat)
+    record("load_index", samples)
+
+    cold = []
+    for i in range(args.repeat):
+        retriever.index_cache.invalidate(session_id)
+        cold.extend(timed(lambda: retriever.retrieve_chunks(question(i), session_id), 1)[0])
+    record("retrieve_chunks_cold", cold)
+    warm = []
+    for i in range(args.stage_queries):
+        warm.extend(timed(lambda: retriever.retrieve_chunks(question(i), session_id), 1)[0])
+    record("retrieve_chunks", warm)
+    return stages
+
+
+def start_server(args):
+    """Run the API under uvicorn on a background thread; returns its URL."""
+    import uvicorn
+    from app.core.config import get_config
+
+    cfg = get_config()
+    cfg["llm"] = {**(cfg.get("llm") or {}), "backend": "local", "local_latency_ms": args.llm_latency_ms}
+    os.environ["DOCAI_LLM_BACKEND"] = "local"
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config("app.main:app", host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="benchmark-server", daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server
+
+
+def wait_ready(http, url, timeout_s):
+    deadline = time.perf_counter() + timeout_s
+    while time.perf_counter() < deadline:
+        if http.get(f"{url}/ready").status_code == 200:
+            return
+        time.sleep(0.2)
+    sys.exit("Server did not become ready.")
+
+
+def run_concurrent(fn, n, concurrency):
+    """Call fn(i) for i in range(n) on ``concurrency`` threads; returns
+    (latencies of successful calls, error count, wall seconds)."""
+    latencies, errors = [], []
+
+    def one(i):
+        t0 = time.perf_counter()
+        try:
+            fn(i)
+        except Exception as e:
+            errors.append(str(e))
+            return
+        latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(one, range(n)))
+    return latencies, errors, time.perf_counter() - t0
+
+
+def bench_load(args, upload_pdf):
+    import requests
+
+    server = None
+    url = args.url
+    if not url:
+        url, server = start_server(args)
+    http = requests.Session()
+    http.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+    wait_ready(http, url, 300)
+
+    with open(upload_pdf, "rb") as f:
+        pdf_bytes = f.read()
+    sessions = []
+    ready_s = []
+
+    def upload(i):
+        r = http.post(f"{url}/upload_docs", files=[("uploaded_files", (f"policy_{i}.pdf", pdf_bytes, "application/pdf"))])
+        body = r.json()
+        if r.status_code != 200 or "error" in body:
+            raise RuntimeError(body)
+        t0 = time.perf_counter()
+        sid = body["session_id"]
+        while True:
+            status = http.get(f"{url}/sessions/{sid}/status").json()
+            if status["status"] == "ready":
+                break
+            if status["status"] == "failed":
+                raise RuntimeError(status)
+            time.sleep(0.05)
+        ready_s.append(time.perf_counter() - t0)
+        sessions.append(sid)
+
+    print(f"  /upload_docs x{args.uploads} ({args.upload_pages} pages each), concurrency {args.concurrency}")
+    latencies, upload_errors, wall = run_concurrent(upload, args.uploads, args.concurrency)
+    load = {
+        "upload_docs": {**summarize(latencies, wall), "errors": len(upload_errors), "pages": args.upload_pages},
+        "upload_to_ready": summarize(ready_s),
+    }
+    if not sessions:
+        sys.exit(f"No uploads succeeded: {upload_errors[:3]}")
+
+    def query(i):
+        r = http.post(f"{url}/query", json={"query": question(i), "session_id": sessions[i % len(sessions)]})
+        body = r.json()
+        if r.status_code != 200 or "error" in body:
+            raise RuntimeError(body)
+
+    print(f"  /query x{args.queries}, concurrency {args.concurrency}, stub LLM {args.llm_latency_ms} ms")
+    latencies, query_errors, wall = run_concurrent(query, args.queries, args.concurrency)
+    load["query"] = {**summarize(latencies, wall), "errors": len(query_errors)}
+    for errors in (upload_errors, query_errors):
+        if errors:
+            print(f"  first error: {errors[0]}")
+    load["peak_rss_mb"] = peak_rss_mb() if server else None
+    if server:
+        server.should_exit = True
+    return load
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\ncompared with {baseline_path} (ratio = new / old; below 1 is faster)")
+    print(f"{'metric':<28}{'old p50':>10}{'new p50':>10}{'ratio':>8}{'old p95':>10}{'new p95':>10}{'ratio':>8}")
+    for group in ("stages", "load"):
+        for name, new in (current.get(group) or {}).items():
+            old = (baseline.get(group) or {}).get(name)
+            if not isinstance(new, dict) or not isinstance(old, dict) or "p50_ms" not in new or "p50_ms" not in old:
+                continue
+            row = f"{name:<28}"
+            for p in ("p50_ms", "p95_ms"):
+                ratio = new[p] / old[p] if old[p] else float("nan")
+                row += f"{old[p]:>10.1f}{new[p]:>10.1f}{ratio:>8.2f}"
+            print(row)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=60, help="pages in the synthetic PDF for stage timings")
+    parser.add_argument("--docx-paragraphs", type=int, default=600)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per ingestion stage")
+    parser.add_argument("--stage-queries", type=int, default=50, help="warm retrieve_chunks calls")
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument("--upload-pages", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency-ms", type=float, default=50, help="simulated latency of the stub LLM")
+    parser.add_argument("--url", help="load-test a running server instead of an in-process one")
+    parser.add_argument("--embed-cache", action="store_true", help="keep the on-disk embedding cache enabled")
+    parser.add_argument("--skip-stages", action="store_true")
+    parser.add_argument("--skip-load", action="store_true")
+    parser.add_argument("--out", help="write the results as JSON")
+    parser.add_argument("--compare", help="earlier --out file to compare against")
+    args = parser.parse_args()
+
+    if not args.embed_cache:
+        os.environ["EDAI_EMBED_CACHE"] = "0"
+    os.environ.setdefault("DOCAI_CONFIG", os.path.join(ROOT, "config", "config.yaml"))
+    out = os.path.abspath(args.out) if args.out else None
+    baseline = os.path.abspath(args.compare) if args.compare else None
+    sys.path.insert(0, ROOT)
+
+    from scripts.extract_benchmark import synthetic_pdf
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        },
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        # Relative data/ and temp_uploads/ paths now point into the scratch dir
+        os.chdir(workdir)
+        pdf_path = os.path.join(workdir, "policy.pdf")
+        upload_pdf = os.path.join(workdir, "upload.pdf")
+        docx_path = os.path.join(workdir, "policy.docx")
+        synthetic_pdf(pdf_path, args.pages)
+        synthetic_pdf(upload_pdf, args.upload_pages)
+        synthetic_docx(docx_path, args.docx_paragraphs)
+
+        if not args.skip_stages:
+            print("stages")
+            results["stages"] = bench_stages(args, pdf_path, docx_path)
+        if not args.skip_load:
+            print("load test")
+            results["load"] = bench_load(args, upload_pdf)
+        os.chdir(ROOT)
+    results["peak_rss_mb"] = peak_rss_mb()
+
+    for name, r in (results.get("load") or {}).items():
+        if isinstance(r, dict) and r.get("n"):
+            extra = f"  {r['throughput_per_s']:.1f}/s" if "throughput_per_s" in r else ""
+            print(f"  {name:<16} p50 {r['p50_ms']:.1f}  p95 {r['p95_ms']:.1f}  p99 {r['p99_ms']:.1f} ms{extra}"
+                  + (f"  errors {r['errors']}" if r.get("errors") else ""))
+    print(f"peak RSS {results['peak_rss_mb']} MB")
+    if out:
+        with open(out, "w") as f:
+            json.dump(results, f, indent=2)
+    if baseline:
+        compare(results, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Accuracy and throughput of the embedding backends (torch, onnx, onnx-int8).
+
+Every backend embeds the same chunks. Accuracy is the cosine similarity of
+each vector to the torch vector for the same chunk, plus how many of each
+query's top-10 neighbours agree with torch. Throughput is chunks/second,
+also divided by the number of threads the backend was allowed.
+
+    python -m scripts.embed_benchmark --n 2000 --threads 4
+    python -m scripts.embed_benchmark --texts chunks.txt --backends torch onnx-int8
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+from app.core.embed_backends import BACKENDS, load_sentence_transformer
+
+TERMS = [
+    "cataract surgery", "room rent", "pre-existing disease", "waiting period", "co-payment",
+    "hospitalisation", "day care procedure", "ambulance cover", "sum insured", "exclusion",
+    "maternity benefit", "organ donor", "AYUSH treatment", "cumulative bonus", "grace period",
+]
+
+
+def synthetic_chunks(n, seed=0):
+    rng = random.Random(seed)
+    chunks = []
+    for i in range(n):
+        terms = rng.sample(TERMS, 4)
+        chunks.append(
+            f"Clause {i // 10}.{i % 10}: expenses for {terms[0]} and {terms[1]} are payable up to the "
+            f"{terms[2]} limit, subject to the {terms[3]} conditions in the policy schedule. "
+            * rng.randint(1, 4)
+        )
+    return chunks
+
+
+def load_texts(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def load_model(backend, model_name, threads):
+    model_kwargs = None
+    if backend != "torch" and threads:
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        model_kwargs = {"session_options": options}
+    return load_sentence_transformer(model_name, backend, device="cpu", model_kwargs=model_kwargs)
+
+
+def encode(model, texts, batch_size):
+    return np.asarray(
+        model.encode(texts, batch_size=batch_size, normalize_embeddings=True, show_progress_bar=False),
+        dtype=np.float32,
+    )
+
+
+def neighbour_agreement(ref, vecs, n_queries, k=10, seed=1):
+    rows = np.random.default_rng(seed).choice(len(ref), min(n_queries, len(ref)), replace=False)
+    ref_top = np.argsort(-(ref[rows] @ ref.T), axis=1)[:, 1:k + 1]
+    top = np.argsort(-(vecs[rows] @ vecs.T), axis=1)[:, 1:k + 1]
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(ref_top, top)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--texts", help="file with one chunk per line (default: synthetic policy clauses)")
+    parser.add_argument("--n", type=int, default=2000, help="synthetic chunks")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1, help="inference threads per backend")
+    parser.add_argument("--out", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    import torch
+    torch.set_num_threads(args.threads)
+
+    texts = load_texts(args.texts) if args.texts else synthetic_chunks(args.n)
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+
+    results = {}
+    reference = None
+    for backend in backends:
+        model = load_model(backend, args.model, args.threads)
+        encode(model, texts[:args.batch_size], args.batch_size)  # warm-up
+        t0 = time.perf_counter()
+        vecs = encode(model, texts, args.batch_size)
+        seconds = time.perf_counter() - t0
+        if reference is None:
+            reference = vecs
+        cosine = np.sum(vecs * reference, axis=1)
+        results[backend] = {
+            "chunks_per_s": round(len(texts) / seconds, 1),
+            "chunks_per_s_per_core": round(len(texts) / seconds / args.threads, 1),
+            "cosine_mean": round(float(cosine.mean()), 5),
+            "cosine_min": round(float(cosine.min()), 5),
+            "top10_agreement": round(neighbour_agreement(reference, vecs, 200), 4),
+        }
+
+    print(f"{len(texts)} chunks, model {args.model}, {args.threads} threads, batch {args.batch_size}")
+    print(f"{'backend':<11}{'chunks/s':>10}{'per core':>10}{'cos mean':>10}{'cos min':>10}{'top10':>8}")
+    for backend, r in results.items():
+        print(
+            f"{backend:<11}{r['chunks_per_s']:>10.1f}{r['chunks_per_s_per_core']:>10.1f}"
+            f"{r['cosine_mean']:>10.4f}{r['cosine_min']:>10.4f}{r['top10_agreement']:>8.3f}"
+        )
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"model": args.model, "threads": args.threads, "n": len(texts), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""PDF text extraction throughput in pages/second.
+
+Compares the original per-page string concatenation, a serial join, and
+page-range extraction across a spawn process pool (what ingestion jobs use).
+Without --pdf a synthetic policy booklet is generated.
+
+    python -m scripts.extract_benchmark --pages 300 --workers 4
+    python -m scripts.extract_benchmark --pdf data/docs/sample_policy.pdf
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz  # PyMuPDF
+
+from app.ingestion.load import extract_pdf, extract_pdf_pages, pdf_page_count
+
+CLAUSE = (
+    "Clause {n}. The insurer will indemnify the insured for reasonable and customary charges "
+    "incurred for in-patient hospitalisation, subject to the waiting periods, sub-limits and "
+    "exclusions stated in this schedule. "
+)
+
+
+def synthetic_pdf(path, pages, clauses_per_page=12):
+    with fitz.open() as doc:
+        for p in range(pages):
+            page = doc.new_page()
+            text = "".join(CLAUSE.format(n=p * clauses_per_page + c) for c in range(clauses_per_page))
+            page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=9)
+        doc.save(path)
+
+
+def extract_concat(path):
+    # The implementation extract_pdf replaced
+    text = ""
+    with fitz.open(path) as doc:
+        for page in doc:
+            text += page.get_text()
+    return text
+
+
+def extract_parallel(pool, path, pages_per_task):
+    n = pdf_page_count(path)
+    futures = [
+        pool.submit(extract_pdf_pages, path, start, min(start + pages_per_task, n))
+        for start in range(0, n, pages_per_task)
+    ]
+    return "".join(page for fut in futures for page in fut.result())
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF to extract (default: synthetic)")
+    parser.add_argument("--pages", type=int, default=300, help="pages in the synthetic PDF")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--pages-per-task", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per method; the best is reported")
+    parser.add_argument("--out", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.pdf
+        if not path:
+            path = os.path.join(tmp, "synthetic.pdf")
+            synthetic_pdf(path, args.pages)
+        n_pages = pdf_page_count(path)
+
+        results = {}
+        baseline = None
+        with ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # Warm the workers so process start-up is not charged to the first run
+            list(pool.map(pdf_page_count, [path] * args.workers))
+            methods = {
+                "concat (before)": lambda: extract_concat(path),
+                "join": lambda: extract_pdf(path),
+                f"parallel x{args.workers}": lambda: extract_parallel(pool, path, args.pages_per_task),
+            }
+            for name, fn in methods.items():
+                seconds, text = timed(fn, args.repeat)
+                if baseline is None:
+                    baseline = text
+                results[name] = {
+                    "seconds": round(seconds, 4),
+                    "pages_per_s": round(n_pages / seconds, 1),
+                    "same_text": text == baseline,
+                }
+
+    print(f"{n_pages} pages, {args.workers} workers, {args.pages_per_task} pages per task")
+    print(f"{'method':<18}{'seconds':>10}{'pages/s':>10}  same text")
+    for name, r in results.items():
+        print(f"{name:<18}{r['seconds']:>10.3f}{r['pages_per_s']:>10.1f}  {r['same_text']}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"pages": n_pages, "workers": args.workers, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
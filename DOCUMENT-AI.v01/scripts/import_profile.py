@@ -0,0 +1,68 @@
+"""Import-time profile of the API module.
+
+Imports ``app.main`` (or --module) in a fresh interpreter with
+``python -X importtime``. It prints the wall time, the slowest imports by
+cumulative time, and whether each heavy dependency was loaded at import.
+Run it from the project root; compare runs to see what a change costs or saves.
+
+    python -m scripts.import_profile
+    python -m scripts.import_profile --top 30 --out import_profile.json
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+HEAVY = ["torch", "sentence_transformers", "transformers", "onnxruntime", "langchain",
+         "google.generativeai", "fitz", "docx", "faiss"]
+
+
+def profile(module):
+    probe = (
+        f"import sys, json; import {module}; "
+        f"print(json.dumps({{m: m in sys.modules for m in {HEAVY!r}}}))"
+    )
+    t0 = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", probe], capture_output=True, text=True)
+    wall = time.perf_counter() - t0
+    if proc.returncode != 0:
+        sys.exit(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    imports = []
+    for line in proc.stderr.splitlines():
+        # "import time:   self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append((name.rstrip(), int(cumulative_us)))
+    return wall, imports, json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--out", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    wall, imports, loaded = profile(args.module)
+    top_level = [(n, us) for n, us in imports if not n.startswith(" ")]
+    print(f"import {args.module}: {wall * 1000:.0f} ms wall (includes interpreter start-up)")
+    print(f"\n{'cumulative ms':>14}  module")
+    for name, us in sorted(imports, key=lambda x: -x[1])[:args.top]:
+        print(f"{us / 1000:>14.1f}  {name}")
+    print("\nheavy dependencies loaded at import:")
+    for name, was_loaded in loaded.items():
+        print(f"  {name:<22}{'yes' if was_loaded else 'no'}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({
+                "module": args.module,
+                "wall_ms": round(wall * 1000, 1),
+                "top_level_ms": {n.strip(): round(us / 1000, 1) for n, us in top_level},
+                "heavy_loaded": loaded,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
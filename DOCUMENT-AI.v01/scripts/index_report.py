@@ -0,0 +1,111 @@
+"""Recall-vs-latency report for the approximate index types.
+
+Builds a flat index as ground truth and compares IVF/HNSW at several
+nprobe/efSearch settings. Vectors come from an existing faiss.index, a .npy
+matrix, or a synthetic clustered corpus.
+
+    python -m scripts.index_report --n 200000
+    python -m scripts.index_report --index data/sessions/<shard>/session_<id>/backup/g<N>/faiss.index
+"""
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from app.core import index_factory
+
+
+def synthetic_vectors(n, dim, clusters=256, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    labels = rng.integers(0, clusters, n)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def load_vectors(args):
+    if args.index:
+        return index_factory.reconstruct_all(faiss.read_index(args.index)).astype("float32")
+    if args.vectors:
+        return np.load(args.vectors).astype("float32")
+    return synthetic_vectors(args.n, args.dim)
+
+
+def make_queries(vectors, n_queries, seed=1):
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)
+    queries = vectors[rows] + 0.05 * rng.standard_normal((len(rows), vectors.shape[1])).astype("float32")
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def timed_search(index, queries, k, **params):
+    latencies = []
+    results = []
+    for q in queries:
+        t0 = time.perf_counter()
+        _, I = index_factory.search(index, q.reshape(1, -1), k, **params)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        results.append(I[0])
+    return np.array(results), np.array(latencies)
+
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--index", help="Existing faiss.index to take vectors from")
+    parser.add_argument("--vectors", help=".npy matrix of normalized vectors")
+    parser.add_argument("--n", type=int, default=100_000, help="Synthetic corpus size")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--out", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    queries = make_queries(vectors, args.queries)
+    n = len(vectors)
+    print(f"{n} vectors, dim {vectors.shape[1]}, {len(queries)} queries, k={args.k}")
+    print(f"auto picks: {index_factory.choose_index_type(n)} (target recall 0.95), "
+          f"{index_factory.choose_index_type(n, 0.99)} (target recall 0.99)")
+
+    rows = []
+    t0 = time.perf_counter()
+    flat = index_factory.make_index(vectors, index_type="flat")
+    flat_build = time.perf_counter() - t0
+    truth, flat_lat = timed_search(flat, queries, args.k)
+    rows.append({"index": "flat", "param": None, "build_s": flat_build, "recall": 1.0,
+                 "p50_ms": float(np.percentile(flat_lat, 50)), "p95_ms": float(np.percentile(flat_lat, 95))})
+
+    candidates = []
+    if n >= 39:
+        nlist = index_factory.default_nlist(n)
+        candidates.append(("ivf", "nprobe", [1, 4, 8, 16, 32, 64, max(1, nlist // 8)]))
+    candidates.append(("hnsw", "ef_search", [16, 32, 64, 128, 256]))
+
+    for kind, param, values in candidates:
+        t0 = time.perf_counter()
+        index = index_factory.make_index(vectors, index_type=kind)
+        build = time.perf_counter() - t0
+        for value in sorted(set(values)):
+            found, lat = timed_search(index, queries, args.k, **{param: value})
+            rows.append({"index": kind, "param": f"{param}={value}", "build_s": build,
+                         "recall": recall_at_k(found, truth),
+                         "p50_ms": float(np.percentile(lat, 50)), "p95_ms": float(np.percentile(lat, 95))})
+
+    print(f"{'index':<6} {'param':<14} {'build_s':>8} {'recall@k':>9} {'p50_ms':>8} {'p95_ms':>8}")
+    for r in rows:
+        print(f"{r['index']:<6} {str(r['param'] or '-'):<14} {r['build_s']:>8.2f} {r['recall']:>9.3f} "
+              f"{r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"n": n, "dim": int(vectors.shape[1]), "k": args.k, "rows": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
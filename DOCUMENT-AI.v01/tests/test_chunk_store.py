@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from app.core.chunk_store import ChunkStore, append_chunk_store, chunk_store_exists, filter_chunk_store, write_chunk_store
+
+CHUNKS = ["Clause 1: cover starts on the policy date.", "Clause 2: flood is excluded.", "", "Clause 4: claims within 30 days."]
+METAS = [{"page": i} for i in range(len(CHUNKS))]
+
+
+def _read(base_path):
+    store = ChunkStore(base_path)
+    try:
+        return list(store), [store.meta(i) for i in range(len(store))]
+    finally:
+        store.close()
+
+
+def _generation(tmp_path, n):
+    path = tmp_path / f"g{n:06d}"
+    path.mkdir()
+    return str(path / "chunks")
+
+
+def test_write_round_trip(tmp_path):
+    base = _generation(tmp_path, 1)
+    write_chunk_store(base, CHUNKS, METAS)
+    assert chunk_store_exists(base)
+    assert _read(base) == (CHUNKS, METAS)
+
+
+def test_store_without_metadata(tmp_path):
+    base = _generation(tmp_path, 1)
+    write_chunk_store(base, CHUNKS)
+    store = ChunkStore(base)
+    assert not store.has_meta
+    assert store[-1] == CHUNKS[-1] and store.meta(0) == {}
+    with pytest.raises(IndexError):
+        store[len(CHUNKS)]
+    store.close()
+
+
+def test_append_writes_a_new_store(tmp_path):
+    src, out = _generation(tmp_path, 1), _generation(tmp_path, 2)
+    write_chunk_store(src, CHUNKS, METAS)
+    append_chunk_store(src, ["Clause 5: new."], out, [{"page": 9}])
+    assert _read(out) == (CHUNKS + ["Clause 5: new."], METAS + [{"page": 9}])
+    assert _read(src) == (CHUNKS, METAS)
+
+
+def test_append_metadata_to_a_store_without_it(tmp_path):
+    src, out = _generation(tmp_path, 1), _generation(tmp_path, 2)
+    write_chunk_store(src, CHUNKS)
+    append_chunk_store(src, ["Clause 5: new."], out, [{"page": 9}])
+    assert _read(out) == (CHUNKS + ["Clause 5: new."], [{}] * len(CHUNKS) + [{"page": 9}])
+
+
+def test_filter_keeps_selected_rows(tmp_path):
+    src, out = _generation(tmp_path, 1), _generation(tmp_path, 2)
+    write_chunk_store(src, CHUNKS, METAS)
+    keep = [True, False, True, True]
+    filter_chunk_store(src, keep, out)
+    assert _read(out) == ([c for c, k in zip(CHUNKS, keep) if k], [m for m, k in zip(METAS, keep) if k])
+
+
+def test_rewriting_a_store_in_place_is_refused(tmp_path):
+    base = _generation(tmp_path, 1)
+    write_chunk_store(base, CHUNKS)
+    with pytest.raises(ValueError):
+        filter_chunk_store(base, [True] * len(CHUNKS), base)
+    with pytest.raises(ValueError):
+        append_chunk_store(base, ["x"], os.path.join(os.path.dirname(base), ".", "chunks"))
+    assert _read(base)[0] == CHUNKS
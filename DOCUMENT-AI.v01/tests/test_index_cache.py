@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from app.core.index_cache import KeyedLocks, SessionIndexCache
+
+
+def test_concurrent_misses_load_once():
+    cache = SessionIndexCache()
+    calls = []
+
+    def loader(session_id):
+        calls.append(session_id)
+        time.sleep(0.05)
+        return session_id.upper(), 1
+
+    threads = [threading.Thread(target=cache.get, args=("s1", loader)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert calls == ["s1"]
+    assert cache.get("s1", loader) == "S1"
+
+
+def test_invalidation_during_a_load_is_not_cached():
+    cache = SessionIndexCache()
+
+    def loader(session_id):
+        cache.invalidate(session_id)
+        return "stale", 1
+
+    assert cache.get("s1", loader) == "stale"
+    assert cache.stats()["entries"] == 0
+
+
+def test_evicts_past_max_entries():
+    cache = SessionIndexCache(max_entries=2)
+    for session_id in ("a", "b", "c"):
+        cache.get(session_id, lambda s: (s, 1))
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_bookkeeping_is_dropped_after_use():
+    cache = SessionIndexCache(max_entries=1)
+    for i in range(100):
+        cache.get(f"s{i}", lambda s: (s, 1))
+        cache.invalidate(f"s{i}")
+
+    def failing(session_id):
+        raise RuntimeError("load failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get("broken", failing)
+    assert len(cache._load_locks) == 0
+    assert cache._loading == {}
+
+
+def test_keyed_locks_serialize_one_key_and_forget_it():
+    locks = KeyedLocks()
+    inside = []
+    peak = []
+
+    def worker():
+        with locks.hold("s1"):
+            inside.append(1)
+            peak.append(len(inside))
+            time.sleep(0.01)
+            inside.pop()
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(peak) == 1
+    assert len(locks) == 0
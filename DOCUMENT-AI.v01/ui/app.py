@@ -3,6 +3,7 @@ import requests
 import json
 from datetime import datetime
 import os
+import time
 
 API_URL = "http://127.0.0.1:8000"
 
@@ -19,13 +20,28 @@ if uploaded_file:
        response = requests.post(f"{API_URL}/upload_docs",files=[("uploaded_files", (uploaded_file.name, uploaded_file.getvalue()))]  # ✅ Send as list of tuples
 )
 
-    if response.status_code == 200:
+    if response.status_code == 200 and "error" not in response.json():
         data = response.json()
         #st.write("Raw Response:", data)
-        st.success(data.get("message", "Upload succeeded!"))
-
         session_id = data.get("session_id")
         st.session_state["session_id"] = session_id
+
+        # Indexing runs in the background; poll until the session is ready
+        progress = st.progress(0.0, text="Indexing...")
+        while True:
+            status = requests.get(f"{API_URL}/sessions/{session_id}/status").json()
+            stages = status.get("stages", {})
+            done = sum(1 for s in stages.values() if s.get("status") == "done")
+            progress.progress(done / max(len(stages), 1), text=f"Indexing... ({status.get('stage') or status.get('status')})")
+            if status.get("status") in ("ready", "failed", "unknown"):
+                break
+            time.sleep(1)
+        progress.empty()
+
+        if status.get("status") == "ready":
+            st.success("All uploaded documents parsed and indexed into a single index.")
+        else:
+            st.error(status.get("error", "Indexing failed."))
         st.info(f"🔑 Session ID saved: `{session_id}`")
     else:
         st.error(response.json().get("error", "Upload failed."))
@@ -36,46 +52,53 @@ st.markdown("---")
 st.subheader("Ask a Question")
 query = st.text_input("Enter your query in plain English")
 
+def stream_query(payload):
+    # Parse the Server-Sent Events from /query/stream into (event, data) pairs
+    with requests.post(f"{API_URL}/query/stream", json=payload, stream=True) as response:
+        response.raise_for_status()
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                yield event, json.loads(line[len("data: "):])
+
 if st.button("Submit Query") and query:
     session_id = st.session_state.get("session_id")
 
     if not session_id:
         st.error("No documents uploaded yet. Please upload first.")
     else:
-        with st.spinner("Thinking with Gemini..."):
-            response = requests.post(
-                f"{API_URL}/query",
-                json={"query": query, "session_id": session_id}
-            )
-
-        if response.status_code == 200:
-            result = response.json()
-
-            if "error" in result:
-                st.error(" Error: " + result["error"])
-            else:
-                st.success(" Indexing based Answer:")
-                st.markdown(f"**Q:** {result.get('query')}")
-
-                # JSON answer
-                response_text = result.get("response", "")
-                try:
-                    parsed = json.loads(response_text)
-                    st.json(parsed)
-                except json.JSONDecodeError:
-                    st.markdown("**A (raw):**")
-                    st.code(response_text, language="json")
-
-                # Clauses
-                st.markdown("###  Referenced Clauses:")
-                for i, clause in enumerate(result.get("retrieved_clauses", [])):
-                    st.markdown(f"**Clause {i+1}:**")
-                    st.code(clause, language="text")
-        else:
-            try:
-                st.error(" Server Error: " + response.json().get("error", "Unknown error"))
-            except:
-                st.error(" Unknown Error occurred.")
-
-
-
+        st.markdown(f"**Q:** {query}")
+        answer_area = st.empty()
+        clauses_area = st.container()
+        response_text = ""
+        answer_area.info("Searching policy clauses...")
+
+        try:
+            for event, data in stream_query({"query": query, "session_id": session_id}):
+                if event == "clauses":
+                    # Clauses arrive as soon as retrieval finishes, before the model answers
+                    answer_area.info("Thinking with Gemini...")
+                    with clauses_area:
+                        st.markdown("###  Referenced Clauses:")
+                        for i, clause in enumerate(data):
+                            st.markdown(f"**Clause {i+1}:**")
+                            st.code(clause, language="text")
+                elif event == "token":
+                    response_text += data
+                    answer_area.code(response_text, language="json")
+                elif event == "done":
+                    response_text = data.get("response", response_text)
+                    with answer_area.container():
+                        st.success(" Indexing based Answer:")
+                        # JSON answer
+                        try:
+                            st.json(json.loads(response_text))
+                        except json.JSONDecodeError:
+                            st.markdown("**A (raw):**")
+                            st.code(response_text, language="json")
+                elif event == "error":
+                    answer_area.error(" Error: " + data.get("error", "Unknown error"))
+        except requests.RequestException as e:
+            answer_area.error(" Server Error: " + str(e))
@@ -5,6 +5,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from typing import List, Optional
 import asyncio
 import time
+import functools
 from functools import lru_cache
 import threading
 
@@ -35,6 +36,12 @@ app.add_middleware(
 )
 
 
+@app.on_event("shutdown")
+def stop_extraction_workers():
+    from app.ingestion.parallel import shutdown
+    shutdown()
+
+
 @app.get("/")
 async def root():
     return {"message": "Requirement-AI backend is running", "docs": "/docs", "health": "/health"}
@@ -42,11 +49,13 @@ async def root():
 
 @app.get("/health")
 async def health():
+    from app.core.embedder import microbatch_stats
     return {
         "status": "healthy",
         "message": "Requirement-AI v0.1 is running",
         "timestamp": time.time(),
-        "cached_engines": len(_engine_cache)
+        "cached_engines": len(_engine_cache),
+        "query_microbatch": microbatch_stats(),
     }
 
 @app.post("/clear_cache")
@@ -119,7 +128,10 @@ async def upload_and_process(
     # Run pipeline against the session dir using cached engine
     loop = asyncio.get_running_loop()
     engine = get_cached_engine(config_path)
-    result = await loop.run_in_executor(None, engine.run, str(session_dir), out_dir, query)
+    # Each upload lands in a fresh directory, so there is no index worth keeping
+    result = await loop.run_in_executor(
+        None, functools.partial(engine.run, str(session_dir), out_dir, query, persist_index=False)
+    )
     
     processing_time = time.time() - start_time
     out = Path(out_dir)
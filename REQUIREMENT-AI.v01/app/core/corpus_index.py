@@ -0,0 +1,117 @@
+"""Manifest of the input files behind a persisted FaissRetriever.
+
+Each file is recorded by path with its size, mtime and content hash, so a
+repeat run over the same directory can tell which files still match their
+stored vectors and which have to be loaded and embedded again.
+"""
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import hashlib
+import json
+import os
+
+from app.core.extract_cache import file_sha256
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+DEFAULT_INDEX_ROOT = "data/index"
+
+
+def default_index_dir(input_dir: str | Path, root: str | Path | None = None) -> Path:
+    """One index directory per input directory, named by its resolved path."""
+    key = hashlib.sha1(str(Path(input_dir).resolve()).encode("utf-8")).hexdigest()[:16]
+    return Path(root or DEFAULT_INDEX_ROOT) / key
+
+
+def _key(path: Path) -> str:
+    return str(Path(path).resolve())
+
+
+class CorpusDiff:
+    def __init__(self, unchanged: List[Path], changed: List[Path], stale_sources: List[str], refreshed: int = 0):
+        self.unchanged = unchanged
+        # New files and files whose content differs from the manifest
+        self.changed = changed
+        # Chunk sources whose rows must leave the index (changed or deleted files)
+        self.stale_sources = stale_sources
+        # Unchanged files whose size/mtime entry was updated after hashing
+        self.refreshed = refreshed
+
+
+class CorpusManifest:
+    """Files indexed under one index directory, keyed by resolved path.
+
+    ``settings`` holds everything that shapes the stored vectors (model,
+    backend, chunking, index type); a manifest whose settings differ from the
+    current config is not reused.
+    """
+
+    def __init__(self, settings: Dict, files: Optional[Dict[str, Dict]] = None, ntotal: int = 0):
+        self.settings = settings
+        self.files: Dict[str, Dict] = files or {}
+        self.ntotal = ntotal
+        self._digests: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, index_dir: str | Path) -> Optional["CorpusManifest"]:
+        try:
+            data = json.loads((Path(index_dir) / MANIFEST_FILE).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        return cls(data["settings"], data["files"], data["ntotal"])
+
+    def save(self, index_dir: str | Path) -> None:
+        path = Path(index_dir) / MANIFEST_FILE
+        tmp = path.with_name(MANIFEST_FILE + ".tmp")
+        data = {"version": MANIFEST_VERSION, "settings": self.settings, "ntotal": self.ntotal, "files": self.files}
+        tmp.write_text(json.dumps(data, indent=1), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def diff(self, files: List[Path]) -> CorpusDiff:
+        """Compare ``files`` with the manifest and drop entries that no longer hold.
+
+        Size and mtime decide first; a file that differs there is hashed, so
+        one that was only touched or copied back still counts as unchanged.
+        """
+        unchanged: List[Path] = []
+        changed: List[Path] = []
+        stale: List[str] = []
+        seen = set()
+        refreshed = 0
+        for path in files:
+            key = _key(path)
+            seen.add(key)
+            st = path.stat()
+            entry = self.files.get(key)
+            if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+                unchanged.append(path)
+                continue
+            digest = file_sha256(path)
+            if entry and entry["sha256"] == digest:
+                entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+                refreshed += 1
+                unchanged.append(path)
+                continue
+            if entry:
+                stale.append(self.files.pop(key)["source"])
+            self._digests[key] = digest
+            changed.append(path)
+        for key in [k for k in self.files if k not in seen]:
+            stale.append(self.files.pop(key)["source"])
+        return CorpusDiff(unchanged, changed, stale, refreshed)
+
+    def record(self, path: Path, source: str, num_chunks: int) -> None:
+        """Add a file that was just loaded and chunked into ``num_chunks`` rows."""
+        key = _key(path)
+        st = path.stat()
+        digest = self._digests.pop(key, None) or file_sha256(path)
+        self.files[key] = {
+            "source": source,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": digest,
+            "chunks": num_chunks,
+        }
@@ -0,0 +1,177 @@
+"""Chunk docs of a FaissRetriever, kept on disk instead of in a Python list.
+
+Rows are JSON-encoded dicts concatenated in one blob, with an int64 offsets
+array beside it (the DOCUMENT-AI chunk store layout). A row is decoded only
+when it is read, so search returns k dicts without the corpus text ever
+being resident. Memory grows by 8 bytes of offset per row, not by chunk text.
+"""
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import json
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+# On-disk layout under a retriever's index directory:
+#   docs.current              name of the live generation, e.g. "docs.000003"
+#   docs.000003.bin           JSON rows, UTF-8, concatenated
+#   docs.000003.offsets.npy   int64[n + 1]; row i is blob[offsets[i]:offsets[i + 1]]
+# Each save writes a new generation and then switches the pointer, so a file
+# that is still mapped is never replaced (Windows refuses that). Stores saved
+# before generations have docs.bin / docs.offsets.npy and no pointer; still read.
+CURRENT_FILE = "docs.current"
+BLOB_FILE = "docs.bin"
+OFFSETS_FILE = "docs.offsets.npy"
+_GENERATION = re.compile(r"^(docs\.(\d+))\.(?:bin|offsets\.npy)$")
+
+
+def _live_files(path: Path) -> Tuple[Path, Path]:
+    try:
+        name = (path / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return path / BLOB_FILE, path / OFFSETS_FILE
+    return path / (name + ".bin"), path / (name + ".offsets.npy")
+
+
+def doc_store_exists(path: str | Path) -> bool:
+    blob_path, offsets_path = _live_files(Path(path))
+    return blob_path.exists() and offsets_path.exists()
+
+
+def _next_generation(path: Path) -> str:
+    numbers = [int(m.group(2)) for m in map(_GENERATION.match, os.listdir(path)) if m]
+    return f"docs.{max(numbers, default=0) + 1:06d}"
+
+
+def _prune(path: Path, live: str) -> None:
+    # Best effort: another reader may still map an old generation, and on
+    # Windows that file cannot be removed yet; the next save retries it
+    for name in os.listdir(path):
+        m = _GENERATION.match(name)
+        if (m and m.group(1) != live) or name in (BLOB_FILE, OFFSETS_FILE):
+            try:
+                os.remove(path / name)
+            except OSError:
+                pass
+
+
+def _map_file(path: Path):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class DocStore:
+    """Append-only sequence of chunk dicts.
+
+    Rows already saved are read from a memory-mapped ``docs.bin``; rows added
+    since go to an unnamed temporary file in ``spill_dir`` until ``save``
+    writes both out as one new store.
+    """
+
+    def __init__(self, path: str | Path | None = None, spill_dir: str | Path | None = None):
+        self.spill_dir = str(spill_dir) if spill_dir else None
+        self._lock = threading.Lock()
+        self._tail = None
+        self._tail_offsets: List[int] = [0]
+        if path is not None and doc_store_exists(path):
+            blob_path, offsets_path = _live_files(Path(path))
+            self._base_offsets = np.load(offsets_path, mmap_mode="r")
+            self._base_blob = _map_file(blob_path)
+        else:
+            self._base_offsets = np.zeros(1, dtype=np.int64)
+            self._base_blob = b""
+
+    def __len__(self) -> int:
+        return len(self._base_offsets) - 1 + len(self._tail_offsets) - 1
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Dict, List[Dict]]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("doc index out of range")
+        n_base = len(self._base_offsets) - 1
+        if i < n_base:
+            data = self._base_blob[int(self._base_offsets[i]):int(self._base_offsets[i + 1])]
+        else:
+            i -= n_base
+            start, end = self._tail_offsets[i], self._tail_offsets[i + 1]
+            with self._lock:
+                self._tail.seek(start)
+                data = self._tail.read(end - start)
+        return json.loads(bytes(data).decode("utf-8"))
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def extend(self, docs: Iterable[Dict]) -> None:
+        data = [json.dumps(d).encode("utf-8") for d in docs]
+        if not data:
+            return
+        with self._lock:
+            if self._tail is None:
+                if self.spill_dir:
+                    os.makedirs(self.spill_dir, exist_ok=True)
+                self._tail = tempfile.TemporaryFile(dir=self.spill_dir)
+            self._tail.seek(0, os.SEEK_END)
+            self._tail.writelines(data)
+            end = self._tail_offsets[-1]
+            for d in data:
+                end += len(d)
+                self._tail_offsets.append(end)
+
+    def save(self, path: str | Path) -> None:
+        """Write every row to ``path`` and serve them from there from now on."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        n_base = len(self._base_offsets) - 1
+        base_bytes = int(self._base_offsets[-1])
+        offsets = np.concatenate(
+            [self._base_offsets[:n_base], base_bytes + np.asarray(self._tail_offsets, dtype=np.int64)]
+        ).astype(np.int64)
+        with self._lock:
+            # A new generation, never the mapped files: this store may be
+            # serving from ``path`` itself (FaissRetriever.load reuses it)
+            name = _next_generation(path)
+            blob_path, offsets_path = path / (name + ".bin"), path / (name + ".offsets.npy")
+            with open(blob_path, "wb") as f:
+                for start in range(0, base_bytes, 1 << 20):
+                    f.write(self._base_blob[start:min(start + (1 << 20), base_bytes)])
+                if self._tail is not None:
+                    self._tail.seek(0)
+                    shutil.copyfileobj(self._tail, f)
+            with open(offsets_path, "wb") as f:
+                np.save(f, offsets)
+            (path / (CURRENT_FILE + ".tmp")).write_text(name, encoding="utf-8")
+            os.replace(path / (CURRENT_FILE + ".tmp"), path / CURRENT_FILE)
+            self._close_tail()
+            self._base_offsets = np.load(offsets_path, mmap_mode="r")
+            self._base_blob = _map_file(blob_path)
+        _prune(path, name)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_tail()
+
+    def _close_tail(self) -> None:
+        if self._tail is not None:
+            self._tail.close()
+            self._tail = None
+            self._tail_offsets = [0]
+
+    @classmethod
+    def from_rows(cls, docs: Iterable[Dict], spill_dir: Optional[str | Path] = None) -> "DocStore":
+        store = cls(spill_dir=spill_dir)
+        store.extend(docs)
+        return store
@@ -0,0 +1,81 @@
+"""Inference backends for SentenceTransformer models.
+
+Kept identical in DOCUMENT-AI.v01/app/core and REQUIREMENT-AI.v01/app/core:
+the two apps deploy separately and share no package, so change both copies
+together.
+"""
+from typing import Any, Dict, Optional
+
+import logging
+import os
+import platform
+
+logger = logging.getLogger(__name__)
+
+# Vectors from different backends differ slightly, so the embedding cache
+# keys include the backend name (and, for onnx-int8, the quantization).
+#   torch      full-precision PyTorch
+#   onnx       ONNX Runtime, fp32
+#   onnx-int8  ONNX Runtime with dynamically quantized int8 weights
+BACKENDS = ("torch", "onnx", "onnx-int8")
+QUANTIZED_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "edai", "onnx")
+# File suffixes used by the pre-quantized models on the Hugging Face hub
+_QUANTIZED_SUFFIX = {
+    "arm64": "qint8_arm64",
+    "avx2": "quint8_avx2",
+    "avx512": "qint8_avx512",
+    "avx512_vnni": "qint8_avx512_vnni",
+}
+
+
+def default_quantization() -> str:
+    """Quantization config matching this CPU, as named by sentence-transformers."""
+    machine = platform.machine().lower()
+    if machine in ("arm64", "aarch64"):
+        return "arm64"
+    return "avx2"
+
+
+def resolved_quantization(backend: str, quantization: Optional[str] = None) -> Optional[str]:
+    """Quantization config ``backend`` runs with; None for the unquantized backends."""
+    if backend != "onnx-int8":
+        return None
+    return quantization or default_quantization()
+
+
+def load_sentence_transformer(
+    model_name: str,
+    backend: str = "torch",
+    device: Optional[str] = None,
+    quantization: Optional[str] = None,
+    model_kwargs: Optional[Dict[str, Any]] = None,
+) -> Any:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    from sentence_transformers import SentenceTransformer  # type: ignore
+
+    if backend == "torch":
+        return SentenceTransformer(model_name, device=device)
+    if backend == "onnx":
+        return SentenceTransformer(model_name, device=device, backend="onnx", model_kwargs=model_kwargs)
+
+    quantization = resolved_quantization(backend, quantization)
+    suffix = _QUANTIZED_SUFFIX[quantization]
+    file_name = f"onnx/model_{suffix}.onnx"
+    kwargs = dict(model_kwargs or {}, file_name=file_name)
+    from huggingface_hub.utils import EntryNotFoundError  # type: ignore
+
+    try:
+        # Most sentence-transformers models ship pre-quantized ONNX files
+        return SentenceTransformer(model_name, device=device, backend="onnx", model_kwargs=kwargs)
+    except (EntryNotFoundError, FileNotFoundError) as e:
+        logger.info("%s has no %s (%s); quantizing it locally.", model_name, file_name, e)
+    # Otherwise quantize once and keep the result on disk
+    from sentence_transformers import export_dynamic_quantized_onnx_model  # type: ignore
+
+    local_dir = os.path.join(QUANTIZED_CACHE_DIR, model_name.replace("/", "--"))
+    if not os.path.exists(os.path.join(local_dir, file_name)):
+        fp32 = SentenceTransformer(model_name, device=device, backend="onnx")
+        fp32.save_pretrained(local_dir)
+        export_dynamic_quantized_onnx_model(fp32, quantization, local_dir, file_suffix=suffix)
+    return SentenceTransformer(local_dir, device=device, backend="onnx", model_kwargs=kwargs)
@@ -1,37 +1,100 @@
-from typing import List, Optional, Tuple, Dict
+from typing import Any, List, Optional, Tuple, Dict
 
 import threading
 import numpy as np
 
+from app.core.embed_backends import load_sentence_transformer
+from app.core.embed_cache import get_embedding_cache
+from app.core.microbatch import MicroBatcher
+
 
 # Process-wide cache for heavy models to avoid repeated loads
-_MODEL_CACHE: Dict[Tuple[str, Optional[str]], object] = {}
+_MODEL_CACHE: Dict[Tuple[str, Optional[str], str, Optional[str]], object] = {}
 _CACHE_LOCK = threading.Lock()
+# One query micro-batcher per loaded model, shared by every TextEmbedder using it
+_BATCHERS: Dict[Tuple[str, Optional[str], str, Optional[str]], MicroBatcher] = {}
 
 
-def _get_model(model_name: str, device: Optional[str]) -> object:
-    key = (model_name, device)
+def _get_model(model_name: str, device: Optional[str], backend: str = "torch", quantization: Optional[str] = None) -> object:
+    key = (model_name, device, backend, quantization)
     with _CACHE_LOCK:
         if key in _MODEL_CACHE:
             return _MODEL_CACHE[key]
-        # Lazy import to keep module import cheap
-        from sentence_transformers import SentenceTransformer  # type: ignore
-        model = SentenceTransformer(model_name, device=device)
+        # sentence-transformers is imported lazily inside, keeping module import cheap
+        model = load_sentence_transformer(model_name, backend, device=device, quantization=quantization)
         _MODEL_CACHE[key] = model
         return model
 
 
+def microbatch_stats() -> Dict[str, Dict[str, float]]:
+    """Batch fill and added wait time of each query micro-batcher, by model."""
+    with _CACHE_LOCK:
+        batchers = list(_BATCHERS.items())
+    return {f"{name}|{backend}": b.stats() for (name, _device, backend, _q), b in batchers}
+
+
 class TextEmbedder:
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", device: Optional[str] = None):
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        device: Optional[str] = None,
+        backend: str = "torch",
+        quantization: Optional[str] = None,
+        microbatch: Optional[Dict[str, Any]] = None,
+    ):
+        """``backend`` is torch, onnx or onnx-int8 (ONNX Runtime with int8 weights).
+        ``microbatch`` ({"enabled", "max_batch", "window_ms"}) configures embed_queries."""
         self.model_name = model_name
         self.device = device
-        self.model = _get_model(model_name, device)
+        self.backend = backend
+        self.quantization = quantization
+        self.microbatch = microbatch or {}
+        self._model_key = (model_name, device, backend, quantization)
+        self.model = _get_model(model_name, device, backend, quantization)
         # Dimension lookup should be cheap; keep for fast empty-output shape
         self.dim = int(self.model.get_sentence_embedding_dimension())
 
     def embed(self, texts: List[str], batch_size: int = 64, normalize: bool = True) -> np.ndarray:
         if not texts:
             return np.empty((0, self.dim), dtype=np.float32)
+        cache = get_embedding_cache(self.model_name, self.backend, self.quantization)
+        if cache is None:
+            return self._encode(texts, batch_size, normalize)
+        # The shared cache stores raw vectors; only unseen chunks reach the model
+        arr = cache.encode(texts, lambda missing: self._encode(missing, batch_size, normalize=False))
+        if normalize:
+            norms = np.linalg.norm(arr, axis=1, keepdims=True)
+            arr = arr / np.maximum(norms, 1e-12)
+        return arr.astype(np.float32, copy=False)
+
+    def embed_queries(self, texts: List[str], normalize: bool = True) -> np.ndarray:
+        """Embed a few query strings; concurrent callers share one forward pass."""
+        if not texts:
+            return np.empty((0, self.dim), dtype=np.float32)
+        if not self.microbatch.get("enabled", True):
+            return self._encode(texts, len(texts), normalize)
+        arr = self._batcher().encode(texts).astype(np.float32, copy=False)
+        if normalize:
+            arr = arr / np.maximum(np.linalg.norm(arr, axis=1, keepdims=True), 1e-12)
+        return arr
+
+    def _batcher(self) -> MicroBatcher:
+        with _CACHE_LOCK:
+            batcher = _BATCHERS.get(self._model_key)
+            if batcher is None:
+                model = self.model
+                batcher = MicroBatcher(
+                    lambda texts: model.encode(
+                        texts, batch_size=len(texts), show_progress_bar=False, convert_to_numpy=True
+                    ),
+                    max_batch=int(self.microbatch.get("max_batch", 32)),
+                    window_ms=float(self.microbatch.get("window_ms", 2)),
+                    name="query",
+                )
+                _BATCHERS[self._model_key] = batcher
+            return batcher
+
+    def _encode(self, texts: List[str], batch_size: int, normalize: bool) -> np.ndarray:
         # sentence-transformers handles internal batching; we pass desired batch_size
         arr = self.model.encode(
             texts,
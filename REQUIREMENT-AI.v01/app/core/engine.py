@@ -1,76 +1,290 @@
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
+import contextlib
+import threading
 import time
+import numpy as np
 import yaml
 
-from app.ingestion.load import list_input_files, load_and_normalize
-from app.ingestion.chunk import chunk_document
+from app.ingestion.load import OCR_DPI, list_input_files
+from app.ingestion.parallel import iter_documents
+from app.ingestion.stream import chunk_batches, prefetch
 from app.core.embedder import TextEmbedder
 from app.core.retriever import FaissRetriever
+from app.core.corpus_index import MANIFEST_FILE, CorpusManifest, default_index_dir
+from app.core import index_factory
 from app.core.rag import synthesize_requirements
 from app.core.nlp import normalize_and_classify
-from app.core.validation import validate_requirements
+from app.core.validation import MAX_CONFLICTS, validate_requirements
 from app.core.prioritization import prioritize
 from app.core.output import write_docx, write_excel, generate_user_stories, write_user_stories
 from app.core.sectioning import annotate_sections, summarize_sections
 
+# Runs over the same input directory update its index one at a time
+_INDEX_LOCKS: Dict[str, threading.Lock] = {}
+_INDEX_LOCKS_GUARD = threading.Lock()
+
+
+def _index_lock(index_dir: Path) -> threading.Lock:
+    with _INDEX_LOCKS_GUARD:
+        return _INDEX_LOCKS.setdefault(str(index_dir.resolve()), threading.Lock())
+
 
 class PipelineEngine:
     def __init__(self, config_path: str | Path):
         self.config = yaml.safe_load(Path(config_path).read_text(encoding="utf-8"))
 
-    def run(self, input_dir: str | Path, out_dir: str | Path, query: str = "Requirements for the project") -> Dict:
+    def _embedder(self) -> TextEmbedder:
+        emb_cfg = self.config["embedding"]
+        return TextEmbedder(
+            emb_cfg["model"],
+            backend=emb_cfg.get("backend", "torch"),
+            quantization=emb_cfg.get("quantization"),
+            microbatch=emb_cfg.get("microbatch"),
+        )
+
+    def _index_settings(self) -> Dict:
+        # Anything that changes the stored vectors or rows invalidates a persisted index
+        cfg = self.config
+        index_cfg = cfg.get("index", {}) or {}
+        return {
+            "model": cfg["embedding"]["model"],
+            "backend": cfg["embedding"].get("backend", "torch"),
+            "quantization": cfg["embedding"].get("quantization"),
+            "chunk_size": cfg["chunking"]["size"],
+            "chunk_overlap": cfg["chunking"]["overlap"],
+            "index_type": index_cfg.get("type", "auto"),
+            "target_recall": index_cfg.get("target_recall", 0.95),
+            "nlist": index_cfg.get("nlist"),
+            "hnsw_m": index_cfg.get("hnsw_m", 32),
+        }
+
+    def _new_retriever(
+        self, dim: int, expected_size: int, index_type: Optional[str] = None, spill_dir: Optional[Path] = None
+    ) -> FaissRetriever:
+        index_cfg = self.config.get("index", {}) or {}
+        return FaissRetriever(
+            dim=dim,
+            expected_size=expected_size,
+            index_type=index_type or index_cfg.get("type", "auto"),
+            target_recall=index_cfg.get("target_recall", 0.95),
+            nprobe=index_cfg.get("nprobe"),
+            ef_search=index_cfg.get("ef_search"),
+            nlist=index_cfg.get("nlist"),
+            hnsw_m=index_cfg.get("hnsw_m", 32),
+            spill_dir=spill_dir,
+        )
+
+    def _wanted_index_type(self, total: int) -> str:
+        # Streaming builds start flat; "auto" picks the final kind once the row count is known
+        index_cfg = self.config.get("index", {}) or {}
+        index_type = index_cfg.get("type", "auto")
+        if index_type != "auto":
+            return index_type
+        return index_factory.choose_index_type(total, index_cfg.get("target_recall", 0.95))
+
+    def index_corpus(
+        self,
+        input_dir: str | Path,
+        index_dir: str | Path | None = None,
+        files: Optional[List[Path]] = None,
+        embedder: Optional[TextEmbedder] = None,
+        persist: Optional[bool] = None,
+    ) -> Tuple[Optional[FaissRetriever], Dict]:
+        """Build or update the persisted index for ``input_dir``.
+
+        Files that match the manifest keep their stored vectors; only new or
+        changed files are loaded, chunked and embedded, and rows of changed or
+        deleted files are dropped. Returns (retriever, stats); the retriever is
+        None if embedding failed.
+        """
+        cfg = self.config
+        index_cfg = cfg.get("index", {}) or {}
+        if persist is None:
+            persist = bool(index_cfg.get("persist", True))
+        if files is None:
+            files = list_input_files(input_dir)
+        if persist:
+            index_dir = Path(index_dir) if index_dir else default_index_dir(input_dir, index_cfg.get("dir"))
+        else:
+            index_dir = None
+        embedder = embedder or self._embedder()
+        settings = self._index_settings()
+
+        with _index_lock(index_dir) if index_dir else contextlib.nullcontext():
+            retriever = None
+            manifest = CorpusManifest.load(index_dir) if index_dir else None
+            if manifest is not None and manifest.settings == settings:
+                try:
+                    retriever = FaissRetriever.load(index_dir, nprobe=index_cfg.get("nprobe"), ef_search=index_cfg.get("ef_search"))
+                except (OSError, ValueError, RuntimeError):
+                    retriever = None
+                if retriever is not None and len(retriever.docs) != manifest.ntotal:
+                    retriever = None
+            reused = retriever is not None
+            if not reused:
+                manifest = CorpusManifest(settings)
+            diff = manifest.diff(files)
+
+            t_stream_start = time.perf_counter()
+            ingest_cfg = cfg.get("ingestion", {}) or {}
+            stats = {
+                "index_dir": str(index_dir) if index_dir else None,
+                "reused_index": reused,
+                "files_unchanged": len(diff.unchanged),
+                "files_embedded": len(diff.changed),
+                "stale_sources": len(diff.stale_sources),
+                "chunks_embedded": 0,
+                "file_timings": [],
+            }
+
+            if reused and not diff.stale_sources:
+                # Only additions: stream straight into the loaded index
+                target = retriever
+            else:
+                # Chunk docs go to disk as they arrive, next to the index they will be saved with
+                target = self._new_retriever(embedder.dim, 0, index_type="flat", spill_dir=index_dir)
+                if reused:
+                    # Surviving rows come back out of the index a block at a time, not through the model
+                    stale = set(diff.stale_sources)
+                    row = 0
+                    for block in retriever.iter_vectors():
+                        docs = retriever.docs[row:row + len(block)]
+                        keep = np.array([d["source"] not in stale for d in docs], dtype=bool)
+                        if keep.any():
+                            target.add(block[keep], [d for d, k in zip(docs, keep) if k])
+                        row += len(block)
+                    retriever = None
+
+            def on_document(doc: Dict, doc_chunks: List[Dict]) -> None:
+                entry = {"source": doc["source"], **doc["timings"]}
+                if "error" in doc:
+                    entry["error"] = doc["error"]
+                stats["file_timings"].append(entry)
+                if doc_chunks:
+                    # Files with no text (or a failed load) stay out of the manifest and are retried next run
+                    manifest.record(Path(doc["source"]), doc["source"], len(doc_chunks))
+
+            # list -> load (process pool, a window of files in flight) -> chunk on a producer
+            # thread -> embed and add here in fixed-size batches; bounded hand-offs throughout
+            docs_iter = iter_documents(
+                diff.changed,
+                workers=ingest_cfg.get("workers"),
+                ocr_dpi=ingest_cfg.get("ocr_dpi", OCR_DPI),
+                window=ingest_cfg.get("prefetch_files"),
+            )
+            batches = prefetch(
+                chunk_batches(
+                    docs_iter,
+                    cfg["chunking"]["size"],
+                    cfg["chunking"]["overlap"],
+                    int(ingest_cfg.get("stream_batch", 2048)),
+                    on_document,
+                ),
+                maxsize=int(ingest_cfg.get("prefetch_batches", 2)),
+            )
+            embed_s = add_s = 0.0
+
+            def stream_timings(t_end: float) -> None:
+                # Stages overlap: load/chunk time is what embedding spent waiting for batches
+                stats["load_and_chunk_ms"] = int((t_end - t_stream_start - embed_s - add_s) * 1000)
+                stats["embed_ms"] = int(embed_s * 1000)
+                stats["index_ms"] = int(add_s * 1000)
+
+            with contextlib.closing(batches):
+                for batch in batches:
+                    t_embed = time.perf_counter()
+                    embeddings = embedder.embed(
+                        [c["text"] for c in batch],
+                        batch_size=cfg["embedding"].get("batch_size", 64),
+                    )
+                    t_add = time.perf_counter()
+                    embed_s += t_add - t_embed
+                    if embeddings.size == 0 or embeddings.ndim != 2:
+                        stream_timings(time.perf_counter())
+                        target.docs.close()
+                        return None, stats
+                    target.add(embeddings, batch)
+                    stats["chunks_embedded"] += len(batch)
+                    add_s += time.perf_counter() - t_add
+            retriever = target
+            t_finish_start = time.perf_counter()
+            stream_timings(t_finish_start)
+
+            wanted = self._wanted_index_type(len(retriever.docs))
+            if retriever.docs and index_factory.index_kind(retriever.index) != wanted:
+                retriever = retriever.rebuilt(
+                    wanted,
+                    target_recall=index_cfg.get("target_recall", 0.95),
+                    nlist=index_cfg.get("nlist"),
+                    hnsw_m=index_cfg.get("hnsw_m", 32),
+                )
+            manifest.ntotal = len(retriever.docs)
+            if index_dir and (not reused or diff.changed or diff.stale_sources):
+                # Manifest out first and back in last: it is what marks the stored index as usable
+                (index_dir / MANIFEST_FILE).unlink(missing_ok=True)
+                retriever.save(index_dir)
+                manifest.save(index_dir)
+            elif index_dir and diff.refreshed:
+                # Touched but identical files: skip hashing them next time
+                manifest.save(index_dir)
+            stats["index_ms"] = int((add_s + time.perf_counter() - t_finish_start) * 1000)
+            return retriever, stats
+
+    def run(
+        self,
+        input_dir: str | Path,
+        out_dir: str | Path,
+        query: str = "Requirements for the project",
+        persist_index: Optional[bool] = None,
+    ) -> Dict:
         cfg = self.config
         t0 = time.perf_counter()
         files = list_input_files(input_dir)
-        t_load_start = time.perf_counter()
-        raw_docs = [load_and_normalize(p) for p in files]
-
-        chunks: List[Dict] = []
-        for d in raw_docs:
-            chunks.extend(chunk_document(d, cfg["chunking"]["size"], cfg["chunking"]["overlap"]))
+        t_model_start = time.perf_counter()
+        embedder = self._embedder()
+        t_index_start = time.perf_counter()
+        retriever, index_stats = self.index_corpus(input_dir, files=files, embedder=embedder, persist=persist_index)
 
-        if not chunks:
+        if retriever is None:
             return {
                 "files": files,
-                "num_chunks": 0,
+                "num_chunks": index_stats["chunks_embedded"],
                 "num_candidates": 0,
                 "validation": {"flags": [], "missing": []},
                 "output_dir": str(Path(out_dir)),
-                "message": "No text extracted from inputs. Ensure docs exist and OCR is configured."
+                "message": "Failed to compute embeddings. Check model and inputs."
             }
-
-        t_embed_start = time.perf_counter()
-        embedder = TextEmbedder(cfg["embedding"]["model"])
-        embeddings = embedder.embed(
-            [c["text"] for c in chunks],
-            batch_size=cfg["embedding"].get("batch_size", 64),
-        )
-        if embeddings.size == 0 or embeddings.ndim != 2:
+        if not retriever.docs:
             return {
                 "files": files,
-                "num_chunks": len(chunks),
+                "num_chunks": 0,
                 "num_candidates": 0,
                 "validation": {"flags": [], "missing": []},
                 "output_dir": str(Path(out_dir)),
-                "message": "Failed to compute embeddings. Check model and inputs."
+                "message": "No text extracted from inputs. Ensure docs exist and OCR is configured."
             }
 
-        t_retriever_start = time.perf_counter()
-        retriever = FaissRetriever(dim=embeddings.shape[1])
-        retriever.add(embeddings, chunks)
-
-        query_vec = embedder.embed([query])
+        t_search_start = time.perf_counter()
+        query_vec = embedder.embed_queries([query])
         if query_vec.size == 0:
-            query_vec = embeddings[:1]
+            query_vec = retriever.vectors()[:1]
         results = retriever.search(query_vec, k=cfg["rag"].get("k", 6)) [0]
         contexts = [doc for _score, doc in results]
 
         t_rag_start = time.perf_counter()
         candidates = synthesize_requirements(query, contexts, cfg["rag"].get("llm_provider"))
         parsed = normalize_and_classify(candidates)
-        validation = validate_requirements(parsed)
+        val_cfg = cfg.get("validation", {}) or {}
+        validation = validate_requirements(
+            parsed,
+            conflict_mode=val_cfg.get("conflicts", "modal"),
+            embedder=embedder,
+            k=val_cfg.get("k", 10),
+            min_similarity=val_cfg.get("min_similarity", 0.5),
+            max_conflicts=val_cfg.get("max_conflicts", MAX_CONFLICTS),
+        )
         prioritized = prioritize(parsed)
         # NLP-based sectioning (with optional external enrichment via env)
         try:
@@ -91,10 +305,13 @@ class PipelineEngine:
             write_user_stories(stories, out / "user_stories.txt")
 
         timings = {
-            "list_files_ms": int((t_load_start - t0) * 1000),
-            "load_and_chunk_ms": int((t_embed_start - t_load_start) * 1000),
-            "embed_ms": int((t_retriever_start - t_embed_start) * 1000),
-            "index_and_search_ms": int((t_rag_start - t_retriever_start) * 1000),
+            "list_files_ms": int((t_model_start - t0) * 1000),
+            "load_model_ms": int((t_index_start - t_model_start) * 1000),
+            "load_and_chunk_ms": index_stats["load_and_chunk_ms"],
+            "embed_ms": index_stats["embed_ms"],
+            "index_and_search_ms": index_stats["index_ms"] + int((t_rag_start - t_search_start) * 1000),
+            # Per file loaded this run; ocr_ms is summed over pages OCR'd in parallel
+            "files": index_stats.pop("file_timings"),
             "rag_nlp_validate_prioritize_ms": None,
             "total_ms": None,
         }
@@ -104,11 +321,12 @@ class PipelineEngine:
 
         return {
             "files": files,
-            "num_chunks": len(chunks),
+            "num_chunks": len(retriever.docs),
             "num_candidates": len(candidates),
             "validation": validation,
             "output_dir": str(out),
             "timings": timings,
+            "index": index_stats,
             "prioritized": prioritized,
             "user_stories": stories if cfg["output"].get("generate_user_stories", True) else [],
             "sections_summary": sections_summary,
@@ -0,0 +1,148 @@
+"""Content-addressed cache of extracted document text.
+
+OCR is the slowest step of ingestion, and the same scanned appendices turn up
+in many RFP submissions. Text is cached by content hash at two levels: whole
+files (sha256 of the file bytes) and OCR'd PDF pages (sha256 of the rendered
+pixmap). Re-processing a known document costs a hash and a read, and a known
+page inside a new document skips Tesseract.
+"""
+from pathlib import Path
+from typing import Dict, Optional
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+# On-disk layout:
+#   <cache_dir>/text.sqlite   key -> zlib-compressed UTF-8 text, size, LRU timestamp
+# Every worker process opens the same file; SQLite's locks serialize writers.
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "edai", "extraction")
+DEFAULT_MAX_MB = 1024
+# Bump when extraction output changes so stale text is never served
+EXTRACTOR_VERSION = 1
+
+
+def file_sha256(path: str | Path, block_size: int = 1 << 20) -> str:
+    """Hex sha256 of a file's bytes, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """Compressed text keyed by content hash, evicted least recently used
+    first once the stored (compressed) bytes exceed ``max_bytes``."""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = DEFAULT_MAX_MB * 2**20):
+        self.dir = cache_dir or DEFAULT_CACHE_DIR
+        os.makedirs(self.dir, exist_ok=True)
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(self.dir, "text.sqlite"), timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, data BLOB, size INTEGER, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used)")
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(kind: str, digest: str, **params) -> bytes:
+        """Key for ``kind`` ("file" or "page") content with hash ``digest``;
+        ``params`` are whatever else shapes the text (DPI, Tesseract version)."""
+        parts = [kind, f"v{EXTRACTOR_VERSION}", digest] + [f"{k}={params[k]}" for k in sorted(params)]
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).digest()
+
+    def get(self, key: bytes) -> Optional[str]:
+        with self._lock:
+            try:
+                row = self._db.execute("SELECT data FROM entries WHERE key = ?", (key,)).fetchone()
+            except sqlite3.OperationalError:
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touch(key)
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, key: bytes, text: str) -> None:
+        data = zlib.compress(text.encode("utf-8"), 6)
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, data, size, last_used) VALUES (?, ?, ?, ?)",
+                    (key, data, len(data), time.time()),
+                )
+                self._evict()
+                self._db.execute("COMMIT")
+            except sqlite3.OperationalError:
+                # Best effort: a busy cache never fails an extraction
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries, stored = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": stored,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            }
+
+    def _evict(self):
+        # Called inside the write transaction
+        excess = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0] - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        cursor = self._db.execute("SELECT key, size FROM entries ORDER BY last_used")
+        for k, size in cursor:
+            victims.append((k,))
+            excess -= size
+            if excess <= 0:
+                break
+        cursor.close()
+        self._db.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def _touch(self, key):
+        try:
+            self._db.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.OperationalError:
+            # LRU order is advisory; never fail a lookup because another process holds the lock
+            pass
+
+
+_cache: Optional[ExtractionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """Process-wide cache, configured from the environment.
+
+    EDAI_EXTRACT_CACHE=0 disables it; EDAI_EXTRACT_CACHE_DIR and
+    EDAI_EXTRACT_CACHE_MAX_MB set location and size cap.
+    """
+    global _cache
+    if os.environ.get("EDAI_EXTRACT_CACHE", "1") == "0":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache(
+                cache_dir=os.environ.get("EDAI_EXTRACT_CACHE_DIR") or None,
+                max_bytes=int(float(os.environ.get("EDAI_EXTRACT_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 2**20),
+            )
+        return _cache
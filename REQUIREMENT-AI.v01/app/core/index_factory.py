@@ -0,0 +1,149 @@
+"""FAISS index selection.
+
+Picks Flat, IVF or HNSW (all inner product) from corpus size and a target
+recall, and exposes nprobe/efSearch per search call. faiss is imported inside
+the functions that use it, so importing this module stays cheap.
+
+Kept identical in DOCUMENT-AI.v01/app/core and REQUIREMENT-AI.v01/app/core:
+the two apps deploy separately and share no package, so change both copies
+together.
+"""
+from typing import Optional, Tuple
+
+import math
+
+import numpy as np
+
+# Corpus sizes below FLAT_MAX are searched exactly; brute force over a few
+# tens of thousands of 384-d vectors is already sub-millisecond territory.
+FLAT_MAX = 20_000
+# HNSW keeps its graph in RAM (~hnsw_m * 8 bytes per vector on top of the
+# vectors) and builds slowly, so very large corpora use IVF instead.
+HNSW_MAX = 2_000_000
+HNSW_MIN_RECALL = 0.97
+
+# (min target recall, share of IVF lists probed / HNSW efSearch)
+_NPROBE_FRACTION = ((0.99, 1 / 8), (0.95, 1 / 32), (0.0, 1 / 64))
+_EF_SEARCH = ((0.99, 256), (0.95, 128), (0.0, 64))
+
+
+def _pick(table, target_recall: float):
+    for min_recall, value in table:
+        if target_recall >= min_recall:
+            return value
+    return table[-1][1]
+
+
+def choose_index_type(n: int, target_recall: float = 0.95, flat_max: int = FLAT_MAX, hnsw_max: int = HNSW_MAX) -> str:
+    if n <= flat_max:
+        return "flat"
+    if target_recall >= HNSW_MIN_RECALL and n <= hnsw_max:
+        return "hnsw"
+    return "ivf"
+
+
+def default_nlist(n: int) -> int:
+    # faiss guidance is 4*sqrt(n)..16*sqrt(n) lists with ~39+ training points each
+    return max(1, min(int(4 * math.sqrt(n)), n // 39, 65536))
+
+
+def default_nprobe(nlist: int, target_recall: float = 0.95) -> int:
+    return max(1, math.ceil(nlist * _pick(_NPROBE_FRACTION, target_recall)))
+
+
+def default_ef_search(target_recall: float = 0.95) -> int:
+    return _pick(_EF_SEARCH, target_recall)
+
+
+def index_kind(index) -> str:
+    import faiss  # type: ignore
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
+
+
+def new_index(
+    dim: int,
+    n: int,
+    index_type: str = "auto",
+    target_recall: float = 0.95,
+    nlist: Optional[int] = None,
+    hnsw_m: int = 32,
+    flat_max: int = FLAT_MAX,
+    hnsw_max: int = HNSW_MAX,
+):
+    """Create an empty inner-product index sized for about ``n`` vectors.
+
+    IVF indexes come back untrained; pass them through ``train_index``.
+    """
+    import faiss  # type: ignore
+    kind = choose_index_type(n, target_recall, flat_max, hnsw_max) if index_type == "auto" else index_type
+    if kind == "flat":
+        return faiss.IndexFlatIP(dim)
+    if kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, int(hnsw_m), faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = max(40, 2 * int(hnsw_m))
+        index.hnsw.efSearch = default_ef_search(target_recall)
+        return index
+    if kind == "ivf":
+        nlist = int(nlist) if nlist else default_nlist(n)
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.nprobe = default_nprobe(nlist, target_recall)
+        return index
+    raise ValueError(f"Unknown index type: {index_type}")
+
+
+def train_index(index, vectors: np.ndarray, max_points_per_list: int = 256, seed: int = 0):
+    import faiss  # type: ignore
+    if index.is_trained:
+        return index
+    nlist = faiss.extract_index_ivf(index).nlist
+    if len(vectors) < nlist:
+        raise ValueError(f"Need at least {nlist} vectors to train an IVF index with {nlist} lists, got {len(vectors)}.")
+    # k-means only looks at ~256 points per centroid anyway; sample up front
+    sample_size = min(len(vectors), nlist * max_points_per_list)
+    if sample_size < len(vectors):
+        rows = np.random.default_rng(seed).choice(len(vectors), sample_size, replace=False)
+        vectors = vectors[np.sort(rows)]
+    index.train(np.ascontiguousarray(vectors, dtype=np.float32))
+    return index
+
+
+def make_index(vectors: np.ndarray, index_type: str = "auto", target_recall: float = 0.95, **kwargs):
+    """A trained index holding ``vectors``, its type chosen from their count."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    index = new_index(dim, n, index_type=index_type, target_recall=target_recall, **kwargs)
+    train_index(index, vectors)
+    index.add(vectors)
+    return index
+
+
+def search(index, queries: np.ndarray, k: int, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    import faiss  # type: ignore
+    # Per-call parameters leave a shared index untouched
+    params = None
+    kind = index_kind(index)
+    if kind == "ivf" and nprobe:
+        params = faiss.SearchParametersIVF(nprobe=int(nprobe))
+    elif kind == "hnsw" and ef_search:
+        params = faiss.SearchParametersHNSW(efSearch=max(int(ef_search), k))
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    if params is None:
+        return index.search(queries, k)
+    return index.search(queries, k, params=params)
+
+
+def reconstruct_all(index) -> np.ndarray:
+    """Return every stored vector, in id order, for any index built here."""
+    import faiss  # type: ignore
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    if index.ntotal == 0:
+        return np.empty((0, index.d), dtype=np.float32)
+    return index.reconstruct_n(0, index.ntotal)
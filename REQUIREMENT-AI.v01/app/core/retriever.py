@@ -1,31 +1,144 @@
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import Iterator, List, Dict, Tuple, Optional
 
+import json
+import os
 import numpy as np
 
+from app.core import index_factory
+from app.core.doc_store import DocStore, doc_store_exists
+
+# Files written under a retriever's index_path directory (plus the DocStore files)
+INDEX_FILE = "faiss.index"
+# Chunk docs of indexes saved before the DocStore; still read
+LEGACY_DOCS_FILE = "docs.json"
+
 
 class FaissRetriever:
-    def __init__(self, dim: int, index_path: str | Path | None = None):
-        # Lazy import FAISS to avoid heavy global import
-        import faiss  # type: ignore
+    def __init__(
+        self,
+        dim: int,
+        index_path: str | Path | None = None,
+        expected_size: int = 0,
+        index_type: str = "flat",
+        target_recall: float = 0.95,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        nlist: Optional[int] = None,
+        hnsw_m: int = 32,
+        spill_dir: str | Path | None = None,
+    ):
         self.dim = dim
-        self.index = faiss.IndexFlatIP(dim)
-        self.docs: List[Dict] = []
+        # index_type "auto" picks Flat/IVF/HNSW from expected_size and target_recall
+        self.index = index_factory.new_index(
+            dim, expected_size, index_type=index_type, target_recall=target_recall, nlist=nlist, hnsw_m=hnsw_m
+        )
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        # Chunk docs stay on disk (spilled to a temp file in spill_dir until saved)
+        self.docs = DocStore(spill_dir=spill_dir)
         self.index_path = Path(index_path) if index_path else None
 
     def add(self, embeddings: np.ndarray, docs: List[Dict]) -> None:
         if embeddings.dtype != np.float32:
             embeddings = embeddings.astype(np.float32)
+        if not self.index.is_trained:
+            # IVF: train on a sample of the first batch
+            index_factory.train_index(self.index, embeddings)
         self.index.add(embeddings)
         self.docs.extend(docs)
 
     def search(self, query_embeddings: np.ndarray, k: int = 6) -> List[List[Tuple[float, Dict]]]:
         if query_embeddings.dtype != np.float32:
             query_embeddings = query_embeddings.astype(np.float32)
-        scores, idxs = self.index.search(query_embeddings, k)
+        scores, idxs = index_factory.search(self.index, query_embeddings, k, nprobe=self.nprobe, ef_search=self.ef_search)
         results: List[List[Tuple[float, Dict]]] = []
         for row_scores, row_idxs in zip(scores, idxs):
             results.append([(float(s), self.docs[i]) for s, i in zip(row_scores, row_idxs) if i >= 0 and i < len(self.docs)])
         return results
 
+    def vectors(self) -> np.ndarray:
+        """Stored vectors in row order, so rows can be kept without re-embedding."""
+        return index_factory.reconstruct_all(self.index)
+
+    def iter_vectors(self, block_size: int = 65536) -> Iterator[np.ndarray]:
+        """Stored vectors in row order, ``block_size`` rows at a time."""
+        import faiss  # type: ignore
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None:
+            ivf.make_direct_map()
+        for start in range(0, self.index.ntotal, block_size):
+            yield self.index.reconstruct_n(start, min(block_size, self.index.ntotal - start))
+
+    def rebuilt(
+        self,
+        index_type: str,
+        target_recall: float = 0.95,
+        nlist: Optional[int] = None,
+        hnsw_m: int = 32,
+        block_size: int = 65536,
+        seed: int = 0,
+    ) -> "FaissRetriever":
+        """The same rows in a new ``index_type`` index, copied a block at a time."""
+        import faiss  # type: ignore
+        new = FaissRetriever(
+            self.dim,
+            index_path=self.index_path,
+            expected_size=len(self.docs),
+            index_type=index_type,
+            target_recall=target_recall,
+            nprobe=self.nprobe,
+            ef_search=self.ef_search,
+            nlist=nlist,
+            hnsw_m=hnsw_m,
+        )
+        if not new.index.is_trained:
+            # IVF: train on a row sample rather than the whole corpus
+            ntotal = self.index.ntotal
+            sample_size = min(ntotal, faiss.extract_index_ivf(new.index).nlist * 256)
+            rows = np.sort(np.random.default_rng(seed).choice(ntotal, sample_size, replace=False))
+            ivf = faiss.try_extract_index_ivf(self.index)
+            if ivf is not None:
+                ivf.make_direct_map()
+            index_factory.train_index(new.index, self.index.reconstruct_batch(rows.astype(np.int64)))
+        for block in self.iter_vectors(block_size):
+            new.index.add(block)
+        new.docs = self.docs
+        return new
 
+    def save(self, index_path: str | Path | None = None) -> Path:
+        """Write the index and its docs into the ``index_path`` directory."""
+        import faiss  # type: ignore
+        path = Path(index_path) if index_path else self.index_path
+        if path is None:
+            raise ValueError("No index_path to save the retriever to.")
+        path.mkdir(parents=True, exist_ok=True)
+        # Each file is swapped in whole; a reader never sees a partial write
+        faiss.write_index(self.index, str(path / (INDEX_FILE + ".tmp")))
+        os.replace(path / (INDEX_FILE + ".tmp"), path / INDEX_FILE)
+        self.docs.save(path)
+        (path / LEGACY_DOCS_FILE).unlink(missing_ok=True)
+        self.index_path = path
+        return path
+
+    @classmethod
+    def load(cls, index_path: str | Path, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> "FaissRetriever":
+        import faiss  # type: ignore
+        path = Path(index_path)
+        index = faiss.read_index(str(path / INDEX_FILE))
+        if doc_store_exists(path):
+            docs = DocStore(path, spill_dir=path)
+        else:
+            docs = DocStore.from_rows(
+                json.loads((path / LEGACY_DOCS_FILE).read_text(encoding="utf-8")), spill_dir=path
+            )
+        if len(docs) != index.ntotal:
+            raise ValueError(f"{path}: index has {index.ntotal} vectors but {len(docs)} docs.")
+        retriever = cls.__new__(cls)
+        retriever.dim = index.d
+        retriever.index = index
+        retriever.nprobe = nprobe
+        retriever.ef_search = ef_search
+        retriever.docs = docs
+        retriever.index_path = path
+        return retriever
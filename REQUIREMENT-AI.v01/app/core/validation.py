@@ -1,8 +1,14 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+import numpy as np
 
 
 AMBIGUOUS_TERMS = {"fast", "easy", "user-friendly", "quickly", "optimize", "seamless"}
 CONFLICT_TERMS = [("must", "should"), ("must", "could"), ("should", "wont")]
+MODAL_TERMS = ("must", "should", "could", "wont")
+CONFLICT_MODES = ("modal", "semantic")
+# Conflict flags listed by default; the rest are only counted (conflicts_total)
+MAX_CONFLICTS = 1000
 
 
 def detect_ambiguity(text: str) -> bool:
@@ -20,22 +26,147 @@ def detect_conflict(a: str, b: str) -> bool:
     return False
 
 
-def validate_requirements(reqs: List[Dict]) -> Dict:
+def modal_signature(text: str) -> int:
+    """Bitmask of the MODAL_TERMS found in ``text`` (same substring test as detect_conflict)."""
+    lower = text.lower()
+    sig = 0
+    for bit, term in enumerate(MODAL_TERMS):
+        if term in lower:
+            sig |= 1 << bit
+    return sig
+
+
+def _conflict_table() -> np.ndarray:
+    # table[s, t]: detect_conflict holds for any texts with signatures s and t
+    n = 1 << len(MODAL_TERMS)
+    table = np.zeros((n, n), dtype=bool)
+    bits = [(1 << MODAL_TERMS.index(t1), 1 << MODAL_TERMS.index(t2)) for t1, t2 in CONFLICT_TERMS]
+    for s in range(n):
+        for t in range(n):
+            table[s, t] = any((s & b1 and t & b2) or (s & b2 and t & b1) for b1, b2 in bits)
+    return table
+
+
+_CONFLICTS = _conflict_table()
+
+
+def count_conflicts(sigs: np.ndarray) -> int:
+    """Number of conflicting pairs, from bucket sizes alone."""
+    sizes = np.bincount(sigs, minlength=_CONFLICTS.shape[0]).astype(np.int64)
+    cross = int(sizes @ _CONFLICTS.astype(np.int64) @ sizes)
+    # Ordered pairs counted twice; a self-conflicting bucket also counted each i with itself
+    self_pairs = int(sizes[np.diag(_CONFLICTS)].sum())
+    return (cross - self_pairs) // 2
+
+
+def modal_conflicts(sigs: np.ndarray, limit: Optional[int] = None) -> List[tuple]:
+    """Conflicting (i, j) pairs, i < j, in the order the pairwise scan found them.
+
+    Requirements are bucketed once by modal signature; each i only walks the
+    buckets that conflict with its own, so the cost is the output size plus
+    O(n), not n^2 detect_conflict calls.
+    """
+    buckets = {int(s): np.flatnonzero(sigs == s) for s in np.unique(sigs)}
+    partners = {
+        s: [buckets[t] for t in buckets if _CONFLICTS[s, t]] for s in buckets
+    }
+    pairs: List[tuple] = []
+    for i, s in enumerate(sigs.tolist()):
+        groups = partners[s]
+        if not groups:
+            continue
+        later = [g[np.searchsorted(g, i, side="right"):] for g in groups]
+        js = later[0] if len(later) == 1 else np.sort(np.concatenate(later))
+        if limit is not None:
+            js = js[:limit - len(pairs)]
+        pairs.extend((i, j) for j in js.tolist())
+        if limit is not None and len(pairs) >= limit:
+            break
+    return pairs
+
+
+def semantic_conflicts(
+    texts: List[str],
+    sigs: np.ndarray,
+    embedder,
+    k: int = 10,
+    min_similarity: float = 0.5,
+    limit: Optional[int] = None,
+) -> List[tuple]:
+    """Conflicting (i, j, similarity) pairs among each requirement's ``k`` nearest neighbours.
+
+    Only requirements about the same thing (cosine similarity at least
+    ``min_similarity``) are compared, so unrelated must/should statements
+    are not flagged against each other.
+    """
+    from app.core import index_factory
+
+    n = len(texts)
+    if n < 2:
+        return []
+    vectors = embedder.embed(texts)
+    index = index_factory.new_index(vectors.shape[1], n, index_type="auto")
+    if not index.is_trained:
+        index_factory.train_index(index, vectors)
+    index.add(vectors)
+    k = min(int(k) + 1, n)  # each vector's nearest hit is itself
+    scores, idxs = index_factory.search(index, vectors, k)
+
+    rows = np.repeat(np.arange(n), k)
+    cols, sims = idxs.ravel(), scores.ravel()
+    keep = (cols >= 0) & (cols != rows) & (sims >= min_similarity)
+    a, b, sims = np.minimum(rows, cols)[keep], np.maximum(rows, cols)[keep], sims[keep]
+    keep = _CONFLICTS[sigs[a], sigs[b]]
+    a, b, sims = a[keep], b[keep], sims[keep]
+    # A pair found from both ends appears twice; np.unique also sorts by (i, j)
+    pair_ids, first = np.unique(a.astype(np.int64) * n + b, return_index=True)
+    if limit is not None:
+        pair_ids, first = pair_ids[:limit], first[:limit]
+    return [(int(p // n), int(p % n), float(s)) for p, s in zip(pair_ids, sims[first])]
+
+
+def validate_requirements(
+    reqs: List[Dict],
+    conflict_mode: str = "modal",
+    embedder=None,
+    k: int = 10,
+    min_similarity: float = 0.5,
+    max_conflicts: Optional[int] = MAX_CONFLICTS,
+) -> Dict:
+    """Ambiguity, conflict and missing-detail flags for ``reqs``.
+
+    ``conflict_mode`` "modal" flags every pair detect_conflict would;
+    "semantic" (needs ``embedder``) only checks pairs that are FAISS near
+    neighbours. ``max_conflicts`` caps the conflict flags listed; the total
+    is then reported as ``conflicts_total``. ``None`` lists every pair, which
+    for a large modal set can run to millions.
+    """
+    if conflict_mode not in CONFLICT_MODES:
+        raise ValueError(f"Unknown conflict mode: {conflict_mode}")
     flags: List[Dict] = []
     # ambiguity
     for i, r in enumerate(reqs):
         if detect_ambiguity(r["text"]):
             flags.append({"type": "ambiguity", "index": i, "text": r["text"]})
-    # conflicts (naive O(n^2))
-    for i in range(len(reqs)):
-        for j in range(i + 1, len(reqs)):
-            if detect_conflict(reqs[i]["text"], reqs[j]["text"]):
-                flags.append({"type": "conflict", "pair": (i, j)})
+    # conflicts: bucketed by modal signature instead of comparing every pair
+    sigs = np.fromiter((modal_signature(r["text"]) for r in reqs), dtype=np.int64, count=len(reqs))
+    result: Dict = {}
+    if conflict_mode == "semantic":
+        if embedder is None:
+            raise ValueError("Semantic conflict detection needs an embedder.")
+        pairs = semantic_conflicts([r["text"] for r in reqs], sigs, embedder, k, min_similarity)
+        if max_conflicts is not None and len(pairs) > max_conflicts:
+            result["conflicts_total"] = len(pairs)
+            pairs = pairs[:max_conflicts]
+        flags.extend({"type": "conflict", "pair": (i, j), "similarity": round(s, 4)} for i, j, s in pairs)
+    else:
+        pairs = modal_conflicts(sigs, limit=max_conflicts)
+        if max_conflicts is not None and len(pairs) >= max_conflicts:
+            result["conflicts_total"] = count_conflicts(sigs)
+        flags.extend({"type": "conflict", "pair": pair} for pair in pairs)
     # missing fields heuristic: look for subject + action keywords
     missing: List[int] = []
     for i, r in enumerate(reqs):
         if len(r["text"].split()) < 5:
             missing.append(i)
-    return {"flags": flags, "missing": missing}
-
-
+    return {"flags": flags, "missing": missing, **result}
@@ -1,5 +1,8 @@
 from pathlib import Path
-from typing import List, Dict, Iterable
+from typing import List, Dict, Iterable, Optional, Tuple
+
+import functools
+import hashlib
 
 import fitz  # PyMuPDF
 from pdf2image import convert_from_path
@@ -11,6 +14,12 @@ try:
 except Exception:
     docx = None
 
+from app.core.extract_cache import file_sha256, get_extraction_cache
+
+IMAGE_EXTS = {".png", ".jpg", ".jpeg"}
+# Worth caching at file level; plain text is cheaper to read than to look up
+CACHED_EXTS = {".pdf", ".docx"} | IMAGE_EXTS
+
 
 def list_input_files(input_dir: str | Path, exts: Iterable[str] = (".pdf", ".txt", ".png", ".jpg", ".jpeg", ".docx")) -> List[Path]:
     base = Path(input_dir)
@@ -24,17 +33,61 @@ def read_txt(path: Path) -> str:
     return path.read_text(encoding="utf-8", errors="ignore")
 
 
-def extract_text_from_pdf(path: Path) -> str:
-    doc = fitz.open(path)
-    texts: List[str] = []
-    for page in doc:
-        text = page.get_text("text")
-        if not text or text.strip() == "":
+OCR_DPI = 200
+
+
+def pdf_text_pages(path: Path) -> List[Optional[str]]:
+    """Text layer of each page; None marks an image-only page that needs OCR."""
+    with fitz.open(path) as doc:
+        texts: List[Optional[str]] = []
+        for page in doc:
+            text = page.get_text("text")
+            texts.append(text if text and text.strip() != "" else None)
+        return texts
+
+
+@functools.lru_cache(maxsize=1)
+def tesseract_version() -> str:
+    # Part of every OCR cache key: a Tesseract upgrade can change the text
+    try:
+        return str(pytesseract.get_tesseract_version())
+    except Exception:
+        return "unknown"
+
+
+def ocr_pdf_page_cached(path: Path, page_no: int, dpi: int = OCR_DPI) -> Tuple[str, bool]:
+    """OCR text of one page and whether it came from the cache.
+
+    Opens the PDF itself so pool workers receive a path, not a pixmap.
+    """
+    with fitz.open(path) as doc:
+        pix = doc[page_no].get_pixmap(dpi=dpi)
+    cache = get_extraction_cache()
+    key = None
+    if cache is not None:
+        # Keyed by the rendered pixels, so the same scan inside another PDF is a hit
+        digest = hashlib.sha256(pix.samples).hexdigest()
+        key = cache.key("page", digest, size=f"{pix.width}x{pix.height}", tesseract=tesseract_version())
+        text = cache.get(key)
+        if text is not None:
+            return text, True
+    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    text = pytesseract.image_to_string(img)
+    if key is not None:
+        cache.put(key, text)
+    return text, False
+
+
+def ocr_pdf_page(path: Path, page_no: int, dpi: int = OCR_DPI) -> str:
+    return ocr_pdf_page_cached(path, page_no, dpi)[0]
+
+
+def extract_text_from_pdf(path: Path, dpi: int = OCR_DPI) -> str:
+    texts = pdf_text_pages(path)
+    for i, text in enumerate(texts):
+        if text is None:
             # fallback to OCR for image-based pages
-            pix = page.get_pixmap(dpi=200)
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            text = pytesseract.image_to_string(img)
-        texts.append(text)
+            texts[i] = ocr_pdf_page(path, i, dpi)
     return "\n\n".join(texts)
 
 
@@ -64,18 +117,36 @@ def read_docx(path: Path) -> str:
         return ""
 
 
-def load_and_normalize(path: Path) -> Dict:
+def extract_text(path: Path, ocr_dpi: int = OCR_DPI) -> str:
     ext = path.suffix.lower()
     if ext == ".txt":
-        text = read_txt(path)
-    elif ext == ".pdf":
-        text = extract_text_from_pdf(path)
-    elif ext in {".png", ".jpg", ".jpeg"}:
-        text = ocr_image(path)
-    elif ext == ".docx":
-        text = read_docx(path)
-    else:
-        text = ""
+        return read_txt(path)
+    if ext == ".pdf":
+        return extract_text_from_pdf(path, ocr_dpi)
+    if ext in IMAGE_EXTS:
+        return ocr_image(path)
+    if ext == ".docx":
+        return read_docx(path)
+    return ""
+
+
+def file_cache_key(path: Path, ocr_dpi: int = OCR_DPI) -> Optional[bytes]:
+    """Extraction cache key for a file's whole text; None if it is not cached."""
+    ext = path.suffix.lower()
+    cache = get_extraction_cache()
+    if cache is None or ext not in CACHED_EXTS:
+        return None
+    if ext == ".docx":
+        return cache.key("file", file_sha256(path), ext=ext)
+    return cache.key("file", file_sha256(path), ext=ext, dpi=ocr_dpi, tesseract=tesseract_version())
+
+
+def load_and_normalize(path: Path, ocr_dpi: int = OCR_DPI) -> Dict:
+    key = file_cache_key(path, ocr_dpi)
+    text = get_extraction_cache().get(key) if key is not None else None
+    if text is None:
+        text = extract_text(path, ocr_dpi)
+        # Empty text may be a parse failure (read_docx swallows errors); retry it next time
+        if key is not None and text:
+            get_extraction_cache().put(key, text)
     return {"source": str(path), "text": text}
-
-
@@ -0,0 +1,227 @@
+"""Load many documents at once on a process pool.
+
+Each file is one task. Image-only PDF pages found along the way become OCR
+tasks of their own on the same pool, so one scanned pack spreads across
+every worker instead of going through Tesseract a page at a time. Results
+come back in input order.
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Deque, Dict, Iterable, Iterator, List, Optional
+
+import multiprocessing
+import os
+import threading
+import time
+
+from app.core.extract_cache import get_extraction_cache
+from app.ingestion.load import IMAGE_EXTS, OCR_DPI, extract_text, file_cache_key, ocr_pdf_page_cached, pdf_text_pages
+
+# One pool per worker count: a call asking for a different size must not shut
+# down a pool another request is still using. Sizes come from config and CLI
+# flags, so there are only ever a few.
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pool_lock = threading.Lock()
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def _ms(t0: float) -> int:
+    return int((time.perf_counter() - t0) * 1000)
+
+
+def _init_worker() -> None:
+    # One Tesseract thread per worker; the pool already fills the cores
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    with _pool_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            # spawn: forking a process that holds torch/faiss threads can deadlock
+            pool = _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return pool
+
+
+def _drop_pool(pool: ProcessPoolExecutor) -> None:
+    # A worker died; the next call of that size starts a fresh pool
+    with _pool_lock:
+        for workers, p in list(_pools.items()):
+            if p is pool:
+                del _pools[workers]
+    pool.shutdown(wait=False)
+
+
+def shutdown() -> None:
+    with _pool_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _timings(extract_ms: int = 0, ocr_ms: int = 0, ocr_pages: int = 0, cached: bool = False) -> Dict:
+    return {"extract_ms": extract_ms, "ocr_ms": ocr_ms, "ocr_pages": ocr_pages, "ocr_pages_cached": 0, "cached": cached}
+
+
+def _load_task(path: Path, ocr_dpi: int = OCR_DPI) -> Dict:
+    """Runs in a worker: cached text, a PDF's text layer (OCR left to the caller), or a whole file."""
+    t0 = time.perf_counter()
+    key = file_cache_key(path, ocr_dpi)
+    if key is not None:
+        text = get_extraction_cache().get(key)
+        if text is not None:
+            return {"text": text, "timings": _timings(extract_ms=_ms(t0), cached=True)}
+    if path.suffix.lower() == ".pdf":
+        return {"pages": pdf_text_pages(path), "extract_ms": _ms(t0), "cache_key": key}
+    text = extract_text(path, ocr_dpi)
+    if key is not None and text:
+        get_extraction_cache().put(key, text)
+    if path.suffix.lower() in IMAGE_EXTS:
+        return {"text": text, "timings": _timings(ocr_ms=_ms(t0), ocr_pages=1)}
+    return {"text": text, "timings": _timings(extract_ms=_ms(t0))}
+
+
+def _ocr_task(path: Path, page_no: int, dpi: int):
+    t0 = time.perf_counter()
+    text, cached = ocr_pdf_page_cached(path, page_no, dpi)
+    return text, cached, _ms(t0)
+
+
+def _failed(path: Path, error: BaseException) -> Dict:
+    return {"source": str(path), "text": "", "error": f"{type(error).__name__}: {error}", "timings": _timings()}
+
+
+def _finish_pdf(path: Path, loaded: Dict, ocr_results) -> Dict:
+    """Join a PDF's pages once its OCR results ((page, text, cached, ms)) are in, and cache the whole text."""
+    pages = loaded["pages"]
+    timings = _timings(extract_ms=loaded["extract_ms"])
+    for n, text, cached, ms in ocr_results:
+        pages[n] = text
+        timings["ocr_ms"] += ms
+        timings["ocr_pages"] += 1
+        timings["ocr_pages_cached"] += int(cached)
+    text = "\n\n".join(pages)
+    if loaded["cache_key"] is not None and text:
+        get_extraction_cache().put(loaded["cache_key"], text)
+    return {"source": str(path), "text": text, "timings": timings}
+
+
+def _load_serial(path: Path, ocr_dpi: int) -> Dict:
+    try:
+        loaded = _load_task(path, ocr_dpi)
+        if "pages" not in loaded:
+            return {"source": str(path), "text": loaded["text"], "timings": loaded["timings"]}
+        ocr_results = [
+            (n, *_ocr_task(path, n, ocr_dpi)) for n, text in enumerate(loaded["pages"]) if text is None
+        ]
+        return _finish_pdf(path, loaded, ocr_results)
+    except Exception as e:
+        return _failed(path, e)
+
+
+class _InFlight:
+    """A file submitted to the pool: its load task, then its page OCR tasks."""
+
+    def __init__(self, path: Path, future):
+        self.path = path
+        self.future = future
+        self.loaded: Optional[Dict] = None
+        self.ocr: Optional[list] = None
+
+
+def iter_documents(
+    files: Iterable[Path], workers: Optional[int] = None, ocr_dpi: int = OCR_DPI, window: Optional[int] = None
+) -> Iterator[Dict]:
+    """``load_and_normalize`` over ``files`` on ``workers`` processes, yielded in input order.
+
+    At most ``window`` files (default 2 x workers) are in flight, so memory
+    holds a few documents' text rather than the corpus. Every doc carries
+    ``timings``: extract_ms, ocr_ms summed over its pages, ocr_pages,
+    ocr_pages_cached, and cached for a whole-file cache hit. A file that
+    fails to load comes back with empty text and an ``error`` instead of
+    failing the batch.
+    """
+    workers = int(workers) if workers else default_workers()
+    if workers <= 1:
+        for p in files:
+            yield _load_serial(p, ocr_dpi)
+        return
+
+    window = max(1, int(window)) if window else 2 * workers
+    pool = _get_pool(workers)
+    pending: Deque[_InFlight] = deque()
+    remaining = iter(files)
+
+    def fill():
+        while len(pending) < window:
+            path = next(remaining, None)
+            if path is None:
+                return
+            pending.append(_InFlight(path, pool.submit(_load_task, path, ocr_dpi)))
+
+    def expand(entry: _InFlight):
+        # Queue a file's OCR pages as soon as its text layer is in, while other files still load
+        try:
+            entry.loaded = entry.future.result()
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            entry.loaded = _failed(entry.path, e)
+        pages = entry.loaded.get("pages")
+        entry.ocr = [] if pages is None else [
+            (n, pool.submit(_ocr_task, entry.path, n, ocr_dpi)) for n, text in enumerate(pages) if text is None
+        ]
+
+    def finish(entry: _InFlight) -> Dict:
+        result = entry.loaded
+        if "error" in result:
+            return result
+        if "pages" not in result:
+            return {"source": str(entry.path), "text": result["text"], "timings": result["timings"]}
+        try:
+            return _finish_pdf(entry.path, result, [(n, *fut.result()) for n, fut in entry.ocr])
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            return _failed(entry.path, e)
+
+    try:
+        fill()
+        while pending:
+            head = pending[0]
+            while head.ocr is None:
+                wait([e.future for e in pending if e.ocr is None], return_when=FIRST_COMPLETED)
+                for entry in pending:
+                    if entry.ocr is None and entry.future.done():
+                        expand(entry)
+            doc = finish(head)
+            pending.popleft()
+            try:
+                # Start the next file before handing this one over, so loading overlaps the consumer
+                fill()
+            except BrokenProcessPool:
+                yield doc
+                raise
+            yield doc
+    except BrokenProcessPool as e:
+        # A worker died; everything not yet yielded fails and the next call starts a fresh pool
+        _drop_pool(pool)
+        for entry in pending:
+            yield _failed(entry.path, e)
+        for path in remaining:
+            yield _failed(path, e)
+
+
+def load_documents(files: List[Path], workers: Optional[int] = None, ocr_dpi: int = OCR_DPI) -> List[Dict]:
+    """``iter_documents`` collected into a list."""
+    return list(iter_documents(files, workers=workers, ocr_dpi=ocr_dpi))
@@ -0,0 +1,84 @@
+"""Bounded hand-off between ingestion stages.
+
+``prefetch`` runs an upstream generator (load -> chunk) on a thread and
+keeps at most a few items ahead of the consumer (embed -> index), so the
+stages overlap while memory stays proportional to the queue size.
+"""
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TypeVar
+
+import queue
+import threading
+
+from app.ingestion.chunk import chunk_document
+
+T = TypeVar("T")
+_DONE = object()
+
+
+def _put(q: "queue.Queue", item, stop: threading.Event) -> bool:
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def prefetch(iterable: Iterable[T], maxsize: int = 2, name: str = "ingest-prefetch") -> Iterator[T]:
+    """Iterate ``iterable`` on a background thread, at most ``maxsize`` items ahead.
+
+    Errors raised upstream are re-raised to the consumer; closing the
+    returned generator stops the producer at its next hand-off.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=max(1, int(maxsize)))
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if not _put(q, (item, None), stop):
+                    return
+        except BaseException as e:
+            _put(q, (_DONE, e), stop)
+            return
+        _put(q, (_DONE, None), stop)
+
+    thread = threading.Thread(target=produce, name=name, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = q.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+def chunk_batches(
+    docs: Iterable[Dict],
+    size: int,
+    overlap: int,
+    batch_size: int,
+    on_document: Optional[Callable[[Dict, List[Dict]], None]] = None,
+) -> Iterator[List[Dict]]:
+    """Chunk ``docs`` in order and regroup the chunks into lists of ``batch_size``.
+
+    ``on_document(doc, chunks)`` is called once per document, before its
+    chunks are handed on.
+    """
+    batch: List[Dict] = []
+    for doc in docs:
+        chunks = chunk_document(doc, size, overlap)
+        if on_document is not None:
+            on_document(doc, chunks)
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,138 @@
+"""Conflict detection at scale: pairwise scan vs modal buckets vs semantic neighbours.
+
+Generates synthetic requirements with a realistic mix of must/should/could/
+wont statements over a set of topics. The original pairwise scan is timed
+on a --baseline-n sample and extrapolated quadratically; at 10k+ it would
+run for minutes to hours. Modal mode reports the exact conflict count from
+bucket sizes and the time to list the first --max-conflicts pairs (the
+validation default unless given). Semantic
+mode compares only FAISS near neighbours. By default it uses synthetic
+topic vectors, so it measures search cost without a model; --model embeds
+with a real sentence-transformers model instead.
+
+    python -m scripts.conflict_benchmark --n 10000 100000
+    python -m scripts.conflict_benchmark --n 10000 --model sentence-transformers/all-MiniLM-L6-v2 --out conflicts.json
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.core.validation import (
+    MAX_CONFLICTS,
+    count_conflicts,
+    detect_conflict,
+    modal_conflicts,
+    modal_signature,
+    semantic_conflicts,
+)
+
+SUBJECTS = ["The system", "The portal", "Each user", "The administrator", "The reporting module", "The API"]
+ACTIONS = [
+    "export monthly reports as PDF", "lock an account after five failed logins", "encrypt data at rest",
+    "notify the approver by email", "retain audit logs for seven years", "support single sign-on",
+    "respond within two seconds", "allow bulk upload of invoices", "archive closed tenders",
+]
+# (modal phrase, share of requirements)
+MODALS = [("must", 0.35), ("should", 0.25), ("could", 0.1), ("wont", 0.05), ("shall", 0.25)]
+
+
+def synthetic_requirements(n, topics=500, seed=0):
+    rng = np.random.default_rng(seed)
+    modal = rng.choice(len(MODALS), n, p=[share for _m, share in MODALS])
+    topic = rng.integers(0, topics, n)
+    texts = [
+        f"{SUBJECTS[t % len(SUBJECTS)]} {MODALS[m][0]} {ACTIONS[t % len(ACTIONS)]} (area {t})"
+        for m, t in zip(modal, topic)
+    ]
+    return texts, topic
+
+
+class TopicEmbedder:
+    """Stand-in embedder: requirements on the same topic get nearby vectors."""
+
+    def __init__(self, topic, dim=384, seed=0):
+        rng = np.random.default_rng(seed)
+        centers = rng.standard_normal((int(topic.max()) + 1, dim)).astype("float32")
+        vectors = centers[topic] + 0.3 * rng.standard_normal((len(topic), dim)).astype("float32")
+        self.vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    def embed(self, texts):
+        return self.vectors[: len(texts)]
+
+
+def bench_pairwise(texts, baseline_n):
+    sample = texts[:baseline_n]
+    t0 = time.perf_counter()
+    found = sum(
+        detect_conflict(sample[i], sample[j]) for i in range(len(sample)) for j in range(i + 1, len(sample))
+    )
+    elapsed = time.perf_counter() - t0
+    scale = (len(texts) / len(sample)) ** 2
+    return {"sample": len(sample), "sample_s": round(elapsed, 3), "sample_conflicts": found,
+            "extrapolated_s": round(elapsed * scale, 1)}
+
+
+def bench_modal(texts, max_conflicts):
+    t0 = time.perf_counter()
+    sigs = np.fromiter((modal_signature(t) for t in texts), dtype=np.int64, count=len(texts))
+    t_sig = time.perf_counter()
+    total = count_conflicts(sigs)
+    t_count = time.perf_counter()
+    pairs = modal_conflicts(sigs, limit=max_conflicts)
+    t_list = time.perf_counter()
+    return {
+        "signatures_s": round(t_sig - t0, 3),
+        "count_s": round(t_count - t_sig, 4),
+        "conflicts_total": total,
+        "listed": len(pairs),
+        "list_s": round(t_list - t_count, 3),
+    }, sigs
+
+
+def bench_semantic(texts, sigs, embedder, k, min_similarity, max_conflicts):
+    t0 = time.perf_counter()
+    pairs = semantic_conflicts(texts, sigs, embedder, k=k, min_similarity=min_similarity, limit=max_conflicts)
+    return {"k": k, "min_similarity": min_similarity, "conflicts": len(pairs),
+            "seconds": round(time.perf_counter() - t0, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--baseline-n", type=int, default=2000, help="requirements in the timed pairwise sample")
+    parser.add_argument("--max-conflicts", type=int, default=MAX_CONFLICTS,
+                        help="pairs to list (default: the validation.max_conflicts default)")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--min-similarity", type=float, default=0.5)
+    parser.add_argument("--model", help="embed with this sentence-transformers model instead of topic vectors")
+    parser.add_argument("--skip-semantic", action="store_true")
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    for n in args.n:
+        texts, topic = synthetic_requirements(n)
+        row = {"n": n, "pairwise": bench_pairwise(texts, min(args.baseline_n, n))}
+        row["modal"], sigs = bench_modal(texts, args.max_conflicts)
+        if not args.skip_semantic:
+            if args.model:
+                from app.core.embedder import TextEmbedder
+                embedder = TextEmbedder(args.model)
+            else:
+                embedder = TopicEmbedder(topic)
+            row["semantic"] = bench_semantic(texts, sigs, embedder, args.k, args.min_similarity, args.max_conflicts)
+        results.append(row)
+        m = row["modal"]
+        print(f"n={n}: pairwise ~{row['pairwise']['extrapolated_s']}s (extrapolated); "
+              f"modal {m['conflicts_total']} conflicts counted in {m['signatures_s'] + m['count_s']:.2f}s, "
+              f"first {m['listed']} listed in {m['list_s']:.2f}s"
+              + (f"; semantic {row['semantic']['conflicts']} in {row['semantic']['seconds']:.2f}s" if "semantic" in row else ""))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,25 @@
-from pathlib import Path
 import argparse
-import yaml
 
-from app.ingestion.load import list_input_files, load_and_normalize
-from app.ingestion.chunk import chunk_document
-from app.core.embedder import TextEmbedder
-from app.core.retriever import FaissRetriever
+from app.core.engine import PipelineEngine
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", required=True)
-    parser.add_argument("--index", required=False)
+    parser.add_argument("--index", required=False, help="index directory (default: the one /process uses for --input)")
     parser.add_argument("--config", default="config/config.yaml")
     args = parser.parse_args()
 
-    cfg = yaml.safe_load(Path(args.config).read_text(encoding="utf-8"))
-    files = list_input_files(args.input)
-    docs = [load_and_normalize(p) for p in files]
-
-    chunks = []
-    for d in docs:
-        chunks.extend(chunk_document(d, cfg["chunking"]["size"], cfg["chunking"]["overlap"]))
-
-    embedder = TextEmbedder(cfg["embedding"]["model"])
-    X = embedder.embed([c["text"] for c in chunks], batch_size=cfg["embedding"]["batch_size"])
-
-    retriever = FaissRetriever(dim=X.shape[1])
-    retriever.add(X, chunks)
-    print(f"Indexed {len(chunks)} chunks from {len(files)} files.")
+    # Same index and manifest PipelineEngine.run reuses, so a prebuilt corpus goes straight to search
+    engine = PipelineEngine(args.config)
+    retriever, stats = engine.index_corpus(args.input, index_dir=args.index)
+    if retriever is None:
+        raise SystemExit("Failed to compute embeddings. Check model and inputs.")
+    print(
+        f"Indexed {len(retriever.docs)} chunks from {stats['files_unchanged'] + stats['files_embedded']} files "
+        f"({stats['files_embedded']} embedded, {stats['files_unchanged']} unchanged) into {stats['index_dir']}."
+    )
 
 
 if __name__ == "__main__":
     main()
-
-
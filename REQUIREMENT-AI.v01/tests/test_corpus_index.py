@@ -0,0 +1,81 @@
+import os
+
+from app.core import corpus_index
+from app.core.corpus_index import CorpusManifest
+
+
+def _write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def _recorded(tmp_path, *names):
+    manifest = CorpusManifest({"model": "m"})
+    files = [_write(tmp_path / name, f"{name} must be recorded") for name in names]
+    manifest.diff(files)
+    for path in files:
+        manifest.record(path, str(path), 1)
+    return manifest, files
+
+
+def test_new_files_are_changed(tmp_path):
+    files = [_write(tmp_path / "a.txt", "a"), _write(tmp_path / "b.txt", "b")]
+    diff = CorpusManifest({}).diff(files)
+    assert diff.changed == files
+    assert diff.unchanged == [] and diff.stale_sources == []
+
+
+def test_unchanged_files_are_not_hashed(tmp_path, monkeypatch):
+    manifest, files = _recorded(tmp_path, "a.txt", "b.txt")
+
+    def no_hash(path, *args):
+        raise AssertionError(f"hashed {path}")
+
+    monkeypatch.setattr(corpus_index, "file_sha256", no_hash)
+    diff = manifest.diff(files)
+    assert diff.unchanged == files
+    assert diff.changed == [] and diff.stale_sources == [] and diff.refreshed == 0
+
+
+def test_edited_file_is_changed_and_its_rows_stale(tmp_path):
+    manifest, (a, b) = _recorded(tmp_path, "a.txt", "b.txt")
+    _write(b, "b should now say something else entirely")
+    diff = manifest.diff([a, b])
+    assert diff.unchanged == [a]
+    assert diff.changed == [b]
+    assert diff.stale_sources == [str(b)]
+
+
+def test_deleted_file_rows_are_stale(tmp_path):
+    manifest, (a, b) = _recorded(tmp_path, "a.txt", "b.txt")
+    b.unlink()
+    diff = manifest.diff([a])
+    assert diff.unchanged == [a] and diff.changed == []
+    assert diff.stale_sources == [str(b)]
+    assert str(b.resolve()) not in manifest.files
+
+
+def test_touched_identical_file_is_refreshed(tmp_path):
+    manifest, (a,) = _recorded(tmp_path, "a.txt")
+    st = a.stat()
+    os.utime(a, ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000_000))
+    diff = manifest.diff([a])
+    assert diff.unchanged == [a] and diff.changed == [] and diff.stale_sources == []
+    assert diff.refreshed == 1
+    assert manifest.files[str(a.resolve())]["mtime_ns"] == a.stat().st_mtime_ns
+
+
+def test_manifest_round_trip(tmp_path):
+    manifest, (a,) = _recorded(tmp_path, "a.txt")
+    manifest.ntotal = 1
+    manifest.save(tmp_path)
+    loaded = CorpusManifest.load(tmp_path)
+    assert loaded.settings == {"model": "m"}
+    assert loaded.files == manifest.files
+    assert loaded.ntotal == 1
+
+
+def test_unknown_manifest_version_is_ignored(tmp_path):
+    (tmp_path / corpus_index.MANIFEST_FILE).write_text('{"version": 0}', encoding="utf-8")
+    assert CorpusManifest.load(tmp_path) is None
+    assert CorpusManifest.load(tmp_path / "missing") is None
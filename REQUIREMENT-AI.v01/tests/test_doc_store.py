@@ -0,0 +1,59 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from app.core.doc_store import BLOB_FILE, CURRENT_FILE, OFFSETS_FILE, DocStore, doc_store_exists
+
+ROWS = [{"source": "a.txt", "text": "The system must log in", "meta": {"offset": i}} for i in range(5)]
+
+
+def test_rows_round_trip_through_save(tmp_path):
+    store = DocStore.from_rows(ROWS, spill_dir=tmp_path)
+    assert list(store) == ROWS
+    store.save(tmp_path)
+    assert doc_store_exists(tmp_path)
+    assert list(store) == ROWS
+    assert list(DocStore(tmp_path)) == ROWS
+
+
+def test_indexing_and_slices(tmp_path):
+    store = DocStore.from_rows(ROWS[:3])
+    store.save(tmp_path)
+    store.extend(ROWS[3:])
+    assert len(store) == 5
+    assert store[-1] == ROWS[4]
+    assert store[2:4] == ROWS[2:4]
+    with pytest.raises(IndexError):
+        store[5]
+
+
+def test_reopened_store_saves_over_its_own_directory(tmp_path):
+    DocStore.from_rows(ROWS[:2]).save(tmp_path)
+    store = DocStore(tmp_path, spill_dir=tmp_path)
+    store.extend(ROWS[2:])
+    store.save(tmp_path)
+    assert list(store) == ROWS
+    assert list(DocStore(tmp_path)) == ROWS
+    # The previous generation is pruned; only the live one and its pointer remain
+    assert len(os.listdir(tmp_path)) == 3
+
+
+def test_empty_store(tmp_path):
+    store = DocStore()
+    assert len(store) == 0
+    store.save(tmp_path)
+    assert list(DocStore(tmp_path)) == []
+
+
+def test_store_saved_before_generations_is_read_and_migrated(tmp_path):
+    data = [json.dumps(row).encode("utf-8") for row in ROWS]
+    (tmp_path / BLOB_FILE).write_bytes(b"".join(data))
+    np.save(tmp_path / OFFSETS_FILE, np.concatenate([[0], np.cumsum([len(d) for d in data])]).astype(np.int64))
+    store = DocStore(tmp_path, spill_dir=tmp_path)
+    assert list(store) == ROWS
+    store.save(tmp_path)
+    assert (tmp_path / CURRENT_FILE).exists()
+    assert not (tmp_path / BLOB_FILE).exists()
+    assert list(DocStore(tmp_path)) == ROWS
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pytest
+import yaml
+
+pytest.importorskip("faiss")
+
+from app.core.doc_store import doc_store_exists
+from app.core.engine import PipelineEngine
+from app.core.retriever import LEGACY_DOCS_FILE, FaissRetriever
+
+
+class FakeEmbedder:
+    """Deterministic vectors from the text, counting what reaches the "model"."""
+
+    dim = 16
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed(self, texts, batch_size=64):
+        self.embedded.extend(texts)
+        rows = []
+        for text in texts:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            rows.append(np.random.default_rng(seed).standard_normal(self.dim))
+        vectors = np.asarray(rows, dtype=np.float32).reshape(len(texts), self.dim)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _config(tmp_path, chunk_size=40):
+    config = {
+        "embedding": {"model": "fake", "backend": "torch"},
+        "chunking": {"size": chunk_size, "overlap": 5},
+        "index": {"type": "flat", "persist": True},
+        "ingestion": {"workers": 1},
+    }
+    path = tmp_path / f"config_{chunk_size}.yaml"
+    path.write_text(yaml.safe_dump(config), encoding="utf-8")
+    return path
+
+
+@pytest.fixture(autouse=True)
+def no_extraction_cache(monkeypatch):
+    # Keep test files out of the shared on-disk cache
+    monkeypatch.setenv("EDAI_EXTRACT_CACHE", "0")
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for name in ("a", "b", "c"):
+        (docs / f"{name}.txt").write_text(f"Requirement {name}: the portal must export {name} reports as PDF.", encoding="utf-8")
+    return docs
+
+
+def _index(tmp_path, corpus, chunk_size=40):
+    embedder = FakeEmbedder()
+    engine = PipelineEngine(_config(tmp_path, chunk_size))
+    retriever, stats = engine.index_corpus(corpus, index_dir=tmp_path / "index", embedder=embedder)
+    return retriever, stats, embedder
+
+
+def _sources(retriever):
+    return sorted({os.path.basename(d["source"]) for d in retriever.docs})
+
+
+def test_first_run_embeds_every_file(tmp_path, corpus):
+    retriever, stats, embedder = _index(tmp_path, corpus)
+    assert not stats["reused_index"]
+    assert stats["files_embedded"] == 3
+    assert len(retriever.docs) == retriever.index.ntotal == len(embedder.embedded)
+    assert _sources(retriever) == ["a.txt", "b.txt", "c.txt"]
+
+
+def test_unchanged_corpus_skips_embedding(tmp_path, corpus):
+    first, _stats, _embedder = _index(tmp_path, corpus)
+    retriever, stats, embedder = _index(tmp_path, corpus)
+    assert stats["reused_index"]
+    assert stats["files_unchanged"] == 3 and stats["files_embedded"] == 0
+    assert embedder.embedded == []
+    assert list(retriever.docs) == list(first.docs)
+
+
+def test_edited_file_is_the_only_one_embedded(tmp_path, corpus):
+    _index(tmp_path, corpus)
+    edited = "Requirement b: the system should archive closed tenders."
+    (corpus / "b.txt").write_text(edited, encoding="utf-8")
+    retriever, stats, embedder = _index(tmp_path, corpus)
+    assert stats["files_embedded"] == 1 and stats["stale_sources"] == 1
+    assert embedder.embedded and all(t in edited for t in embedder.embedded)
+    b_texts = "".join(d["text"] for d in retriever.docs if d["source"].endswith("b.txt"))
+    assert "archive" in b_texts and "PDF" not in b_texts
+    assert len(retriever.docs) == retriever.index.ntotal
+
+
+def test_deleted_file_rows_are_dropped(tmp_path, corpus):
+    _index(tmp_path, corpus)
+    (corpus / "c.txt").unlink()
+    retriever, stats, embedder = _index(tmp_path, corpus)
+    assert stats["files_embedded"] == 0 and stats["stale_sources"] == 1
+    assert embedder.embedded == []
+    assert _sources(retriever) == ["a.txt", "b.txt"]
+    assert len(retriever.docs) == retriever.index.ntotal
+
+
+def test_touched_but_identical_file_is_not_embedded(tmp_path, corpus):
+    _index(tmp_path, corpus)
+    path = corpus / "a.txt"
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 5_000_000_000))
+    _retriever, stats, embedder = _index(tmp_path, corpus)
+    assert stats["files_unchanged"] == 3 and stats["files_embedded"] == 0
+    assert embedder.embedded == []
+    manifest = json.loads((tmp_path / "index" / "manifest.json").read_text(encoding="utf-8"))
+    assert manifest["files"][str(path.resolve())]["mtime_ns"] == path.stat().st_mtime_ns
+
+
+def test_settings_change_rebuilds_the_index(tmp_path, corpus):
+    _index(tmp_path, corpus, chunk_size=40)
+    retriever, stats, embedder = _index(tmp_path, corpus, chunk_size=25)
+    assert not stats["reused_index"]
+    assert stats["files_embedded"] == 3
+    assert max(len(d["text"]) for d in retriever.docs) <= 25
+
+
+def test_index_saved_with_legacy_docs_json_is_loaded(tmp_path, corpus):
+    first, _stats, _embedder = _index(tmp_path, corpus)
+    index_dir = tmp_path / "index"
+    rows = list(first.docs)
+    first.docs.close()
+    for name in os.listdir(index_dir):
+        if name.startswith("docs."):
+            os.remove(index_dir / name)
+    (index_dir / LEGACY_DOCS_FILE).write_text(json.dumps(rows), encoding="utf-8")
+
+    assert list(FaissRetriever.load(index_dir).docs) == rows
+    retriever, stats, embedder = _index(tmp_path, corpus)
+    assert stats["reused_index"] and embedder.embedded == []
+    assert list(retriever.docs) == rows
+
+
+def test_legacy_docs_json_is_replaced_on_the_next_save(tmp_path, corpus):
+    test_index_saved_with_legacy_docs_json_is_loaded(tmp_path, corpus)
+    (corpus / "d.txt").write_text("Requirement d: each user could pick a theme.", encoding="utf-8")
+    retriever, _stats, _embedder = _index(tmp_path, corpus)
+    index_dir = tmp_path / "index"
+    assert doc_store_exists(index_dir)
+    assert not (index_dir / LEGACY_DOCS_FILE).exists()
+    assert _sources(FaissRetriever.load(index_dir)) == ["a.txt", "b.txt", "c.txt", "d.txt"]
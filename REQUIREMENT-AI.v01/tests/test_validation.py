@@ -0,0 +1,46 @@
+import numpy as np
+
+from app.core.validation import (
+    MAX_CONFLICTS,
+    count_conflicts,
+    detect_conflict,
+    modal_conflicts,
+    modal_signature,
+    validate_requirements,
+)
+from scripts.conflict_benchmark import synthetic_requirements
+
+
+def _requirements(n):
+    texts, _topic = synthetic_requirements(n, topics=40)
+    return texts
+
+
+def _pairwise(texts):
+    return [(i, j) for i in range(len(texts)) for j in range(i + 1, len(texts)) if detect_conflict(texts[i], texts[j])]
+
+
+def test_modal_conflicts_match_pairwise_scan():
+    texts = _requirements(600)
+    sigs = np.fromiter((modal_signature(t) for t in texts), dtype=np.int64, count=len(texts))
+    expected = _pairwise(texts)
+    assert modal_conflicts(sigs) == expected
+    assert count_conflicts(sigs) == len(expected)
+    assert modal_conflicts(sigs, limit=250) == expected[:250]
+
+
+def test_validate_requirements_caps_conflicts_by_default():
+    texts = _requirements(600)
+    result = validate_requirements([{"text": t} for t in texts])
+    conflicts = [f["pair"] for f in result["flags"] if f["type"] == "conflict"]
+    expected = _pairwise(texts)
+    assert len(expected) > MAX_CONFLICTS
+    assert conflicts == expected[:MAX_CONFLICTS]
+    assert result["conflicts_total"] == len(expected)
+
+
+def test_validate_requirements_uncapped_lists_every_pair():
+    texts = _requirements(200)
+    result = validate_requirements([{"text": t} for t in texts], max_conflicts=None)
+    assert [f["pair"] for f in result["flags"] if f["type"] == "conflict"] == _pairwise(texts)
+    assert "conflicts_total" not in result